@@ -0,0 +1,115 @@
+import math
+import numpy as np
+
+# Fixed size ring buffer of past ctrl commands. All storage is allocated at
+# construction, push and lookup only write/read preallocated arrays so that
+# the 100 Hz ctrl loop stays allocation free.
+# Used for two things:
+# - simulating actuator delay (publish the cmd issued t_delay ago)
+# - predicting the vehicle state at the time the current cmd takes effect
+class CmdRingBuffer:
+    def __init__(self, t_span, dt):
+        # t_span: longest delay that will be queried (s)
+        # dt:     period at which cmds are pushed (s)
+        self.size = int(math.ceil(t_span/dt)) + 2
+        self.t = np.zeros(self.size)
+        self.delta = np.zeros(self.size)
+        self.dc = np.zeros(self.size)
+        self.head = -1 # idx of latest cmd
+        self.count = 0
+
+    def push(self, t, delta, dc):
+        self.head = (self.head + 1) % self.size
+        self.t[self.head] = t
+        self.delta[self.head] = delta
+        self.dc[self.head] = dc
+        if (self.count < self.size):
+            self.count += 1
+
+    # returns idx of latest cmd issued at or before t, -1 if none
+    def idxAt(self, t):
+        i = self.head
+        n = 0
+        while (n < self.count):
+            if (self.t[i] <= t):
+                return i
+            i = (i - 1) % self.size
+            n += 1
+        return -1
+
+    # cmd that is effective at t given actuator delay t_delay (zero order hold)
+    def getDelayed(self, t, t_delay):
+        i = self.idxAt(t - t_delay)
+        if (i < 0):
+            return 0.0, 0.0
+        return self.delta[i], self.dc[i]
+
+    # predicts state at t + t_delay, i.e. when a cmd issued at t takes effect.
+    # The cmds issued in [t - t_delay, t] are still in the pipeline and are
+    # applied in order to a kinematic single track model, vx and vy are held
+    # constant over the (short) prediction horizon.
+    # Writes result to state_pred (any object with the fields of common/State)
+    def predictState(self, state, t, t_delay, lf, lr, state_pred, kappac=0.0):
+        X = state.X
+        Y = state.Y
+        psi = state.psi
+        s = state.s
+        d = state.d
+        deltapsi = state.deltapsi
+        vx = state.vx
+        vy = state.vy
+
+        if (t_delay > 0.0 and self.count > 0):
+            t_begin = t - t_delay
+
+            # walk back to the oldest cmd still in the pipeline
+            i = self.head
+            n = 0
+            while (n < self.count and self.t[i] > t_begin):
+                i = (i - 1) % self.size
+                n += 1
+            # cmd effective at t (issued before the window), 0 if none
+            if (n < self.count):
+                delta = self.delta[i]
+            else:
+                delta = 0.0
+
+            # apply pending cmds in issue order, last segment runs to t
+            t_seg = t_begin
+            while (n >= 0):
+                if (n > 0):
+                    i = (i + 1) % self.size
+                    t_next = min(self.t[i], t)
+                else:
+                    t_next = t
+                h = t_next - t_seg
+                if (h > 0.0):
+                    psidot = vx*math.tan(delta)/(lf + lr)
+                    cpsi = math.cos(psi)
+                    spsi = math.sin(psi)
+                    cdpsi = math.cos(deltapsi)
+                    sdpsi = math.sin(deltapsi)
+                    sdot = (vx*cdpsi - vy*sdpsi)/(1.0 - d*kappac)
+                    X += h*(vx*cpsi - vy*spsi)
+                    Y += h*(vx*spsi + vy*cpsi)
+                    s += h*sdot
+                    d += h*(vx*sdpsi + vy*cdpsi)
+                    psi += h*psidot
+                    deltapsi += h*(psidot - kappac*sdot)
+                t_seg = t_next
+                if (n > 0):
+                    delta = self.delta[i]
+                n -= 1
+
+        state_pred.X = X
+        state_pred.Y = Y
+        state_pred.psi = psi
+        state_pred.s = s
+        state_pred.d = d
+        state_pred.deltapsi = deltapsi
+        state_pred.psidot = state.psidot
+        state_pred.vx = vx
+        state_pred.vy = vy
+        state_pred.ax = state.ax
+        state_pred.ay = state.ay
+        return state_pred
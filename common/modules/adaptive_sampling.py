@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+
+'''
+Description: Adaptive importance sampling of the rollout references (d_ref, vx_ref)
+    - replaces the fixed Nd x Nvx grid of the sampling step by n_iter iterations
+      of n_samples rollouts, cross entropy style:
+        iteration 0: stratified samples over the whole reference space and
+                     gaussian samples around the best refs of the previous cycle
+        iteration i: gaussian fitted to the elite (lowest cost) samples so far,
+                     plus samples between feasible and colliding/off road
+                     neighbours, where the best trajectories usually are
+    - the returned trajset holds all rollouts of all iterations
+    - cost: every rolloutBatch call steps Nt*Ni times in python whatever the batch
+      size, so with the numpy rollout each iteration costs about as much as the
+      whole grid. Default is a single iteration (exploration + previous best in
+      one batch), which at the same number of rollouts runs as fast as the grid.
+      More iterations only pay off where the per rollout cost dominates (the
+      C++/CUDA rollout)
+    - report of selection quality vs number of rollouts, adaptive vs uniform grid,
+      on random popup obstacle scenarios (reference: dense uniform grid)
+Usage:
+    sampler = AdaptiveSampler(vehicle, n_samples=48, n_iter=1)
+    trajset, idx, cost = sampler.sample(x_init, pathlocal, obs, sref, Wx0, Wslack)
+    python adaptive_sampling.py --car <fssim car.yaml> --budgets 48 150 --scenarios 200 [--iter 3]
+'''
+
+import sys
+import time
+import argparse
+import numpy as np
+from rollout import TrajSet
+from rollout import rollout
+from rollout import rolloutBatch
+from rollout import pathLookup
+from rollout import getField
+from trajset_eval import evalTrajset
+from trajset_eval import selectTraj
+from motion_primitives import loadVehicle
+
+VXLB = 1.0 # as the grid of the kernel, avoids the singularity at vx = 0
+
+class AdaptiveSampler:
+    def __init__(self, vehicle, n_samples=48, n_iter=1, elite_frac=0.2, boundary_frac=0.3, explore_frac=0.3,
+                 sigma_init=0.15, sigma_min=0.02, vxub=20.0, Nt=40, dt=0.1, traction_adaptive=1, mu_nominal=1.0, seed=None):
+        self.vehicle = vehicle
+        self.n_samples = n_samples
+        self.n_iter = n_iter
+        self.elite_frac = elite_frac
+        self.boundary_frac = boundary_frac
+        self.explore_frac = explore_frac
+        self.sigma_init = sigma_init # in normalized reference space [0,1]^2
+        self.sigma_min = sigma_min
+        self.vxub = vxub
+        self.Nt = Nt
+        self.dt = dt
+        self.traction_adaptive = traction_adaptive
+        self.mu_nominal = mu_nominal
+        self.rng = np.random.RandomState(seed)
+        self.prior = None # (d_ref, vx_ref) of the last selected traj
+
+    def reset(self):
+        self.prior = None
+
+    # n stratified samples (jittered grid) in [0,1]^2
+    def stratified(self, n):
+        if (n <= 0):
+            return np.zeros((0, 2))
+        n0 = int(np.ceil(np.sqrt(n)))
+        g0, g1 = np.meshgrid(np.arange(n0), np.arange(n0))
+        cells = np.column_stack([g0.ravel(), g1.ravel()])[self.rng.permutation(n0*n0)[0:n]]
+        return (cells + self.rng.uniform(size=(n, 2)))/n0
+
+    def gaussian(self, n, mean, std):
+        return np.clip(mean + std*self.rng.normal(size=(n, 2)), 0.0, 1.0)
+
+    # n samples between feasible samples (lowest cost first) and their nearest infeasible neighbour
+    def boundary(self, n, u, cost, feasible):
+        i_feas = np.nonzero(feasible)[0]
+        i_infeas = np.nonzero(~feasible)[0]
+        if (n <= 0 or i_feas.size == 0 or i_infeas.size == 0):
+            return np.zeros((0, 2))
+        i_feas = i_feas[np.argsort(cost[i_feas])]
+        dist = np.sum((u[i_feas, None, :] - u[None, i_infeas, :])**2, axis=2)
+        j_near = i_infeas[np.argmin(dist, axis=1)]
+        pick = np.arange(n) % i_feas.size
+        r = self.rng.uniform(0.2, 0.8, size=(n, 1))
+        return u[i_feas[pick]] + r*(u[j_near[pick]] - u[i_feas[pick]])
+
+    # rollouts and cost of samples u (n, 2) in normalized reference space
+    def evaluate(self, u, x_init, pathvars, bounds, pathlocal, obs, sref, Wx0, Wslack):
+        dlb, dub = bounds
+        d_ref = dlb + u[:, 0]*(dub - dlb)
+        vx_ref = VXLB + u[:, 1]*(self.vxub - VXLB)
+        out = rolloutBatch(x_init, d_ref, vx_ref, pathvars, self.vehicle, self.Nt, self.dt,
+                           self.traction_adaptive, self.mu_nominal)
+        cost, colliding, exitroad = evalTrajset(out["s"], out["d"], pathlocal, obs, sref, Wx0, Wslack)
+        return out, d_ref, vx_ref, cost, ~(colliding | exitroad)
+
+    # sampling step, returns the trajset of all rollouts, index of the selected traj
+    # (-1 if none, as saarti) and the cost of all rollouts
+    def sample(self, x_init, pathlocal, obs, sref, Wx0, Wslack):
+        pathvars = pathLookup(pathlocal)
+        bounds = (getField(pathlocal, "dlb")[0], getField(pathlocal, "dub")[0])
+        scale = np.array([bounds[1] - bounds[0], self.vxub - VXLB])
+
+        # iteration 0: exploration and previous best
+        if (self.prior is None):
+            u = self.stratified(self.n_samples)
+        else:
+            n_explore = int(round(self.explore_frac*self.n_samples))
+            u_prior = np.clip((np.array(self.prior) - [bounds[0], VXLB])/scale, 0.0, 1.0)
+            u = np.vstack([self.stratified(n_explore),
+                           self.gaussian(self.n_samples - n_explore, u_prior, self.sigma_init)])
+        outs, d_refs, vx_refs, costs, feas = [[v] for v in self.evaluate(u, x_init, pathvars, bounds, pathlocal, obs, sref, Wx0, Wslack)]
+        us = [u]
+        std = np.full(2, self.sigma_init)
+
+        # refinement
+        for it in range(1, self.n_iter):
+            u_all = np.vstack(us)
+            cost_all = np.concatenate(costs)
+            feas_all = np.concatenate(feas)
+            n_elite = max(int(round(self.elite_frac*u_all.shape[0])), 2)
+            elite = u_all[np.argsort(cost_all)[0:n_elite]]
+            mean = np.mean(elite, axis=0)
+            std = np.maximum(0.5*std + 0.5*np.std(elite, axis=0), self.sigma_min)
+            u_bnd = self.boundary(int(round(self.boundary_frac*self.n_samples)), u_all, cost_all, feas_all)
+            u = np.vstack([u_bnd, self.gaussian(self.n_samples - u_bnd.shape[0], mean, std)])
+            out, d_ref, vx_ref, cost, f = self.evaluate(u, x_init, pathvars, bounds, pathlocal, obs, sref, Wx0, Wslack)
+            for lst, val in zip([us, outs, d_refs, vx_refs, costs, feas], [u, out, d_ref, vx_ref, cost, f]):
+                lst.append(val)
+
+        arrays = dict((name, np.concatenate([o[name] for o in outs])) for name in outs[0].keys())
+        trajset = TrajSet(arrays, np.concatenate(d_refs), np.concatenate(vx_refs))
+        cost = np.concatenate(costs)
+        idx = selectTraj(cost, Wslack)
+        self.prior = (trajset.d_ref[idx], trajset.vx_ref[idx]) if idx >= 0 else None
+        return trajset, idx, cost
+
+# random popup scenario: straight or curved road, 1-3 obstacles ahead
+def randomScenario(rng, road_halfwidth=3.0, vxref=15.0, Nt=40, dt=0.1):
+    s = np.arange(0.0, 400.0, 1.0)
+    kappa = rng.uniform(-0.02, 0.02)
+    pathlocal = {
+      "s": s,
+      "kappa_c": np.full(s.size, kappa),
+      "mu": np.full(s.size, rng.choice([0.5, 0.8, 1.0])),
+      "dub": np.full(s.size, road_halfwidth),
+      "dlb": np.full(s.size, -road_halfwidth),
+    }
+    n_obs = rng.randint(1, 4)
+    obs = {
+      "s": rng.uniform(20.0, 80.0, n_obs),
+      "d": rng.uniform(-road_halfwidth, road_halfwidth, n_obs),
+      "Rmgn": np.full(n_obs, 2.5),
+    }
+    vx0 = rng.uniform(8.0, 18.0)
+    x_init = [0.0, rng.uniform(-1.0, 1.0), 0.0, kappa*vx0, vx0, 0.0]
+    sref = x_init[0] + vxref*dt*np.arange(Nt+1)
+    return x_init, pathlocal, obs, sref
+
+# uniform grid with about n rollouts, aspect as the default Nd x Nvx = 10 x 15
+def gridShape(n):
+    Nd = max(int(round(np.sqrt(n*10.0/15.0))), 2)
+    return Nd, max(int(round(float(n)/Nd)), 2)
+
+# selection quality vs number of rollouts, rows of (method, n_rollouts, success rate,
+# median cost gap to the reference, mean time [ms]). success: the selected traj is
+# feasible, counted over scenarios the reference solves. The adaptive sampler is
+# evaluated cold (no prior) and warm (prior from the previous cycle).
+def report(vehicle, budgets, n_scenarios=100, n_iter=1, Wx0=1000.0, Wslack=1e9, vxub=20.0, N_ref=(40, 60), seed=0):
+    rng = np.random.RandomState(seed)
+    scenarios = [randomScenario(rng) for i in range(n_scenarios)]
+    refs = []
+    for x_init, pathlocal, obs, sref in scenarios:
+        ts = rollout(x_init, pathlocal, vehicle, Nd=N_ref[0], Nvx=N_ref[1], vxub=vxub)
+        cost, colliding, exitroad = evalTrajset(ts["s"], ts["d"], pathlocal, obs, sref, Wx0, Wslack)
+        refs.append(np.min(cost[~(colliding | exitroad)]) if np.any(~(colliding | exitroad)) else None)
+
+    def evalMethod(name, n, run, prepare=None):
+        succ, gaps, times = [], [], []
+        for (x_init, pathlocal, obs, sref), cost_ref in zip(scenarios, refs):
+            if (prepare is not None):
+                prepare(x_init, pathlocal, obs, sref)
+            t0 = time.time()
+            ts, cost = run(x_init, pathlocal, obs, sref)
+            times.append(time.time() - t0)
+            if (cost_ref is None):
+                continue
+            i = selectTraj(cost, Wslack)
+            ok = i >= 0 and cost[i] < Wslack
+            succ.append(ok)
+            if (ok):
+                gaps.append((cost[i] - cost_ref)/max(cost_ref, 1e-9))
+        return (name, n, np.mean(succ) if succ else np.nan, np.median(gaps) if gaps else np.nan, 1000*np.mean(times))
+
+    rows = []
+    for n in budgets:
+        Nd, Nvx = gridShape(n)
+        def runGrid(x_init, pathlocal, obs, sref):
+            ts = rollout(x_init, pathlocal, vehicle, Nd=Nd, Nvx=Nvx, vxub=vxub)
+            return ts, evalTrajset(ts["s"], ts["d"], pathlocal, obs, sref, Wx0, Wslack)[0]
+        rows.append(evalMethod("grid %ix%i" %(Nd, Nvx), Nd*Nvx, runGrid))
+
+        sampler = AdaptiveSampler(vehicle, n_samples=max(n//n_iter, 4), n_iter=n_iter, vxub=vxub, seed=seed)
+        def runAdaptive(x_init, pathlocal, obs, sref):
+            ts, idx, cost = sampler.sample(x_init, pathlocal, obs, sref, Wx0, Wslack)
+            return ts, cost
+        def coldStart(x_init, pathlocal, obs, sref):
+            sampler.reset()
+        # warm: prior from the previous planning cycle, dt_algo = dt earlier
+        def warmStart(x_init, pathlocal, obs, sref):
+            sampler.reset()
+            ds = x_init[4]*sampler.dt
+            x_prev = [x_init[0] - ds] + list(x_init[1:])
+            sampler.sample(x_prev, pathlocal, obs, np.asarray(sref) - ds, Wx0, Wslack)
+        name = "%ix%i" %(n_iter, sampler.n_samples)
+        rows.append(evalMethod("adaptive " + name, n_iter*sampler.n_samples, runAdaptive, coldStart))
+        rows.append(evalMethod("adaptive warm " + name, n_iter*sampler.n_samples, runAdaptive, warmStart))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Selection quality vs number of rollouts, adaptive sampling vs uniform grid")
+    parser.add_argument("--car", required=True, help="fssim car.yaml with inertia and kinematics")
+    parser.add_argument("--budgets", type=int, nargs="+", default=[24, 48, 150], help="numbers of rollouts")
+    parser.add_argument("--scenarios", type=int, default=100)
+    parser.add_argument("--iter", type=int, default=1, help="iterations of the adaptive sampler")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vehicle = loadVehicle(args.car)
+    rows = report(vehicle, args.budgets, args.scenarios, args.iter, seed=args.seed)
+    print("%-22s %8s %8s %10s %8s" %("method", "rollouts", "success", "cost gap", "ms"))
+    for name, n, succ, gap, ms in rows:
+        print("%-22s %8i %8.3f %10.4f %8.2f" %(name, n, succ, gap, ms))
+
+if __name__ == '__main__':
+    sys.exit(main())
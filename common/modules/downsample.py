@@ -0,0 +1,58 @@
+import numpy as np
+
+# Level of detail for plotting long logs: Largest-Triangle-Three-Buckets
+# (Steinarsson 2013). The samples are split into n_out - 2 buckets of equal
+# count, from each bucket the sample that spans the largest triangle with the
+# previously selected sample and the mean of the next bucket is kept. First
+# and last sample are always kept. Peaks survive, unlike with decimation.
+# Works for time series (x = t) and for tracks (x = X, y = Y), buckets are
+# formed over the sample order in both cases.
+
+# indices of the kept samples (sorted), all indices if len(x) <= n_out
+def lttbIndices(x, y, n_out):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = x.size
+    if (n_out >= n or n_out < 3):
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int) # bucket i: [edges[i], edges[i+1])
+    idx = np.zeros(n_out, dtype=int)
+    idx[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        i0, i1 = edges[i], edges[i + 1]
+        # mean of next bucket (last sample for the last bucket)
+        if (i + 2 < n_out - 1):
+            j0, j1 = edges[i + 1], edges[i + 2]
+            cx, cy = x[j0:j1].mean(), y[j0:j1].mean()
+        else:
+            cx, cy = x[n - 1], y[n - 1]
+        area = np.abs((x[a] - cx)*(y[i0:i1] - y[a]) - (x[a] - x[i0:i1])*(cy - y[a]))
+        a = i0 + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+# number of samples worth drawing on an axes, points_per_pixel samples per pixel of width
+def axesMaxPoints(ax, points_per_pixel=2.0):
+    fig = ax.get_figure()
+    width_px = ax.get_position().width*fig.get_figwidth()*fig.dpi
+    return max(int(points_per_pixel*width_px), 3)
+
+# plot of a time series (t increasing) downsampled to the resolution of the axes,
+# args as for ax.plot. When zooming, the visible range is downsampled again from
+# the full data, so detail appears as it becomes visible.
+def plotLod(ax, t, y, *args, **kwargs):
+    t = np.asarray(t)
+    y = np.asarray(y)
+    idx = lttbIndices(t, y, axesMaxPoints(ax))
+    lines = ax.plot(t[idx], y[idx], *args, **kwargs)
+    if (idx.size < t.size):
+        line = lines[0]
+        def update(ax):
+            x0, x1 = ax.get_xlim()
+            i0 = max(np.searchsorted(t, x0) - 1, 0)
+            i1 = min(np.searchsorted(t, x1) + 1, t.size)
+            idx = i0 + lttbIndices(t[i0:i1], y[i0:i1], axesMaxPoints(ax))
+            line.set_data(t[idx], y[idx])
+        ax.callbacks.connect('xlim_changed', update)
+    return lines
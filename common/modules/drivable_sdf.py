@@ -0,0 +1,100 @@
+import hashlib
+import numpy as np
+from scipy.ndimage import distance_transform_edt
+from rollout import getField
+
+# Signed distance field of the drivable area dlb(s) <= d <= dub(s) of a path,
+# rasterized on a regular grid in frenet coordinates (s, d). Positive inside
+# the road, negative outside, distance in the (s, d) metric. Built once per
+# path with an exact euclidean distance transform, queries are bilinear
+# lookups, vectorized over arrays of any shape, instead of interpolating dub
+# and dlb per query. Closed tracks (s_lap given) wrap around in s.
+
+class DrivableSdf:
+    def __init__(self, sdf, s0, ds, d0, dd, s_lap=None):
+        self.sdf = np.asarray(sdf, dtype=np.float32) # (Ns, Nd)
+        self.s0 = float(s0)
+        self.ds = float(ds)
+        self.d0 = float(d0)
+        self.dd = float(dd)
+        self.s_lap = float(s_lap) if s_lap else None
+
+    # sdf of path (msg or dict with s, dub, dlb), d range padded by d_margin
+    @classmethod
+    def fromPath(cls, path, ds=0.5, dd=0.1, d_margin=3.0, s_lap=None):
+        s_path = getField(path, "s")
+        dub = getField(path, "dub")
+        dlb = getField(path, "dlb")
+        s_end = s_lap if s_lap else s_path[-1]
+        s_grid = np.arange(s_path[0], s_end + 0.5*ds, ds)
+        d_grid = np.arange(np.min(dlb) - d_margin, np.max(dub) + d_margin + 0.5*dd, dd)
+        if (s_lap):
+            dub_grid = np.interp(s_grid, s_path, dub, period=s_lap)
+            dlb_grid = np.interp(s_grid, s_path, dlb, period=s_lap)
+        else:
+            dub_grid = np.interp(s_grid, s_path, dub)
+            dlb_grid = np.interp(s_grid, s_path, dlb)
+        inside = (d_grid >= dlb_grid[:, None]) & (d_grid <= dub_grid[:, None])
+
+        # closed track: pad with the other end of the lap so that distances wrap around
+        n_pad = int(np.ceil((d_grid[-1] - d_grid[0])/ds)) if s_lap else 0
+        if (n_pad > 0):
+            n_pad = min(n_pad, inside.shape[0])
+            inside = np.vstack([inside[-n_pad:], inside, inside[0:n_pad]])
+        dist_in = distance_transform_edt(inside, sampling=(ds, dd))
+        dist_out = distance_transform_edt(~inside, sampling=(ds, dd))
+        sdf = np.where(inside, dist_in - 0.5*dd, -(dist_out - 0.5*dd)) # boundary between cell centers
+        if (n_pad > 0):
+            sdf = sdf[n_pad:-n_pad]
+        return cls(sdf, s_grid[0], ds, d_grid[0], dd, s_lap)
+
+    # as stored in an explog group (next to pathglobal)
+    def toDict(self):
+        return {"sdf": self.sdf, "s0": self.s0, "ds": self.ds, "d0": self.d0, "dd": self.dd, "s_lap": self.s_lap or 0.0}
+
+    @classmethod
+    def fromDict(cls, group):
+        return cls(np.array(group["sdf"]), group["s0"], group["ds"], group["d0"], group["dd"], group["s_lap"])
+
+    # signed distance at (s, d), bilinear, beyond the grid in d the distance keeps decreasing
+    def query(self, s, d):
+        s = np.asarray(s, dtype=float)
+        d = np.asarray(d, dtype=float)
+        Ns, Nd = self.sdf.shape
+        if (self.s_lap):
+            s = self.s0 + np.mod(s - self.s0, self.s_lap)
+        fs = np.clip((s - self.s0)/self.ds, 0.0, Ns - 1.0)
+        fd_raw = (d - self.d0)/self.dd
+        fd = np.clip(fd_raw, 0.0, Nd - 1.0)
+        i = np.minimum(fs.astype(int), Ns - 2)
+        j = np.minimum(fd.astype(int), Nd - 2)
+        ws = fs - i
+        wd = fd - j
+        val = ((1 - ws)*(1 - wd)*self.sdf[i, j] + (1 - ws)*wd*self.sdf[i, j + 1] +
+               ws*(1 - wd)*self.sdf[i + 1, j] + ws*wd*self.sdf[i + 1, j + 1])
+        return val - np.abs(fd_raw - fd)*self.dd
+
+    # smallest signed distance of the vehicle corners, footprint lf + lr by width,
+    # heading deltapsi relative to the path (corners as planning_util::get_vehicle_corners)
+    def footprintMargin(self, s, d, deltapsi, lf, lr, width):
+        s = np.asarray(s, dtype=float)
+        d = np.asarray(d, dtype=float)
+        cos = np.cos(deltapsi)
+        sin = np.sin(deltapsi)
+        margin = None
+        for dx, dy in [(lf, 0.5*width), (-lr, 0.5*width), (-lr, -0.5*width), (lf, -0.5*width)]:
+            val = self.query(s + dx*cos - dy*sin, d + dx*sin + dy*cos)
+            margin = val if margin is None else np.minimum(margin, val)
+        return margin
+
+# footprint margin of each traj of a trajset (dict or rollout.TrajSet with s, d, deltapsi)
+def trajsetFootprintMargin(sdf, trajset, lf, lr, width):
+    margin = sdf.footprintMargin(trajset["s"], trajset["d"], trajset["deltapsi"], lf, lr, width)
+    return np.min(margin, axis=-1)
+
+# key of the road bounds of a path, the sdf is rebuilt when it changes
+def pathKey(path):
+    h = hashlib.sha1()
+    for name in ["s", "dub", "dlb"]:
+        h.update(np.ascontiguousarray(getField(path, name), dtype=np.float32).tobytes())
+    return h.hexdigest()
@@ -0,0 +1,156 @@
+import os
+import json
+import numpy as np
+
+# Columnar experiment log. A log is a directory with one .npy file per channel,
+# named <group>.<channel>.npy, plus meta.json that lists groups, channels and
+# run attributes. Channels are plain typed arrays, readers memory map them and
+# only touch the channels they use (no unpickling of the whole run).
+#
+#   log_dir/
+#     meta.json
+#     pathglobal.X.npy
+#     trajcl.vx.npy
+#     ...
+
+META_FILENAME = "meta.json"
+
+# json encoding of numpy scalars and arrays in attributes
+def toJson(val):
+    if (isinstance(val, np.ndarray)):
+        return val.tolist()
+    if (isinstance(val, np.generic)):
+        return val.item()
+    raise TypeError("not json serializable: " + repr(val))
+
+# Writes a columnar log. Tables are preallocated with a fixed capacity and
+# appended to in place, fixed size arrays can be stored as they are.
+class ExpLogWriter:
+    def __init__(self, log_dir, attrs=None):
+        self.log_dir = log_dir
+        self.attrs = dict(attrs) if attrs else {}
+        self.groups = {}  # name: {channel: array}
+        self.counts = {}  # name: nr of rows appended (tables only)
+        self.group_attrs = {}
+
+    # preallocated table with one column per channel
+    def addTable(self, group, channels, capacity, dtype=np.float64):
+        self.groups[group] = dict((ch, np.zeros(capacity, dtype=dtype)) for ch in channels)
+        self.counts[group] = 0
+        self.group_attrs[group] = {}
+
+    # append one row, channels not given are left at zero
+    def append(self, group, **values):
+        i = self.counts[group]
+        table = self.groups[group]
+        for ch, val in values.items():
+            table[ch][i] = val
+        self.counts[group] = i + 1
+
+    def full(self, group):
+        return self.counts[group] >= len(next(iter(self.groups[group].values())))
+
+    def size(self, group):
+        return self.counts[group]
+
+    # store a dict of arrays as a group, scalars are stored as group attributes
+    def setArrays(self, group, arrays):
+        self.groups[group] = {}
+        self.group_attrs[group] = {}
+        for ch, val in arrays.items():
+            if (np.isscalar(val)):
+                self.group_attrs[group][ch] = float(val)
+            else:
+                self.groups[group][ch] = np.array(val)
+        self.counts.pop(group, None)
+
+    def setAttrs(self, **attrs):
+        self.attrs.update(attrs)
+
+    # write all groups (tables trimmed to appended rows) and meta.json
+    def save(self):
+        if (not os.path.isdir(self.log_dir)):
+            os.makedirs(self.log_dir)
+        meta = {"attrs": self.attrs, "groups": {}}
+        for group, channels in self.groups.items():
+            n = self.counts.get(group, None)
+            meta_channels = {}
+            for ch, arr in channels.items():
+                if (n is not None):
+                    arr = arr[0:n]
+                np.save(os.path.join(self.log_dir, "%s.%s.npy" %(group, ch)), arr)
+                meta_channels[ch] = {"dtype": str(arr.dtype), "shape": list(arr.shape)}
+            meta["groups"][group] = {"channels": meta_channels, "attrs": self.group_attrs.get(group, {})}
+        with open(os.path.join(self.log_dir, META_FILENAME), "w") as f:
+            json.dump(meta, f, indent=2, sort_keys=True, default=toJson)
+        return self.log_dir
+
+# Lazily loaded group of a log, indexable like the dicts of the legacy format.
+# Channels are memory mapped on first access, assigned values override the file.
+class ExpLogGroup:
+    def __init__(self, log_dir, name, channels, attrs, mmap_mode='r'):
+        self.log_dir = log_dir
+        self.name = name
+        self.channels = list(channels)
+        self.attrs = dict(attrs)
+        self.mmap_mode = mmap_mode
+        self.cache = {}
+
+    def __getitem__(self, ch):
+        if (ch in self.cache):
+            return self.cache[ch]
+        if (ch in self.attrs):
+            return self.attrs[ch]
+        if (ch not in self.channels):
+            raise KeyError(ch)
+        arr = np.load(os.path.join(self.log_dir, "%s.%s.npy" %(self.name, ch)), mmap_mode=self.mmap_mode)
+        self.cache[ch] = arr
+        return arr
+
+    def __setitem__(self, ch, val):
+        self.cache[ch] = val
+
+    def __contains__(self, ch):
+        return ch in self.cache or ch in self.channels or ch in self.attrs
+
+    def keys(self):
+        return list(set(self.channels) | set(self.attrs.keys()) | set(self.cache.keys()))
+
+    def get(self, ch, default=None):
+        if (ch in self):
+            return self[ch]
+        return default
+
+# Reader of a log dir. For legacy logs (single pickled dict saved with np.save)
+# the groups are the plain dicts of the file.
+class ExpLog:
+    def __init__(self, path, mmap_mode='r'):
+        self.path = path
+        if (os.path.isdir(path)):
+            with open(os.path.join(path, META_FILENAME)) as f:
+                meta = json.load(f)
+            self.attrs = meta["attrs"]
+            self.groups = {}
+            for name, g in meta["groups"].items():
+                self.groups[name] = ExpLogGroup(path, name, g["channels"].keys(), g["attrs"], mmap_mode)
+        else:
+            self.attrs = {}
+            self.groups = np.load(path, allow_pickle=True).item()
+
+    def __getitem__(self, group):
+        return self.groups[group]
+
+    def __contains__(self, group):
+        return group in self.groups
+
+    def keys(self):
+        return list(self.groups.keys())
+
+# True if path is a log dir or a legacy log file
+def isExplog(path):
+    if (os.path.isdir(path)):
+        return os.path.isfile(os.path.join(path, META_FILENAME))
+    return path.endswith(".npy") and os.path.isfile(path)
+
+def loadExplog(path, mmap_mode='r'):
+    return ExpLog(path, mmap_mode)
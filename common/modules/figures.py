@@ -0,0 +1,256 @@
+import numpy as np
+import matplotlib.pyplot as plt
+import matplotlib.gridspec as gridspec
+from matplotlib.collections import LineCollection
+from coordinate_transforms import ptsFrenetToCartesian
+from downsample import lttbIndices
+from downsample import axesMaxPoints
+from downsample import plotLod
+
+# Figure families of the evaluation scripts, as functions that take the loaded
+# logs and return the figure. Used interactively by log_eval.py,
+# tamp_scenario_plot.py and friction_circle_plots.py, and headless by
+# render_figures.py. Nothing here shows or saves figures.
+# Lines are downsampled to the resolution of their axes (downsample.py), such
+# that full rate logs of whole runs can be plotted.
+
+# line colored by vx, downsampled to at most n_max points if given
+def getcolorlineXYvx(x,y,vx,n_max=None):
+    if (n_max is not None and len(x) > n_max):
+        idx = lttbIndices(x, y, n_max)
+        x, y, vx = np.asarray(x)[idx], np.asarray(y)[idx], np.asarray(vx)[idx]
+    points = np.array([x, y]).T.reshape(-1, 1, 2)
+    segments = np.concatenate([points[:-1], points[1:]], axis=1)
+    norm = plt.Normalize(vx.min(), vx.max())
+    lc = LineCollection(segments, cmap='plasma', norm=norm)
+    lc.set_array(vx)
+    lc.set_linewidth(3)
+    return lc
+
+# overview of one explog: top view, states, ctrls and tire forces vs limits
+def figLogEval(log):
+    pathglobal = log["pathglobal"]
+    trajstar = log["trajstar"]
+    trajcl = log["trajcl"]
+    t_cl = np.array(trajcl["t"]) - trajcl["t"][0]
+    t_star = np.array(trajstar["t"])
+
+    f0 = plt.figure(figsize=(20, 10), constrained_layout=True)
+    gs = gridspec.GridSpec(ncols=3, nrows=5, figure=f0)
+    # top view
+    f0_ax0 = f0.add_subplot(gs[0:2, 0])
+    f0_ax0.set_title("top view")
+
+    # states
+    f0_ax1 = f0.add_subplot(gs[0, 1])
+    f0_ax1.set_title("psi")
+    f0_ax2 = f0.add_subplot(gs[1, 1])
+    f0_ax2.set_title("psidot")
+    f0_ax3 = f0.add_subplot(gs[2, 1])
+    f0_ax3.set_title("vx")
+    f0_ax4 = f0.add_subplot(gs[3, 1])
+    f0_ax4.set_title("vy")
+    f0_ax5 = f0.add_subplot(gs[4, 1])
+    f0_ax5.set_title("ax")
+
+    # ctrls
+    f0_ax6 = f0.add_subplot(gs[0, 2])
+    f0_ax6.set_title("Fyf (u1)")
+    f0_ax7 = f0.add_subplot(gs[1, 2])
+    f0_ax7.set_title("Fx")
+    f0_ax8 = f0.add_subplot(gs[2, 2])
+    f0_ax8.set_title("Fxr (u3)")
+    f0_ax9 = f0.add_subplot(gs[3, 2])
+    f0_ax9.set_title("Ff")
+    f0_ax10 = f0.add_subplot(gs[4, 2])
+    f0_ax10.set_title("Fr")
+
+    #
+    # OVERHEAD VIEW
+    #
+
+    # global path
+    Xll,Yll = ptsFrenetToCartesian(np.array(pathglobal['s']), \
+                                     np.array(pathglobal['dub']), \
+                                     np.array(pathglobal['X']), \
+                                     np.array(pathglobal['Y']), \
+                                     np.array(pathglobal['psi_c']), \
+                                     np.array(pathglobal['s']))
+    Xrl,Yrl = ptsFrenetToCartesian(np.array(pathglobal['s']), \
+                                     np.array(pathglobal['dlb']), \
+                                     np.array(pathglobal['X']), \
+                                     np.array(pathglobal['Y']), \
+                                     np.array(pathglobal['psi_c']), \
+                                     np.array(pathglobal['s']))
+
+    n_max = axesMaxPoints(f0_ax0)
+    for X, Y in [(Xll, Yll), (Xrl, Yrl)]:
+        idx = lttbIndices(X, Y, n_max)
+        f0_ax0.plot(X[idx],Y[idx],'k')
+
+    # planned traj
+    f0_ax0.add_collection(getcolorlineXYvx(np.array(trajstar["X"]),np.array(trajstar["Y"]),np.array(trajstar["vx"]),n_max))
+
+    # closed loop traj
+    line_trajcl = f0_ax0.add_collection(getcolorlineXYvx(np.array(trajcl["X"]),np.array(trajcl["Y"]),np.array(trajcl["vx"]),n_max))
+    f0.colorbar(line_trajcl,ax=f0_ax0)
+
+    # settings plotwindow
+    f0_ax0.axis("equal")
+    f0_ax0.set_facecolor('lightgray')
+    f0_ax0.set_xlim(min([min(trajcl["X"]),min(trajstar["X"])]), max([max(trajcl["X"]),max(trajstar["X"])]))
+    f0_ax0.set_ylim(min([min(trajcl["Y"]),min(trajstar["Y"])]), max([max(trajcl["Y"]),max(trajstar["Y"])]))
+    f0_ax0.set_xlabel("X")
+    f0_ax0.set_ylabel("Y")
+
+    #
+    # states
+    #
+    for ax, key in [(f0_ax1, "psi"), (f0_ax2, "psidot"), (f0_ax3, "vx"), (f0_ax4, "vy")]:
+        plotLod(ax,t_star,trajstar[key],'m--')
+        plotLod(ax,t_cl,trajcl[key],'k')
+        ax.legend(["planned","actual"])
+
+    # ax
+    dt = 0.1
+    ax_star = np.diff(trajstar["vx"])/dt
+    ax_cl = np.diff(trajcl["vx"])/dt
+    plotLod(f0_ax5,t_star[0:-1],ax_star,'m--')
+    plotLod(f0_ax5,t_cl[0:-1],ax_cl,'k')
+    f0_ax5.legend(["planned","actual"])
+
+    #
+    # ctrls
+    #
+    plotLod(f0_ax6,t_star[0:-1],trajstar["Fyf"],'m.')
+    plotLod(f0_ax6,t_cl,trajcl["Fyf"],'k')
+    f0_ax6.legend(["planned","actual"])
+
+    plotLod(f0_ax7,t_star[0:-1],np.array(trajstar["Fxf"])+np.array(trajstar["Fxr"]),'m.')
+    plotLod(f0_ax7,t_cl,trajcl["Fx"],'k')
+    f0_ax7.legend(["planned", "actual"])
+
+    #
+    # total tire forces
+    #
+    mu = np.interp(trajstar["s"],pathglobal["s"],pathglobal["mu"])
+
+    Ff = np.sqrt(np.array(trajstar["Fxf"])**2+np.array(trajstar["Fyf"])**2)
+    plotLod(f0_ax9,t_star[0:-1],Ff,'m.')
+    Ffmax = mu[0:-1]*trajstar["Fzf"]
+    plotLod(f0_ax9,t_star[0:-1],Ffmax,'b--')
+    f0_ax9.legend(["planned","boundary"])
+
+    Fr = np.sqrt(np.array(trajstar["Fxr"])**2+np.array(trajstar["Fyr"])**2)
+    plotLod(f0_ax10,t_star[0:-1],Fr,'m.')
+    Frmax = mu[0:-1]*trajstar["Fzr"]
+    plotLod(f0_ax10,t_star[0:-1],Frmax,'b--')
+    f0_ax10.legend(["planned","boundary"])
+    return f0
+
+# planned tire forces and limits of an explog
+def getTireForces(log):
+    pathglobal = log["pathglobal"]
+    trajstar = log["trajstar"]
+    mu = np.interp(trajstar["s"],pathglobal["s"],pathglobal["mu"])
+    Ffmax = mu[0:-1]*trajstar["Fzf"]
+    Frmax = mu[0:-1]*trajstar["Fzr"]
+    Ff = np.sqrt(np.array(trajstar["Fxf"])**2+np.array(trajstar["Fyf"])**2)
+    Fr = np.sqrt(np.array(trajstar["Fxr"])**2+np.array(trajstar["Fyr"])**2)
+    return Ff, Ffmax, Fr, Frmax
+
+# not adapting vs adapting run of a scenario (reducedmuturn shows vx, others deltapsi)
+def figScenarioComparison(log_nonadapt, log_adapt, scenario):
+    trajcl_nonadapt = log_nonadapt["trajcl"]
+    trajcl_adapt = log_adapt["trajcl"]
+    Ff_nonadapt, Ffmax_nonadapt, Fr_nonadapt, Frmax_nonadapt = getTireForces(log_nonadapt)
+    Ff_adapt, Ffmax_adapt, Fr_adapt, Frmax_adapt = getTireForces(log_adapt)
+
+    # time axes
+    t = trajcl_nonadapt["t"]
+    t_pred = np.array(log_nonadapt["trajstar"]["t"])
+
+    with plt.rc_context({'font.size': 12}):
+        f, axes = plt.subplots(2, 2, sharex='col', figsize=(8, 5))
+        # d
+        plotLod(axes[0,0],t,trajcl_nonadapt["d"],'b')
+        plotLod(axes[0,0],t,trajcl_adapt["d"],'r')
+        axes[0,0].set_ylabel("$d$ (m)")
+        axes[0,0].legend(["not adapting","adapting"])
+        # vx
+        if(scenario == "reducedmuturn"):
+            plotLod(axes[1,0],t,trajcl_nonadapt["vx"],'b')
+            plotLod(axes[1,0],t,trajcl_adapt["vx"],'r')
+            axes[1,0].set_ylabel("$v_x$ (m/s)")
+        else:
+            plotLod(axes[1,0],t,trajcl_nonadapt["deltapsi"],'b')
+            plotLod(axes[1,0],t,trajcl_adapt["deltapsi"],'r')
+            axes[1,0].set_ylabel("$\Delta \psi$ (rad)")
+        axes[1,0].set_xlabel("$t_{real}$ (s)")
+
+        # Ff
+        plotLod(axes[0,1],t_pred[0:-1],0.001*Ff_nonadapt,'b.')
+        plotLod(axes[0,1],t_pred[0:-1],0.001*Ffmax_nonadapt,'b--')
+        plotLod(axes[0,1],t_pred[0:-1],0.001*Ff_adapt,'r.')
+        plotLod(axes[0,1],t_pred[0:-1],0.001*Ffmax_adapt,'r--')
+        axes[0,1].set_ylabel("$F_f$ (kN)")
+        # Fr
+        plotLod(axes[1,1],t_pred[0:-1],0.001*Fr_nonadapt,'b.')
+        plotLod(axes[1,1],t_pred[0:-1],0.001*Frmax_nonadapt,'b--')
+        plotLod(axes[1,1],t_pred[0:-1],0.001*Fr_adapt,'r.')
+        plotLod(axes[1,1],t_pred[0:-1],0.001*Frmax_adapt,'r--')
+        axes[1,1].set_ylabel("$F_r$ (kN)")
+        axes[1,1].set_xlabel("$t_{predicted}$ (s)")
+    return f
+
+# friction circles of front and rear axle (dry, wet, snow x accelerating, constant speed, braking)
+def figFrictionCircles(lf=1.1936, lr=1.7904, m=2900, h_cg=0.75, g=9.82):
+    mu = np.array([1.0, 0.8, 0.3]) # dry, wet, snow
+    ax = np.array([g/2, 0, -g/2]) # accelerating, constant speed, braking
+    theta = 0
+    Fzf = (1.0/(lf+lr))*(m*ax*h_cg - m*g*h_cg*np.sin(theta) + m*g*lr*np.cos(theta))
+    Fzr = (1.0/(lf+lr))*(-m*ax*h_cg + m*g*h_cg*np.sin(theta) + m*g*lf*np.cos(theta))
+
+    # configure plot window
+    cols = ['Front', 'Rear']
+    rows = ['Dry', 'Wet', 'Snow']
+    fig, axes = plt.subplots(nrows=3, ncols=2, figsize=(6.2, 8),subplot_kw={'aspect': 'equal'})
+    plt.setp(axes[:,0].flat, xlabel='Fxf', ylabel='Fyf')
+    plt.setp(axes[:,1].flat, xlabel='Fxr', ylabel='Fyr')
+
+    pad = 5 # in points
+    for a, col in zip(axes[0], cols):
+        a.annotate(col, xy=(0.5, 1), xytext=(0, pad),
+                   xycoords='axes fraction', textcoords='offset points',
+                   size='large', ha='center', va='baseline')
+    for a, row in zip(axes[:,0], rows):
+        a.annotate(row, xy=(0, 0.5), xytext=(-a.yaxis.labelpad - pad, 0),
+                   xycoords=a.yaxis.label, textcoords='offset points',
+                   size='large', ha='right', va='center')
+    fig.tight_layout()
+    # tight_layout doesn't take the row labels into account (manually tweaked)
+    fig.subplots_adjust(left=0.15, top=0.95)
+
+    linestyles = ['--','-',':']
+    colors = ['whitesmoke','gainsboro','darkgray']
+    phi = np.linspace(0, 2*np.pi, 100)
+
+    # fill plots, largest circle first
+    for i in range(mu.size):
+        for j in range(Fzf.size):
+            Ff = mu[i]*Fzf[j]
+            axes[i,0].fill(Ff*np.cos(phi),Ff*np.sin(phi),facecolor=colors[j], edgecolor='black', linestyle=linestyles[j], linewidth=1.5)
+        for j in reversed(range(Fzf.size)):
+            Fr = mu[i]*Fzr[j]
+            axes[i,1].fill(Fr*np.cos(phi),Fr*np.sin(phi),facecolor=colors[j], edgecolor='black', linestyle=linestyles[j], linewidth=1.5)
+    # adjust ranges
+    plt.setp(axes, xlim=axes[0,0].get_xlim(), ylim=axes[0,0].get_ylim())
+
+    # scientific notation
+    for a in axes.flat:
+        a.ticklabel_format(style='sci', axis='y', scilimits=(0, 0))
+        a.ticklabel_format(style='sci', axis='x', scilimits=(0, 0))
+
+    # set legend
+    axes[2,1].legend(['accelerating', 'constant speed', 'braking'])
+    return fig
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+
+'''
+Description: Vectorized metrics (KPIs) of experiment logs
+    - explog (planned traj and closed loop snapshot): tire utilization of the
+      planned traj, tracking error, road margin
+    - runlog (whole run at full rate): closed loop tire utilization, constraint
+      violation times, lateral deviation and lap times
+    - evaluates all runs below a dir on a process pool, one row per run in a csv
+Usage:
+    metrics = runMetrics(run_dir)
+    python log_metrics.py <log root> -j <processes> -o summary.csv [--catalog catalog.db]
+'''
+
+import os
+import sys
+import csv
+import argparse
+import multiprocessing
+import numpy as np
+from explog import isExplog
+from explog import loadExplog
+
+EPS = 1e-9
+
+# |F|/(mu*Fz), elementwise
+def tireUtilization(Fx, Fy, mu, Fz):
+    return np.sqrt(Fx**2 + Fy**2)/np.maximum(mu*Fz, EPS)
+
+# axle loads with longitudinal load transfer, same model as the planner (flat road)
+def axleLoads(ax, m, g, lf, lr, h_cg):
+    l = lf + lr
+    Fzf = (m*ax*h_cg + m*g*lr)/l
+    Fzr = (-m*ax*h_cg + m*g*lf)/l
+    return Fzf, Fzr
+
+# total time in which x > threshold (zero order hold between samples)
+def timeAbove(t, x, threshold):
+    if (len(t) < 2):
+        return 0.0
+    return float(np.sum(np.diff(t)[x[0:-1] > threshold]))
+
+def rms(x):
+    if (len(x) == 0):
+        return np.nan
+    return float(np.sqrt(np.mean(np.square(x))))
+
+# times of completed laps, a lap is completed when s wraps around
+def lapTimes(t, s, s_lap):
+    i_wrap = np.nonzero(np.diff(s) < -0.5*s_lap)[0] + 1
+    return np.diff(t[i_wrap])
+
+# road margin of the vehicle edges (negative: outside the road)
+def roadMargin(s, d, pathglobal, width=0.0):
+    dub = np.interp(s, pathglobal["s"], pathglobal["dub"])
+    dlb = np.interp(s, pathglobal["s"], pathglobal["dlb"])
+    return np.minimum(dub - d, d - dlb) - 0.5*width
+
+# KPIs of an explog (pathglobal, trajstar, trajcl)
+def explogMetrics(log, vehicle=None):
+    vehicle = vehicle if vehicle is not None else log.attrs.get("vehicle", None)
+    pathglobal = log["pathglobal"]
+    trajstar = log["trajstar"]
+    trajcl = log["trajcl"]
+    width = vehicle["width"] if vehicle else 0.0
+
+    # closed loop
+    t = np.array(trajcl["t"])
+    s = np.array(trajcl["s"])
+    d = np.array(trajcl["d"])
+    vx = np.array(trajcl["vx"])
+    margin = roadMargin(s, d, pathglobal, width)
+    metrics = {
+      "t_log": t[-1] - t[0],
+      "s_log": s[-1] - s[0],
+      "vx_mean": np.mean(vx),
+      "vx_max": np.max(vx),
+      "d_min": np.min(d),
+      "d_max": np.max(d),
+      "d_rms": rms(d),
+      "d_margin_min": np.min(roadMargin(s, d, pathglobal)),
+      "t_road_violation": timeAbove(t, -margin, 0.0),
+      "ay_absmax": np.max(np.abs(trajcl["ay"])),
+    }
+
+    # tracking error of the closed loop w.r.t. the planned traj (over the planning horizon)
+    t_star = np.array(trajstar["t"])
+    t_rel = t - t[0]
+    inside = t_rel <= t_star[-1]
+    metrics["track_err_d_rms"] = rms(d[inside] - np.interp(t_rel[inside], t_star, trajstar["d"]))
+    metrics["track_err_vx_rms"] = rms(vx[inside] - np.interp(t_rel[inside], t_star, trajstar["vx"]))
+
+    # planned tire utilization (forces are given per interval, N values)
+    n = len(trajstar["Fyf"])
+    mu = np.interp(np.array(trajstar["s"])[0:n], pathglobal["s"], pathglobal["mu"])
+    util_f = tireUtilization(np.array(trajstar["Fxf"]), np.array(trajstar["Fyf"]), mu, np.array(trajstar["Fzf"])[0:n])
+    util_r = tireUtilization(np.array(trajstar["Fxr"]), np.array(trajstar["Fyr"]), mu, np.array(trajstar["Fzr"])[0:n])
+    metrics.update({
+      "util_plan_f_peak": np.max(util_f),
+      "util_plan_r_peak": np.max(util_r),
+      "util_plan_mean": np.mean(np.maximum(util_f, util_r)),
+      "n_util_plan_violation": int(np.sum(np.maximum(util_f, util_r) > 1.0)),
+    })
+
+    # closed loop tire utilization (needs vehicle params for the normal loads)
+    if (vehicle):
+        metrics.update(closedLoopUtilization(t, s, np.array(trajcl["ax"]), np.array(trajcl["Fx"]),
+                                             np.array(trajcl["Fyf"]), np.array(trajcl["Fyr"]),
+                                             np.interp(s, pathglobal["s"], pathglobal["mu"]), vehicle, "util_cl"))
+    return dict((k, float(v)) for k, v in metrics.items())
+
+# front axle: lateral force only, rear axle: lateral and longitudinal force (rear wheel drive)
+def closedLoopUtilization(t, s, ax, Fx, Fyf, Fyr, mu, vehicle, prefix):
+    Fzf, Fzr = axleLoads(ax, vehicle["m"], vehicle["g"], vehicle["lf"], vehicle["lr"], vehicle["h_cg"])
+    util_f = tireUtilization(0.0, Fyf, mu, Fzf)
+    util_r = tireUtilization(Fx, Fyr, mu, Fzr)
+    util = np.maximum(util_f, util_r)
+    return {
+      prefix + "_f_peak": np.max(util_f),
+      prefix + "_r_peak": np.max(util_r),
+      prefix + "_mean": np.mean(util),
+      prefix + "_p95": np.percentile(util, 95),
+      "t_" + prefix + "_violation": timeAbove(t, util, 1.0),
+    }
+
+# KPIs of a runlog (whole run), pathglobal from the explog of the run if available
+def runlogMetrics(log, vehicle=None, pathglobal=None):
+    vehicle = vehicle if vehicle is not None else log.attrs.get("vehicle", None)
+    state = log["state"]
+    t = np.array(state["t"])
+    if (t.size < 2):
+        return {}
+    s = np.array(state["s"])
+    d = np.array(state["d"])
+    vx = np.array(state["vx"])
+    metrics = {
+      "run_t": t[-1] - t[0],
+      "run_vx_mean": np.mean(vx),
+      "run_vx_max": np.max(vx),
+      "run_d_rms": rms(d),
+      "run_ay_absmax": np.max(np.abs(state["ay"])),
+      "run_n_dropped": sum([log[g].attrs.get("n_dropped", 0) for g in log.keys()]),
+    }
+
+    # laps
+    s_lap = log.attrs.get("s_lap", None)
+    if (s_lap):
+        laps = lapTimes(t, s, s_lap)
+        metrics["run_n_laps"] = len(laps)
+        if (len(laps)):
+            metrics["run_lap_time_min"] = np.min(laps)
+            metrics["run_lap_time_mean"] = np.mean(laps)
+
+    # road margin
+    if (pathglobal is not None):
+        margin = roadMargin(s, d, pathglobal, vehicle["width"] if vehicle else 0.0)
+        metrics["run_d_margin_min"] = np.min(margin)
+        metrics["run_t_road_violation"] = timeAbove(t, -margin, 0.0)
+
+    # tire utilization, forces and mu resampled to the state samples
+    car_info = log["car_info"]
+    tire_params = log["tire_params"]
+    t_ci = np.array(car_info["t"])
+    t_tp = np.array(tire_params["t"])
+    if (vehicle and t_ci.size > 1 and t_tp.size > 0):
+        i_mu = np.clip(np.searchsorted(t_tp, t, side="right") - 1, 0, t_tp.size - 1) # mu changes stepwise
+        mu = np.array(tire_params["mu"])[i_mu]
+        metrics.update(closedLoopUtilization(t, s, np.array(state["ax"]),
+                                             np.interp(t, t_ci, car_info["Fx"]),
+                                             np.interp(t, t_ci, car_info["Fyf"]),
+                                             np.interp(t, t_ci, car_info["Fyr"]),
+                                             mu, vehicle, "run_util"))
+    return dict((k, float(v)) for k, v in metrics.items())
+
+# all metrics of a run, path: run dir (with explog and/or runlog) or path of an explog
+def runMetrics(path):
+    if (isExplog(path) and not os.path.isdir(os.path.join(path, "explog"))):
+        explog_path = path
+        runlog_path = os.path.join(os.path.dirname(path), "runlog")
+    else:
+        explog_path = os.path.join(path, "explog")
+        runlog_path = os.path.join(path, "runlog")
+    metrics = {}
+    pathglobal = None
+    if (isExplog(explog_path)):
+        explog = loadExplog(explog_path)
+        metrics.update(explogMetrics(explog))
+        pathglobal = explog["pathglobal"]
+    if (isExplog(runlog_path)):
+        metrics.update(runlogMetrics(loadExplog(runlog_path), pathglobal=pathglobal))
+    return metrics
+
+# run dirs below root (dirs that contain an explog or a runlog)
+def findRuns(root):
+    runs = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        if (isExplog(os.path.join(dirpath, "explog")) or isExplog(os.path.join(dirpath, "runlog"))):
+            runs.append(dirpath)
+            dirnames[:] = [] # logs are not nested
+    return sorted(runs)
+
+def evaluateRun(path):
+    try:
+        return path, runMetrics(path), ""
+    except Exception as e:
+        return path, {}, str(e)
+
+# metrics of all runs on a process pool, list of (path, metrics, error)
+def evaluateRuns(paths, jobs=None):
+    if (jobs == 1 or len(paths) < 2):
+        return [evaluateRun(p) for p in paths]
+    pool = multiprocessing.Pool(jobs)
+    try:
+        return pool.map(evaluateRun, paths, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+def writeSummary(results, filepath):
+    fields = ["run"]
+    for path, metrics, error in results:
+        for k in sorted(metrics.keys()):
+            if (k not in fields):
+                fields.append(k)
+    fields.append("error")
+    with open(filepath, "w") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for path, metrics, error in results:
+            row = dict(metrics)
+            row.update({"run": path, "error": error})
+            writer.writerow(row)
+
+def main():
+    parser = argparse.ArgumentParser(description="Computes metrics of all runs below a dir")
+    parser.add_argument("root", help="log root (run dirs are searched recursively)")
+    parser.add_argument("-j", "--jobs", type=int, default=multiprocessing.cpu_count(), help="number of processes")
+    parser.add_argument("-o", "--output", default="summary.csv", help="summary csv")
+    parser.add_argument("--catalog", default="", help="also store the metrics in this run catalog")
+    args = parser.parse_args()
+
+    runs = findRuns(args.root)
+    results = evaluateRuns(runs, args.jobs)
+    writeSummary(results, args.output)
+    n_failed = len([r for r in results if r[2]])
+    print("metrics: %i runs, %i failed, summary in %s" %(len(results), n_failed, args.output))
+
+    if (args.catalog):
+        from run_catalog import RunCatalog
+        catalog = RunCatalog(args.catalog)
+        for path, metrics, error in results:
+            run_id = os.path.basename(os.path.normpath(path))
+            if (metrics and catalog.hasRun(run_id)):
+                catalog.setMetrics(run_id, metrics)
+        catalog.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
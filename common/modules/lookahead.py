@@ -0,0 +1,40 @@
+import numpy as np
+
+# speed scheduled lookahead distance for pure pursuit
+def getLookaheadDistance(vx, t_lh, lhdist_min, lhdist_max):
+    return min(max(t_lh*vx, lhdist_min), lhdist_max)
+
+# cumulative arc length of a polyline
+def getArcLength(X, Y):
+    ds = np.sqrt(np.diff(X)**2 + np.diff(Y)**2)
+    return np.concatenate(([0.0], np.cumsum(ds)))
+
+# Polyline with precomputed arc length parametrization. Points at given arc
+# length are located by binary search and linear interpolation, so lookups
+# are O(log n) regardless of path resolution. Queries can be scalars or arrays.
+class LookaheadPath:
+    def __init__(self):
+        self.data = None # (s, X, Y), swapped as one to be thread safe
+
+    # s: arc length parameter of the pts, computed from X and Y if not given
+    def update(self, X, Y, s=None):
+        X = np.array(X, dtype=float)
+        Y = np.array(Y, dtype=float)
+        if (s is None):
+            s = getArcLength(X, Y)
+        else:
+            s = np.array(s, dtype=float)
+        self.data = (s, X, Y)
+
+    def ready(self):
+        return self.data is not None
+
+    # X and Y at arc length s_query (clamped to the ends of the path)
+    def getPoint(self, s_query):
+        s, X, Y = self.data
+        i = np.searchsorted(s, s_query, side='right') - 1
+        i = np.clip(i, 0, s.size - 2)
+        frac = np.clip((s_query - s[i])/(s[i+1] - s[i]), 0.0, 1.0)
+        Xq = X[i] + frac*(X[i+1] - X[i])
+        Yq = Y[i] + frac*(Y[i+1] - Y[i])
+        return Xq, Yq
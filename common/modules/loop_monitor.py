@@ -0,0 +1,120 @@
+import time
+import numpy as np
+
+# Executes the sleep of a fixed rate loop and records per iteration timing in
+# preallocated ring buffers:
+# - period:   time between start of consecutive iterations (loop clock)
+# - comptime: time spent computing in the iteration (wall clock)
+# - overrun:  missed deadline, i.e. comptime > dt or period > (1+period_tol)*dt
+# Persistent overruns (overrun_limit within the last overrun_window iterations)
+# set the degraded flag, it is cleared again once the window has recovered to
+# half the limit.
+class LoopMonitor:
+    def __init__(self, dt, sleep_fcn, now_fcn=time.time, n_log=1000, overrun_window=100, overrun_limit=20, period_tol=0.5):
+        self.dt = dt
+        self.sleep_fcn = sleep_fcn # e.g. rospy.Rate.sleep
+        self.now_fcn = now_fcn     # clock driving the loop, e.g. rospy.get_time
+        self.period_tol = period_tol
+
+        # log buffers
+        self.n_log = n_log
+        self.period = np.zeros(n_log)
+        self.comptime = np.zeros(n_log)
+        self.overrun = np.zeros(n_log, dtype=bool)
+        self.idx = -1
+        self.count = 0
+
+        # sliding window of overruns
+        self.window = np.zeros(overrun_window, dtype=np.int8)
+        self.window_idx = 0
+        self.window_sum = 0
+        self.overrun_limit = overrun_limit
+        self.degraded = False
+
+        # totals since start
+        self.n_iterations = 0
+        self.n_overruns = 0
+        self.comptime_max = 0.0
+        self.period_max = 0.0
+
+        self.t_start = None
+        self.t_start_wall = None
+
+    # mark start of iteration, called automatically by sleep
+    def start(self):
+        t = self.now_fcn()
+        t_wall = time.time()
+        period = 0.0
+        if (self.t_start is not None):
+            period = t - self.t_start
+        self.t_start = t
+        self.t_start_wall = t_wall
+        return period
+
+    # records compute time of current iteration and sleeps until next deadline
+    def sleep(self):
+        if (self.t_start is None):
+            self.sleep_fcn()
+            self.start()
+            return
+        comptime = time.time() - self.t_start_wall
+        self.sleep_fcn()
+        period = self.start()
+        self.record(period, comptime)
+
+    def record(self, period, comptime):
+        overrun = comptime > self.dt or period > (1.0 + self.period_tol)*self.dt
+
+        self.idx = (self.idx + 1) % self.n_log
+        self.period[self.idx] = period
+        self.comptime[self.idx] = comptime
+        self.overrun[self.idx] = overrun
+        if (self.count < self.n_log):
+            self.count += 1
+
+        self.n_iterations += 1
+        if (overrun):
+            self.n_overruns += 1
+        if (comptime > self.comptime_max):
+            self.comptime_max = comptime
+        if (period > self.period_max):
+            self.period_max = period
+
+        # update sliding window and degraded flag
+        self.window_sum += int(overrun) - self.window[self.window_idx]
+        self.window[self.window_idx] = int(overrun)
+        self.window_idx = (self.window_idx + 1) % self.window.size
+        if (self.window_sum >= self.overrun_limit):
+            self.degraded = True
+        elif (self.degraded and self.window_sum <= self.overrun_limit/2):
+            self.degraded = False
+
+    # timing statistics over the logged iterations
+    def getStats(self):
+        n = self.count
+        if (n == 0):
+            return {}
+        period = self.period[0:n]
+        comptime = self.comptime[0:n]
+        return {
+          "n_iterations": self.n_iterations,
+          "n_overruns": self.n_overruns,
+          "overrun_ratio": np.mean(self.overrun[0:n]),
+          "period_mean": np.mean(period),
+          "period_std": np.std(period),
+          "period_max": self.period_max,
+          "comptime_mean": np.mean(comptime),
+          "comptime_p99": np.percentile(comptime, 99),
+          "comptime_max": self.comptime_max,
+          "degraded": self.degraded,
+        }
+
+    def getReport(self):
+        st = self.getStats()
+        if (not st):
+            return "no iterations recorded"
+        return "period: %.2f +- %.2f ms (max %.2f), comptime: %.2f ms (p99 %.2f, max %.2f), overruns: %i/%i (recent %.1f %%)%s" \
+               %(1000*st["period_mean"], 1000*st["period_std"], 1000*st["period_max"],
+                 1000*st["comptime_mean"], 1000*st["comptime_p99"], 1000*st["comptime_max"],
+                 st["n_overruns"], st["n_iterations"], 100*st["overrun_ratio"],
+                 ", DEGRADED" if st["degraded"] else "")
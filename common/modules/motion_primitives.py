@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+'''
+Description: Offline library of motion primitives, used as warm start of the planner
+    - one trajectory per grid point (vx, kappa, mu, d): steady state driving on a
+      path of constant curvature kappa and friction mu, starting at lateral offset d
+      with speed vx, rolled out with the saarti rollout controller (rollout.py)
+    - stored as a single float32 array (memory mapped when loaded) plus meta.json
+    - lookup: nearest entry (a view into the table) or multilinear interpolation
+      between the 16 surrounding entries
+Usage:
+    python motion_primitives.py <output dir> --car <fssim car.yaml> [--Nt 40 --dt 0.1]
+    lib = MotionPrimitiveLibrary(<output dir>)
+    traj = lib.warmStart(s, d, vx, kappa, mu)
+'''
+
+import os
+import sys
+import json
+import itertools
+import argparse
+import numpy as np
+import yaml
+from rollout import rolloutBatch
+from rollout import TRAJ_STATES
+from rollout import TRAJ_CTRLS
+
+TABLE_FILENAME = "primitives.npy"
+VALID_FILENAME = "valid.npy"
+META_FILENAME = "meta.json"
+AXES = ["vx", "kappa", "mu", "d"]
+CHANNELS = TRAJ_STATES + TRAJ_CTRLS + ["Fzf", "Fzr", "Cr"] # ctrls padded to Nt+1
+
+DEFAULT_GRID = {
+  "vx": np.linspace(1.0, 29.0, 15).tolist(),
+  "kappa": np.linspace(-0.2, 0.2, 11).tolist(),
+  "mu": [0.3, 0.5, 0.8, 1.0, 1.2],
+  "d": np.linspace(-3.0, 3.0, 9).tolist(),
+}
+
+# rolls out all primitives of the grid, returns table (grid shape + (Nch, Nt+1)) and valid mask
+def generateLibrary(vehicle, grid=None, Nt=40, dt=0.1, Ni=10):
+    grid = grid if grid is not None else DEFAULT_GRID
+    vx_g, kappa_g, mu_g, d_g = np.meshgrid(*[np.asarray(grid[a], dtype=float) for a in AXES], indexing="ij")
+    x_init = [0.0, d_g, 0.0, vx_g*kappa_g, vx_g, 0.0] # s, d, deltapsi, psidot, vx, vy
+    pathvars = lambda s: (kappa_g, mu_g) # constant along the path
+    out = rolloutBatch(x_init, d_g, vx_g, pathvars, vehicle, Nt=Nt, dt=dt, traction_adaptive=1, Ni=Ni)
+
+    table = np.zeros(vx_g.shape + (len(CHANNELS), Nt+1), dtype=np.float32)
+    for i, ch in enumerate(CHANNELS):
+        val = out[ch]
+        if (val.shape[-1] == Nt):
+            val = np.concatenate([val, val[..., -1:]], axis=-1)
+        table[..., i, :] = val
+    valid = np.all(np.isfinite(table), axis=(-2, -1))
+    valid &= np.all(np.abs(1.0 - out["d"]*kappa_g[..., None]) > 0.1, axis=-1) # away from the curvature singularity
+    return table, valid
+
+# library dir: table, valid mask and meta.json (grid, channels, vehicle, dt)
+def saveLibrary(path, table, valid, grid, meta):
+    if (not os.path.isdir(path)):
+        os.makedirs(path)
+    np.save(os.path.join(path, TABLE_FILENAME), table)
+    np.save(os.path.join(path, VALID_FILENAME), valid)
+    meta = dict(meta)
+    meta.update({"axes": AXES, "grid": dict((a, list(grid[a])) for a in AXES), "channels": CHANNELS})
+    with open(os.path.join(path, META_FILENAME), "w") as f:
+        json.dump(meta, f, indent=2, sort_keys=True)
+
+# read only access to a library dir, the table is memory mapped
+class MotionPrimitiveLibrary:
+    def __init__(self, path):
+        with open(os.path.join(path, META_FILENAME)) as f:
+            self.meta = json.load(f)
+        self.table = np.load(os.path.join(path, TABLE_FILENAME), mmap_mode="r")
+        self.valid = np.load(os.path.join(path, VALID_FILENAME))
+        self.axes = [np.asarray(self.meta["grid"][a], dtype=float) for a in AXES]
+        self.channels = self.meta["channels"]
+
+    # index of nearest grid point on each axis
+    def nearestIndex(self, vx, kappa, mu, d):
+        idx = []
+        for axis, x in zip(self.axes, [vx, kappa, mu, d]):
+            i = int(np.searchsorted(axis, x))
+            i = min(max(i, 1), axis.size - 1) if axis.size > 1 else 0
+            if (axis.size > 1 and abs(x - axis[i-1]) <= abs(axis[i] - x)):
+                i -= 1
+            idx.append(i)
+        return tuple(idx)
+
+    # nearest entry, array (Nch, Nt+1) (view into the memory mapped table)
+    def nearest(self, vx, kappa, mu, d):
+        return self.table[self.nearestIndex(vx, kappa, mu, d)]
+
+    # multilinear interpolation between the surrounding entries (clamped at the grid
+    # boundaries), invalid entries are left out and the weights renormalized
+    def interpolate(self, vx, kappa, mu, d):
+        lo, w = [], []
+        for axis, x in zip(self.axes, [vx, kappa, mu, d]):
+            if (axis.size == 1):
+                lo.append(0)
+                w.append(0.0)
+                continue
+            i = min(max(int(np.searchsorted(axis, x)) - 1, 0), axis.size - 2)
+            lo.append(i)
+            w.append(min(max((x - axis[i])/(axis[i+1] - axis[i]), 0.0), 1.0))
+        traj = None
+        wsum = 0.0
+        for corner in itertools.product([0, 1], repeat=len(AXES)):
+            wc = 1.0
+            for c, wi in zip(corner, w):
+                wc *= wi if c else 1.0 - wi
+            idx = tuple(min(l + c, a.size - 1) for l, c, a in zip(lo, corner, self.axes))
+            if (wc <= 0.0 or not self.valid[idx]):
+                continue
+            entry = np.asarray(self.table[idx], dtype=np.float64)
+            traj = wc*entry if traj is None else traj + wc*entry
+            wsum += wc
+        if (traj is None):
+            return np.asarray(self.nearest(vx, kappa, mu, d), dtype=np.float64)
+        return traj/wsum
+
+    # warm start at state (s, d, vx) on a path with curvature kappa and friction mu,
+    # dict of channels with N+1 states and N ctrls
+    def warmStart(self, s, d, vx, kappa, mu, interpolate=True):
+        arr = self.interpolate(vx, kappa, mu, d) if interpolate else np.asarray(self.nearest(vx, kappa, mu, d), dtype=np.float64)
+        traj = dict((ch, arr[i]) for i, ch in enumerate(self.channels))
+        traj["s"] = traj["s"] + s
+        for ch in TRAJ_CTRLS:
+            traj[ch] = traj[ch][0:-1]
+        return traj
+
+# vehicle params from a fssim car.yaml
+def loadVehicle(car_yaml):
+    with open(car_yaml) as f:
+        car = yaml.safe_load(f)
+    return {
+      "m": car["inertia"]["m"],
+      "Iz": car["inertia"]["I_z"],
+      "g": car["inertia"].get("g", 9.81),
+      "lf": car["kinematics"]["b_F"],
+      "lr": car["kinematics"]["b_R"],
+      "h_cg": car["kinematics"].get("h_cg", 0.5),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates a motion primitive library")
+    parser.add_argument("output", help="library dir")
+    parser.add_argument("--car", required=True, help="fssim car.yaml with inertia and kinematics")
+    parser.add_argument("--grid", default="", help="yaml with lists vx, kappa, mu, d (default: DEFAULT_GRID)")
+    parser.add_argument("--Nt", type=int, default=40)
+    parser.add_argument("--dt", type=float, default=0.1)
+    args = parser.parse_args()
+
+    vehicle = loadVehicle(args.car)
+    grid = DEFAULT_GRID
+    if (args.grid):
+        with open(args.grid) as f:
+            grid = yaml.safe_load(f)
+    table, valid = generateLibrary(vehicle, grid, args.Nt, args.dt)
+    saveLibrary(args.output, table, valid, grid, {"vehicle": vehicle, "Nt": args.Nt, "dt": args.dt, "car": os.path.abspath(args.car)})
+    print("motion primitives: %i entries (%i valid), %.1f MB in %s" %(valid.size, np.sum(valid), table.nbytes/1e6, args.output))
+
+if __name__ == '__main__':
+    sys.exit(main())
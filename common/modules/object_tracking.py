@@ -0,0 +1,181 @@
+import numpy as np
+from scipy.spatial import cKDTree
+from rollout import getField
+
+# Multi-object tracking of cartesian detections, output in frenet coordinates.
+#   - PathProjector: batch cartesian -> frenet projection against a path. The
+#     closest path point of each detection is found in a kd-tree of the path
+#     points, the detection is then projected on the two path segments next to
+#     it (instead of the linear search of ptsCartesianToFrenet per point).
+#   - MultiObjectTracker: constant velocity kalman filter in (s, d) per track
+#     (vehicles on the track move at close to constant vs, vd, unlike in X, Y),
+#     all tracks filtered at once. The projected detections are associated to
+#     the predicted tracks within a gate radius (candidates from a kd-tree of
+#     the detections, assigned greedily by distance). Unassigned detections
+#     start tentative tracks, confirmed after n_confirm hits, tracks are
+#     dropped after max_missed consecutive misses.
+
+class PathProjector:
+    # path: Path msg or dict with X, Y, s, s_lap: length of a lap for closed tracks
+    def __init__(self, path, s_lap=None):
+        self.X = getField(path, "X")
+        self.Y = getField(path, "Y")
+        self.s = getField(path, "s")
+        self.s_lap = s_lap
+        self.tree = cKDTree(np.column_stack((self.X, self.Y)))
+
+    # segments from path points i to the next, s at their end
+    def segment(self, i):
+        n = self.s.size
+        if (self.s_lap):
+            i = np.mod(i, n)
+            j = np.mod(i + 1, n)
+            return i, j, np.where(j == 0, self.s[0] + self.s_lap, self.s[j])
+        i = np.clip(i, 0, n - 2)
+        return i, i + 1, self.s[i + 1]
+
+    # s, d of points X, Y
+    def project(self, X, Y):
+        X = np.asarray(X, dtype=float)
+        Y = np.asarray(Y, dtype=float)
+        _, idx = self.tree.query(np.column_stack((X, Y)))
+        best = None
+        for i in [idx - 1, idx]: # segments before and after the closest point
+            i, j, s_end = self.segment(i)
+            dX = self.X[j] - self.X[i]
+            dY = self.Y[j] - self.Y[i]
+            length2 = np.maximum(dX*dX + dY*dY, 1e-12)
+            t = np.clip(((X - self.X[i])*dX + (Y - self.Y[i])*dY)/length2, 0.0, 1.0)
+            dist2 = (X - self.X[i] - t*dX)**2 + (Y - self.Y[i] - t*dY)**2
+            cand = {"dist2": dist2,
+                    "s": self.s[i] + t*(s_end - self.s[i]),
+                    "d": (dX*(Y - self.Y[i]) - dY*(X - self.X[i]))/np.sqrt(length2)} # left of the path positive
+            if (best is None):
+                best = cand
+            else:
+                closer = cand["dist2"] < best["dist2"]
+                best = dict((k, np.where(closer, cand[k], best[k])) for k in best)
+        s = best["s"]
+        if (self.s_lap):
+            s = self.s[0] + np.mod(s - self.s[0], self.s_lap)
+        return s, best["d"]
+
+class MultiObjectTracker:
+    def __init__(self, gate=2.0, sigma_acc=1.0, sigma_pos=0.2, n_confirm=3, max_missed=5, s_lap=None):
+        self.gate = gate
+        self.sigma_acc = sigma_acc # process noise, white acceleration
+        self.sigma_pos = sigma_pos # measurement noise
+        self.n_confirm = n_confirm
+        self.max_missed = max_missed
+        self.s_lap = s_lap # closed track: s wraps around
+        self.x = np.zeros((0, 4)) # s, d, vs, vd
+        self.P = np.zeros((0, 4, 4))
+        self.R = np.zeros(0) # radius of the object
+        self.ids = np.zeros(0, dtype=int)
+        self.hits = np.zeros(0, dtype=int)
+        self.missed = np.zeros(0, dtype=int)
+        self.next_id = 0
+
+    def __len__(self):
+        return self.ids.size
+
+    # difference in s, shortest way around on closed tracks
+    def sdiff(self, ds):
+        if (self.s_lap):
+            return np.mod(ds + 0.5*self.s_lap, self.s_lap) - 0.5*self.s_lap
+        return ds
+
+    def predict(self, dt):
+        F = np.eye(4)
+        F[0, 2] = dt
+        F[1, 3] = dt
+        G = np.array([[0.5*dt**2, 0], [0, 0.5*dt**2], [dt, 0], [0, dt]])
+        Q = self.sigma_acc**2*G.dot(G.T)
+        self.x = self.x.dot(F.T)
+        if (self.s_lap):
+            self.x[:, 0] = np.mod(self.x[:, 0], self.s_lap)
+        self.P = np.einsum("ij,njk,lk->nil", F, self.P, F) + Q
+
+    # pairs (track, detection) within the gate, closest first, each track and
+    # detection used once. Candidates: the k_max closest detections of each track
+    def associate(self, s, d, k_max=4):
+        if (self.ids.size == 0 or s.size == 0):
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        det_idx = np.arange(s.size)
+        if (self.s_lap): # copies one lap before and after, for tracks near the start/finish line
+            s = np.concatenate((s, s - self.s_lap, s + self.s_lap))
+            d = np.concatenate((d, d, d))
+            det_idx = np.tile(det_idx, 3)
+        k = min(k_max, s.size)
+        dist, det = cKDTree(np.column_stack((s, d))).query(self.x[:, 0:2], k=k, distance_upper_bound=self.gate)
+        dist = dist.ravel()
+        det = det.ravel()
+        trk = np.repeat(np.arange(self.ids.size), k)
+        valid = np.isfinite(dist)
+        order = np.argsort(dist[valid], kind="mergesort")
+        used_trk = np.zeros(self.ids.size, dtype=bool)
+        used_det = np.zeros(s.size, dtype=bool)
+        pairs = []
+        for i, j in zip(trk[valid][order], det_idx[det[valid][order]]):
+            if (not used_trk[i] and not used_det[j]):
+                used_trk[i] = True
+                used_det[j] = True
+                pairs.append((i, j))
+        pairs = np.array(pairs, dtype=int).reshape(-1, 2)
+        return pairs[:, 0], pairs[:, 1]
+
+    # kalman update of tracks trk with position measurements z (m, 2)
+    def update(self, trk, z):
+        P = self.P[trk]
+        S = P[:, 0:2, 0:2] + self.sigma_pos**2*np.eye(2)
+        K = np.einsum("nij,njk->nik", P[:, :, 0:2], np.linalg.inv(S))
+        innov = z - self.x[trk, 0:2]
+        innov[:, 0] = self.sdiff(innov[:, 0])
+        self.x[trk] = self.x[trk] + np.einsum("nij,nj->ni", K, innov)
+        self.P[trk] = P - np.einsum("nij,njk->nik", K, P[:, 0:2, :])
+
+    # one step with detections s, d (projected), radius R, dt since the last step
+    def step(self, s, d, R, dt):
+        s = np.asarray(s, dtype=float)
+        d = np.asarray(d, dtype=float)
+        R = np.asarray(R, dtype=float)
+        self.predict(dt)
+        trk, det = self.associate(s, d)
+        if (trk.size > 0):
+            self.update(trk, np.column_stack((s[det], d[det])))
+            self.R[trk] = R[det]
+        assigned = np.zeros(self.ids.size, dtype=bool)
+        assigned[trk] = True
+        self.hits[assigned] += 1
+        self.missed[assigned] = 0
+        self.missed[~assigned] += 1
+
+        # drop lost tracks, tentative tracks are dropped at the first miss
+        keep = (self.missed <= self.max_missed) & ((self.hits >= self.n_confirm) | (self.missed == 0))
+        self.x, self.P, self.R = self.x[keep], self.P[keep], self.R[keep]
+        self.ids, self.hits, self.missed = self.ids[keep], self.hits[keep], self.missed[keep]
+
+        # new tracks from unassigned detections, at rest with a large velocity uncertainty
+        new = np.ones(s.size, dtype=bool)
+        new[det] = False
+        n_new = int(np.sum(new))
+        if (n_new > 0):
+            x_new = np.zeros((n_new, 4))
+            x_new[:, 0] = s[new]
+            x_new[:, 1] = d[new]
+            P_new = np.tile(np.diag([self.sigma_pos**2, self.sigma_pos**2, 100.0, 100.0]), (n_new, 1, 1))
+            self.x = np.vstack((self.x, x_new))
+            self.P = np.concatenate((self.P, P_new), axis=0)
+            self.R = np.concatenate((self.R, R[new]))
+            self.ids = np.concatenate((self.ids, self.next_id + np.arange(n_new)))
+            self.hits = np.concatenate((self.hits, np.ones(n_new, dtype=int)))
+            self.missed = np.concatenate((self.missed, np.zeros(n_new, dtype=int)))
+            self.next_id += n_new
+
+    def confirmed(self):
+        return self.hits >= self.n_confirm
+
+    # confirmed tracks, Obstacles fields without Rmgn
+    def obstacles(self):
+        c = self.confirmed()
+        return {"id": self.ids[c], "s": self.x[c, 0], "d": self.x[c, 1], "vs": self.x[c, 2], "vd": self.x[c, 3], "R": self.R[c]}
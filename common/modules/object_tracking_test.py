@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+# check of PathProjector: points in frenet coordinates, transformed to
+# cartesian with ptsFrenetToCartesian and projected back, on an open path and
+# a closed track (points around the start/finish line)
+# check of MultiObjectTracker: gating and greedy association, association
+# across the start/finish line, and a synthetic scenario on the closed track
+# (detections in cartesian, projected) with crossing targets, missed
+# detections, a clutter detection, a target that disappears and one that
+# passes the start/finish line: track ids stay with their targets, tracks are
+# confirmed after n_confirm hits and dropped after max_missed misses, vs, vd converge
+
+import sys
+import numpy as np
+
+from coordinate_transforms import ptsFrenetToCartesian
+from object_tracking import PathProjector
+from object_tracking import MultiObjectTracker
+
+# path points of a curve X(t), Y(t) with spacing ds (approx.)
+def pathFromCurve(X, Y):
+    s = np.concatenate([[0.0], np.cumsum(np.hypot(np.diff(X), np.diff(Y)))])
+    psi = np.arctan2(np.gradient(Y), np.gradient(X))
+    return {"X": X, "Y": Y, "s": s, "psi_c": psi}
+
+rs = np.random.RandomState(0)
+tol = 0.02 # discretization of the path, interpolated heading vs segments
+n_fail = 0
+
+# open path, s-curve
+t = np.linspace(0.0, 1.0, 600)
+path = pathFromCurve(300.0*t, 40.0*np.sin(2*np.pi*t))
+s_in = rs.uniform(5.0, path["s"][-1] - 5.0, 500)
+d_in = rs.uniform(-4.0, 4.0, s_in.size)
+cases = [("open", path, None, s_in, d_in)]
+
+# closed track, circle of radius 60 starting at angle 0
+R = 60.0
+t = np.arange(0.0, 2*np.pi, 0.005)
+path = pathFromCurve(R*np.cos(t), R*np.sin(t))
+s_lap = 2*np.pi*R
+s_in = np.mod(rs.uniform(-20.0, 20.0, 500), s_lap) # around the start/finish line
+d_in = rs.uniform(-4.0, 4.0, s_in.size)
+cases.append(("closed", path, s_lap, s_in, d_in))
+
+for name, path, s_lap, s_in, d_in in cases:
+    X, Y = ptsFrenetToCartesian(s_in, d_in, path["X"], path["Y"], path["psi_c"], path["s"])
+    if (s_lap): # ptsFrenetToCartesian does not wrap, points beyond the last path point directly
+        last = s_in > path["s"][-1]
+        phi = s_in[last]/R
+        X[last] = (R - d_in[last])*np.cos(phi)
+        Y[last] = (R - d_in[last])*np.sin(phi)
+    s, d = PathProjector(path, s_lap=s_lap).project(X, Y)
+    ds = s - s_in
+    if (s_lap):
+        ds = np.mod(ds + 0.5*s_lap, s_lap) - 0.5*s_lap
+    err_s = np.max(np.abs(ds))
+    err_d = np.max(np.abs(d - d_in))
+    ok = err_s < tol and err_d < tol
+    n_fail += not ok
+    print("%-6s max error s %.5f d %.5f  %s" %(name, err_s, err_d, "ok" if ok else "MISMATCH"))
+
+def report(label, ok):
+    global n_fail
+    n_fail += not ok
+    print("%-52s %s" %(label, "ok" if ok else "MISMATCH"))
+
+# association: closest pair first, each track and detection once, gate, lap copies
+tracker = MultiObjectTracker(gate=2.0, s_lap=s_lap)
+tracker.x = np.array([[10.0, 0.0, 0, 0], [12.0, 0.0, 0, 0], [s_lap - 0.5, 1.0, 0, 0]])
+tracker.ids = np.arange(3)
+trk, det = tracker.associate(np.array([11.2, 30.0, 0.4]), np.array([0.0, 0.0, 1.0]))
+report("associate: greedy, gated, across the start/finish line",
+       sorted(zip(trk.tolist(), det.tolist())) == [(1, 0), (2, 2)])
+
+# scenario, targets: s0, d0, vs, vd, steps with a detection
+dt = 0.1
+Nsteps = 120
+n_confirm, max_missed = 3, 5
+steps = np.arange(Nsteps)
+targets = {
+  "wrap": (s_lap - 30.0, 1.0, 10.0, 0.0, (steps != 40) & (steps != 41)), # passes s_lap at step 30, 2 misses
+  "cross1": (100.0, -2.0, 8.0, 0.4, steps >= 0),                         # cross1 overtakes cross2 while
+  "cross2": (114.0, 2.0, 6.0, -0.4, steps < 90),                         # both change lanes, then cross2 is lost
+}
+tracker = MultiObjectTracker(gate=2.0, n_confirm=n_confirm, max_missed=max_missed, s_lap=s_lap)
+projector = PathProjector(path, s_lap=s_lap)
+ids = dict((name, set()) for name in targets)
+n_confirmed = []
+for k in steps:
+    t_k = k*dt
+    truth = dict((name, (np.mod(s0 + vs*t_k, s_lap), d0 + vd*t_k)) for name, (s0, d0, vs, vd, seen) in targets.items())
+    s_det = [truth[name][0] for name in sorted(targets) if targets[name][4][k]]
+    d_det = [truth[name][1] for name in sorted(targets) if targets[name][4][k]]
+    if (k == 50): # clutter
+        s_det.append(200.0)
+        d_det.append(0.0)
+    phi = np.array(s_det)/R
+    X = (R - np.array(d_det))*np.cos(phi) + rs.normal(0.0, 0.05, phi.size)
+    Y = (R - np.array(d_det))*np.sin(phi) + rs.normal(0.0, 0.05, phi.size)
+    s, d = projector.project(X, Y)
+    tracker.step(s, d, np.full(s.size, 1.0), dt)
+
+    # id of the confirmed track closest to each target
+    obs = tracker.obstacles()
+    n_confirmed.append(obs["id"].size)
+    for name in targets:
+        if (obs["id"].size == 0 or k < n_confirm - 1 or k >= 90 + max_missed and name == "cross2"):
+            continue
+        dist = np.hypot(tracker.sdiff(obs["s"] - truth[name][0]), obs["d"] - truth[name][1])
+        ids[name].add(int(obs["id"][np.argmin(dist)]) if np.min(dist) < 1.0 else -1)
+
+report("confirmed after n_confirm hits", n_confirmed[n_confirm - 2] == 0 and n_confirmed[n_confirm - 1] == 3)
+report("one id per target (crossing, misses, start/finish line)",
+       all(len(v) == 1 and -1 not in v for v in ids.values()) and len(set.union(*ids.values())) == 3)
+report("clutter never confirmed", max(n_confirmed) == 3)
+report("lost target dropped after max_missed misses",
+       n_confirmed[89 + max_missed] == 3 and n_confirmed[90 + max_missed] == 2 and list(ids["cross2"])[0] not in tracker.ids)
+obs = tracker.obstacles()
+err_v = 0.0
+for name in ["wrap", "cross1"]:
+    i = list(obs["id"]).index(list(ids[name])[0])
+    err_v = max(err_v, abs(obs["vs"][i] - targets[name][2]), abs(obs["vd"][i] - targets[name][3]))
+report("vs, vd converged (max error %.3f)" %err_v, err_v < 0.3)
+report("s within [0, s_lap)", np.all((tracker.x[:, 0] >= 0) & (tracker.x[:, 0] < s_lap)))
+
+if (n_fail > 0):
+    print("FAILED")
+    sys.exit(1)
+print("OK")
@@ -0,0 +1,55 @@
+import numpy as np
+from rollout import getField
+
+# Broad phase for obstacle queries along the path. The obstacles are sorted
+# by s once, a query point at s can only collide with obstacles in the window
+# [s - Rmgn_max, s + Rmgn_max], found by binary search. Only those (point,
+# obstacle) pairs are checked exactly, instead of all points against all
+# obstacles. Same scheme as planning_util::sort_obstacles/obstacle_window.
+
+class ObstacleIndex:
+    # obs: Obstacles msg or dict with s, d, Rmgn (and optionally R)
+    def __init__(self, obs):
+        s = getField(obs, "s")
+        self.order = np.argsort(s, kind="mergesort") # index in obs of the sorted obstacles
+        self.s = s[self.order]
+        self.d = getField(obs, "d")[self.order]
+        self.Rmgn = getField(obs, "Rmgn")[self.order]
+        self.Rmgn_max = float(np.max(self.Rmgn)) if self.Rmgn.size else 0.0
+
+    def __len__(self):
+        return self.s.size
+
+    # slice of the sorted obstacles with slo <= s <= shi
+    def window(self, slo, shi):
+        return slice(int(np.searchsorted(self.s, slo, side="left")), int(np.searchsorted(self.s, shi, side="right")))
+
+    # candidate pairs of points s (flat) and obstacles (sorted index) within radius in s
+    def pairs(self, s, radius=None):
+        radius = self.Rmgn_max if radius is None else radius
+        lo = np.searchsorted(self.s, s - radius, side="left")
+        hi = np.searchsorted(self.s, s + radius, side="right")
+        counts = hi - lo
+        pt = np.repeat(np.arange(s.size), counts)
+        ob = np.arange(pt.size) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+        return pt, ob
+
+    # True where a point (s, d) is within Rmgn of an obstacle, at most max_pairs pairs at a time
+    def colliding(self, s, d, max_pairs=1 << 22):
+        s = np.asarray(s, dtype=float)
+        d = np.asarray(d, dtype=float)
+        hit = np.zeros(s.size, dtype=bool)
+        if (self.s.size == 0 or s.size == 0):
+            return hit.reshape(s.shape)
+        s_flat = s.ravel()
+        d_flat = d.ravel()
+        n_cand = np.searchsorted(self.s, s_flat + self.Rmgn_max, side="right") - np.searchsorted(self.s, s_flat - self.Rmgn_max, side="left")
+        bounds = np.searchsorted(np.cumsum(n_cand), np.arange(max_pairs, int(np.sum(n_cand)), max_pairs), side="right")
+        for i0, i1 in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [s_flat.size]])):
+            if (i1 <= i0):
+                continue
+            pt, ob = self.pairs(s_flat[i0:i1])
+            ds = s_flat[i0:i1][pt] - self.s[ob]
+            dd = d_flat[i0:i1][pt] - self.d[ob]
+            hit[i0 + pt[ds*ds + dd*dd < self.Rmgn[ob]**2]] = True
+        return hit.reshape(s.shape)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+# check of ObstacleIndex.colliding against the dense check of all points
+# against all obstacles, for chunk sizes from one pair at a time upwards
+
+import sys
+import numpy as np
+
+from obstacle_index import ObstacleIndex
+
+# dense check, (Npts, Nobs) distances
+def collidingDense(s, d, obs):
+    ds = s.ravel()[:, None] - obs["s"][None, :]
+    dd = d.ravel()[:, None] - obs["d"][None, :]
+    return np.any(ds*ds + dd*dd < obs["Rmgn"][None, :]**2, axis=1).reshape(s.shape)
+
+rs = np.random.RandomState(0)
+n_fail = 0
+for Nobs in [0, 1, 5, 40]:
+    obs = {"s": rs.uniform(0.0, 100.0, Nobs),
+           "d": rs.uniform(-3.0, 3.0, Nobs),
+           "R": np.full(Nobs, 1.0),
+           "Rmgn": rs.uniform(0.5, 4.0, Nobs)}
+    index = ObstacleIndex(obs)
+
+    # trajectory set shaped points, some beyond the first and last obstacle
+    s = np.cumsum(rs.uniform(0.0, 2.0, (20, 41)), axis=1) - 10.0
+    d = rs.uniform(-4.0, 4.0, s.shape)
+    hit_dense = collidingDense(s, d, obs)
+    for max_pairs in [1, 2, 7, 100, 1 << 22]:
+        hit = index.colliding(s, d, max_pairs=max_pairs)
+        ok = hit.shape == s.shape and np.array_equal(hit, hit_dense)
+        n_fail += not ok
+        print("Nobs %3i  max_pairs %8i  colliding %4i  %s" %(Nobs, max_pairs, np.sum(hit), "ok" if ok else "MISMATCH"))
+
+if (n_fail > 0):
+    print("FAILED")
+    sys.exit(1)
+print("OK")
@@ -0,0 +1,106 @@
+import numpy as np
+from rollout import getField
+
+# Prediction of moving obstacles over the planning horizon in frenet
+# coordinates. All obstacles and timesteps are propagated in one vectorized
+# pass, the result is a time-indexed obstacle tensor: s, d of shape
+# (Nt+1, Nobs) at t = k*dt, and R, Rmgn per obstacle. Models:
+#   - "cv": constant velocity in (s, d), s(t) = s0 + vs t, d(t) = d0 + vd t
+#   - "path": the obstacle follows the path at its current speed. The lateral
+#     velocity decays with time constant tau_d (the obstacle settles on a line
+#     parallel to the path), d is kept within the road. Progress in s follows
+#     the curvature: ds/dt = v/(1 - d kappa(s)), evaluated with the offset the
+#     obstacle settles at, and inverted on the path grid.
+# Obstacles without vs, vd (static list) are predicted at rest.
+
+MODELS = ["cv", "path"]
+
+class ObstaclePredictor:
+    def __init__(self, model="path", Nt=40, dt=0.1, tau_d=1.0):
+        if (model not in MODELS):
+            raise ValueError("unknown prediction model %s, available: %s" %(model, ", ".join(MODELS)))
+        self.model = model
+        self.Nt = Nt
+        self.dt = dt
+        self.tau_d = tau_d
+        self.t = dt*np.arange(Nt+1)
+
+    # obs: Obstacles msg or dict with s, d, R, Rmgn (and optionally vs, vd), path
+    # (with s, kappa_c, dub, dlb) required by the path model
+    def predict(self, obs, path=None):
+        s0 = getField(obs, "s").astype(float)
+        d0 = getField(obs, "d").astype(float)
+        vs = self.velocity(obs, "vs", s0.size)
+        vd = self.velocity(obs, "vd", s0.size)
+        t = self.t[:, None]
+        if (self.model == "cv"):
+            s = s0 + vs*t
+            d = d0 + vd*t
+        else:
+            if (path is None):
+                raise ValueError("path model requires a path")
+            s, d = self.followPath(s0, d0, vs, vd, t, path)
+        return {"t": self.t.copy(), "s": s, "d": d,
+                "R": getField(obs, "R").astype(float), "Rmgn": getField(obs, "Rmgn").astype(float)}
+
+    # per obstacle velocity, zero if not given
+    def velocity(self, obs, name, n):
+        try:
+            v = getField(obs, name).astype(float)
+        except (KeyError, AttributeError): # static obstacle list
+            v = np.zeros(0)
+        return v if v.size == n else np.zeros(n)
+
+    def followPath(self, s0, d0, vs, vd, t, path):
+        s_path = getField(path, "s").astype(float)
+        kappa = getField(path, "kappa_c").astype(float)
+        dub = np.interp(s0, s_path, getField(path, "dub"))
+        dlb = np.interp(s0, s_path, getField(path, "dlb"))
+
+        # lateral: vd decays, settles at d_inf
+        d = d0 + vd*self.tau_d*(1.0 - np.exp(-t/self.tau_d))
+        d = np.clip(d, np.minimum(dlb, d0), np.maximum(dub, d0)) # obstacles already off the road stay where they are
+        d_inf = np.clip(d0 + vd*self.tau_d, np.minimum(dlb, d0), np.maximum(dub, d0))
+
+        # speed along the offset line at the start, v = vs (1 - d0 kappa(s0))
+        v = vs*(1.0 - d0*np.interp(s0, s_path, kappa))
+
+        # arc length of the offset line of each obstacle over the path grid,
+        # extended straight beyond the ends of the path (Nobs, Npath+2)
+        s_ext = np.concatenate([[s_path[0] - 1e4], s_path, [s_path[-1] + 1e4]])
+        kappa_ext = np.concatenate([[0.0], kappa, [0.0]])
+        scale = np.maximum(1.0 - d_inf[:, None]*kappa_ext, 0.1) # no reversal on the inside of tight turns
+        L = np.concatenate([np.zeros((d_inf.size, 1)), np.cumsum(0.5*(scale[:, 1:] + scale[:, :-1])*np.diff(s_ext), axis=1)], axis=1)
+
+        # L(s0) and the inverse L -> s of all obstacles at once, rows shifted apart
+        # so that the flattened s and L stay increasing
+        if (s0.size == 0):
+            return np.zeros((t.size, 0)), d
+        rows = np.arange(s0.size)
+        s_shift = rows*(s_ext[-1] - s_ext[0] + 1.0)
+        L_shift = rows*(L[:, -1].max() + 1.0)
+        s_flat = (s_ext[None, :] + s_shift[:, None]).ravel()
+        L_flat = (L + L_shift[:, None]).ravel()
+        L0 = np.interp(s0 + s_shift, s_flat, L_flat) - L_shift
+        s = np.interp(L0 + v*t + L_shift, L_flat, s_flat) - s_shift
+        return s, d
+
+# obstacles of a prediction at horizon step k, as an Obstacles dict
+def obstaclesAt(pred, k):
+    return {"s": pred["s"][k], "d": pred["d"][k], "R": pred["R"], "Rmgn": pred["Rmgn"]}
+
+# ObstaclePrediction msg fields, s and d flattened time major (index k*Nobs + j)
+def predictionToMsg(pred, msg):
+    msg.t = pred["t"].tolist()
+    msg.Nobs = int(pred["R"].size)
+    msg.s = pred["s"].ravel().tolist()
+    msg.d = pred["d"].ravel().tolist()
+    msg.R = pred["R"].tolist()
+    msg.Rmgn = pred["Rmgn"].tolist()
+    return msg
+
+def predictionFromMsg(msg):
+    t = np.array(msg.t)
+    shape = (t.size, msg.Nobs)
+    return {"t": t, "s": np.array(msg.s).reshape(shape), "d": np.array(msg.d).reshape(shape),
+            "R": np.array(msg.R), "Rmgn": np.array(msg.Rmgn)}
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+
+'''
+Description: Headless batch rendering of the evaluation figures
+    - figure families of figures.py: log_eval (per explog), scenario comparison
+      (latest not adapting vs adapting explog per scenario) and friction circles
+    - non-interactive backend, figures are rendered on a process pool
+    - a figure is skipped if its inputs and the plotting code are unchanged since
+      it was last rendered (hashes in <output dir>/render_cache.json)
+Usage:
+    python render_figures.py <log root> -o <output dir> -j <processes> [--format pdf] [--force]
+'''
+
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+import multiprocessing
+import matplotlib
+matplotlib.use("Agg") # before pyplot is imported (also by figures.py)
+import matplotlib.pyplot as plt
+import figures
+from explog import META_FILENAME
+from explog import isExplog
+from explog import loadExplog
+from run_catalog import scenarioName
+
+CACHE_FILENAME = "render_cache.json"
+LEGACY_NAME = re.compile(r"explog_(?:latest_)?(\w+?)_(adaptive|nonadaptive)(?:\.npy)?$")
+
+# hash of the plotting code: every module of this dir that is loaded by now, i.e.
+# figures.py and everything it and the log reader import (downsample,
+# coordinate_transforms, util, explog, ...)
+def codeHash():
+    here = os.path.dirname(os.path.abspath(__file__))
+    paths = set()
+    for mod in list(sys.modules.values()):
+        path = getattr(mod, "__file__", None)
+        if (path and os.path.dirname(os.path.abspath(path)) == here):
+            paths.add(os.path.splitext(os.path.abspath(path))[0] + ".py")
+    h = hashlib.sha1()
+    for path in sorted(paths):
+        h.update(os.path.basename(path).encode("utf-8"))
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+# content hash of a log (file or dir)
+def inputHash(path):
+    h = hashlib.sha1()
+    paths = [path]
+    if (os.path.isdir(path)):
+        paths = [os.path.join(path, f) for f in sorted(os.listdir(path))]
+    for p in paths:
+        h.update(os.path.basename(p).encode("utf-8"))
+        with open(p, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+# explogs below root
+def findExplogs(root):
+    explogs = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in sorted(dirnames + filenames):
+            path = os.path.join(dirpath, name)
+            if (name.startswith("explog") and isExplog(path)):
+                explogs.append(path)
+        dirnames[:] = [d for d in dirnames if not d.startswith("explog")]
+    return sorted(explogs)
+
+# (scenario, traction_adaptive) of an explog, from attrs or legacy file name
+def explogScenario(path):
+    attrs = {}
+    if (os.path.isdir(path)):
+        with open(os.path.join(path, META_FILENAME)) as f:
+            attrs = json.load(f)["attrs"]
+    if ("scenario_id" in attrs):
+        return scenarioName(attrs["scenario_id"], attrs.get("mu_segment_values", [1.0])), int(attrs["traction_adaptive"])
+    match = LEGACY_NAME.search(os.path.basename(path))
+    if (match):
+        return match.group(1), int(match.group(2) == "adaptive")
+    return None, None
+
+# name of the run an explog belongs to
+def runName(path, root):
+    rel = os.path.relpath(path, root)
+    if (os.path.basename(rel) == "explog" and os.path.dirname(rel)): # explog of a run dir
+        rel = os.path.dirname(rel)
+    return re.sub(r"[^\w\-\.]+", "_", rel.replace(".npy", ""))
+
+# list of render jobs: {"family", "inputs", "out", "scenario"}
+def buildJobs(root, out_dir, fmt):
+    jobs = []
+    explogs = findExplogs(root)
+    latest = {} # (scenario, traction_adaptive): explog
+    for path in explogs:
+        jobs.append({"family": "log_eval", "inputs": [path], "out": os.path.join(out_dir, "log_eval", runName(path, root) + "." + fmt)})
+        key = explogScenario(path)
+        if (key[0] is not None and (key not in latest or os.path.getmtime(path) >= os.path.getmtime(latest[key]))):
+            latest[key] = path
+    for scenario in sorted(set([k[0] for k in latest.keys()])):
+        if ((scenario, 0) in latest and (scenario, 1) in latest):
+            jobs.append({"family": "scenario_comparison", "inputs": [latest[(scenario, 0)], latest[(scenario, 1)]],
+                         "out": os.path.join(out_dir, scenario + "_comparison." + fmt), "scenario": scenario})
+    jobs.append({"family": "friction_circles", "inputs": [], "out": os.path.join(out_dir, "force_limits." + fmt)})
+    return jobs
+
+def jobKey(job, code_hash, dpi):
+    h = hashlib.sha1()
+    h.update(("%s|%s|%s|%s" %(code_hash, job["family"], job.get("scenario", ""), dpi)).encode("utf-8"))
+    for path in job["inputs"]:
+        h.update(inputHash(path).encode("utf-8"))
+    return h.hexdigest()
+
+def renderJob(job):
+    try:
+        logs = [loadExplog(p) for p in job["inputs"]]
+        if (job["family"] == "log_eval"):
+            fig = figures.figLogEval(logs[0])
+        elif (job["family"] == "scenario_comparison"):
+            fig = figures.figScenarioComparison(logs[0], logs[1], job["scenario"])
+        elif (job["family"] == "friction_circles"):
+            fig = figures.figFrictionCircles()
+        else:
+            raise ValueError("unknown figure family " + job["family"])
+        out_dir = os.path.dirname(job["out"])
+        if (not os.path.isdir(out_dir)):
+            try:
+                os.makedirs(out_dir)
+            except OSError: # created by another worker
+                pass
+        fig.savefig(job["out"], dpi=job["dpi"])
+        plt.close(fig)
+        return job["out"], job["key"], ""
+    except Exception as e:
+        return job["out"], job["key"], str(e)
+
+def main():
+    parser = argparse.ArgumentParser(description="Renders the evaluation figures of all logs below a dir")
+    parser.add_argument("root", help="log root (explogs are searched recursively)")
+    parser.add_argument("-o", "--output", default="figures", help="output dir")
+    parser.add_argument("-j", "--jobs", type=int, default=multiprocessing.cpu_count(), help="number of processes")
+    parser.add_argument("--format", default="pdf", help="file format (pdf, png, svg)")
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--force", action="store_true", help="render all figures, ignoring the cache")
+    args = parser.parse_args()
+
+    out_dir = os.path.abspath(args.output)
+    if (not os.path.isdir(out_dir)):
+        os.makedirs(out_dir)
+    cache_path = os.path.join(out_dir, CACHE_FILENAME)
+    cache = {}
+    if (os.path.isfile(cache_path) and not args.force):
+        with open(cache_path) as f:
+            cache = json.load(f)
+
+    # skip unchanged figures
+    code_hash = codeHash()
+    todo = []
+    jobs = buildJobs(os.path.abspath(args.root), out_dir, args.format)
+    for job in jobs:
+        job["dpi"] = args.dpi
+        job["key"] = jobKey(job, code_hash, args.dpi)
+        if (cache.get(job["out"]) != job["key"] or not os.path.isfile(job["out"])):
+            todo.append(job)
+    print("render: %i figures, %i up to date" %(len(jobs), len(jobs) - len(todo)))
+
+    # render
+    if (args.jobs == 1 or len(todo) < 2):
+        results = [renderJob(job) for job in todo]
+    else:
+        pool = multiprocessing.Pool(args.jobs)
+        results = pool.map(renderJob, todo, chunksize=1)
+        pool.close()
+        pool.join()
+    for out, key, error in results:
+        if (error):
+            print("render: failed %s (%s)" %(out, error))
+            cache.pop(out, None)
+        else:
+            cache[out] = key
+    with open(cache_path, "w") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    print("render: %i rendered, %i failed, output in %s" %(len([r for r in results if not r[2]]),
+                                                         len([r for r in results if r[2]]), out_dir))
+
+if __name__ == '__main__':
+    sys.exit(main())
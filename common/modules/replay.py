@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+
+'''
+Description: Deterministic offline replay of the python nodes
+    - runs the unmodified node script against an in-process stand-in of rospy
+      (no master, no network, simulated time)
+    - recorded input msgs are dispatched to the node's subscribers in time order
+      whenever the node sleeps on a rospy.Rate, which also advances the clock
+    - everything the node publishes is captured with the time of publishing
+    - the compute time of each loop iteration (wall clock) is recorded
+Usage:
+    res = replayNode("perception/scripts/perception.py", "Perception", inputs, params)
+    python replay.py <node script> <class name> <input bag> <params yaml>
+'''
+
+import os
+import sys
+import copy
+import time
+import types
+import yaml
+import numpy as np
+
+class ReplayFinished(Exception):
+    pass
+
+def loadSource(name, path):
+    try:
+        import importlib.util
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    except ImportError: # python 2
+        import imp
+        return imp.load_source(name, path)
+
+# time type of the shim, interface of rospy.Time used by the nodes
+class Time(object):
+    clock = None # set by the shim
+
+    def __init__(self, secs=0, nsecs=0):
+        t = secs + nsecs*1e-9
+        self.secs = int(np.floor(t))
+        self.nsecs = int(round((t - self.secs)*1e9))
+
+    @classmethod
+    def from_sec(cls, t):
+        return cls(t)
+
+    @classmethod
+    def now(cls):
+        return cls(cls.clock.t)
+
+    def to_sec(self):
+        return self.secs + self.nsecs*1e-9
+
+# in-process pub/sub with capture of all published msgs
+class Bus:
+    def __init__(self, capture=True):
+        self.subs = {}    # topic: [callbacks]
+        self.outputs = [] # (t, topic, msg)
+        self.capture = capture
+
+    def subscribe(self, topic, callback):
+        self.subs.setdefault(topic, []).append(callback)
+
+    def dispatch(self, topic, msg):
+        for cb in self.subs.get(topic, []):
+            cb(msg)
+
+class SimClock:
+    def __init__(self, t0):
+        self.t = t0
+
+def resolveName(name):
+    if (name.startswith("/")):
+        return name
+    return "/" + name
+
+# Stand-in for the rospy module, covers the API used by the nodes of this repo
+class RospyShim(types.ModuleType):
+    def __init__(self, bus, inputs, params, t_end=None, verbose=False):
+        types.ModuleType.__init__(self, "rospy")
+        self.bus = bus
+        self.inputs = sorted(inputs, key=lambda x: x[0]) # (t, topic, msg), stable for equal t
+        self.i_input = 0
+        self.params = params
+        t0 = self.inputs[0][0] if self.inputs else 0.0
+        self.clock = SimClock(t0)
+        self.t_end = t_end if t_end is not None else (self.inputs[-1][0] if self.inputs else t0)
+        self.verbose = verbose
+        self.shutdown = False
+        self.shutdown_hooks = []
+        self.comptime = [] # wall time between consecutive Rate.sleep calls
+        self.t_wall_iter = None
+
+        # rospy API
+        shim = self
+        self.Time = type("Time", (Time,), {"clock": self.clock})
+        self.Duration = self.Time
+
+        class Publisher(object):
+            def __init__(self, name, data_class, queue_size=None, latch=False):
+                self.topic = resolveName(name)
+            def publish(self, msg):
+                if (shim.bus.capture):
+                    shim.bus.outputs.append((shim.clock.t, self.topic, copy.deepcopy(msg)))
+                shim.bus.dispatch(self.topic, msg)
+
+        class Subscriber(object):
+            def __init__(self, name, data_class, callback=None, queue_size=None):
+                self.topic = resolveName(name)
+                shim.bus.subscribe(self.topic, callback)
+
+        class Rate(object):
+            def __init__(self, hz):
+                self.period = 1.0/hz
+                self.t_last = shim.clock.t
+            def sleep(self):
+                shim.recordIteration()
+                t_next = max(self.t_last + self.period, shim.clock.t)
+                shim.advance(t_next)
+                self.t_last = t_next
+                shim.t_wall_iter = time.time()
+
+        self.Publisher = Publisher
+        self.Subscriber = Subscriber
+        self.Rate = Rate
+
+    def recordIteration(self):
+        if (self.t_wall_iter is not None):
+            self.comptime.append(time.time() - self.t_wall_iter)
+
+    # dispatch all inputs up to t in order and set the clock to t. Past t_end
+    # the inputs up to t_end are still dispatched before the replay finishes
+    def advance(self, t):
+        if (self.shutdown):
+            raise ReplayFinished()
+        while (self.i_input < len(self.inputs) and self.inputs[self.i_input][0] <= min(t, self.t_end)):
+            t_msg, topic, msg = self.inputs[self.i_input]
+            self.i_input += 1
+            self.clock.t = max(self.clock.t, t_msg)
+            self.bus.dispatch(resolveName(topic), msg)
+        if (t > self.t_end or self.shutdown):
+            raise ReplayFinished()
+        self.clock.t = t
+
+    def init_node(self, name, anonymous=False, **kwargs):
+        self.node_name = name
+
+    def get_param(self, name, default=KeyError):
+        val = self.params
+        for key in name.strip("/").split("/"):
+            if (not isinstance(val, dict) or key not in val):
+                if (default is KeyError):
+                    raise KeyError(name)
+                return default
+            val = val[key]
+        return val
+
+    def get_time(self):
+        return self.clock.t
+
+    def is_shutdown(self):
+        return self.shutdown
+
+    def signal_shutdown(self, reason):
+        self.shutdown = True
+
+    def on_shutdown(self, hook):
+        self.shutdown_hooks.append(hook)
+
+    def spin(self):
+        pass
+
+    def sleep(self, duration):
+        self.advance(self.clock.t + duration)
+
+    def wait_for_service(self, name, timeout=None):
+        raise RuntimeError("replay: services are not supported (" + name + ")")
+
+    def log(self, msg, *args, **kwargs):
+        if (self.verbose):
+            print("[%.3f] %s" %(self.clock.t, msg))
+
+    loginfo = logwarn = logerr = logdebug = log
+    loginfo_throttle = logwarn_throttle = logerr_throttle = lambda self, period, msg: self.log(msg)
+
+class ReplayResult:
+    def __init__(self, outputs, comptime, t_wall):
+        self.outputs = outputs                # (t, topic, msg)
+        self.comptime = np.array(comptime)    # per loop iteration (s)
+        self.t_wall = t_wall
+
+    # times and msgs published on topic
+    def topic(self, topic):
+        topic = resolveName(topic)
+        out = [(t, m) for t, tp, m in self.outputs if tp == topic]
+        return np.array([t for t, m in out]), [m for t, m in out]
+
+    # field of the msgs on topic as array
+    def field(self, topic, name):
+        t, msgs = self.topic(topic)
+        return t, np.array([getattr(m, name) for m in msgs])
+
+    def getReport(self):
+        if (self.comptime.size == 0):
+            return "no iterations recorded, wall time %.3f s" %self.t_wall
+        return "%i iterations, comptime mean %.3f ms, p99 %.3f ms, max %.3f ms, wall time %.3f s" \
+               %(self.comptime.size, 1000*np.mean(self.comptime), 1000*np.percentile(self.comptime, 99),
+                 1000*np.max(self.comptime), self.t_wall)
+
+# Runs the node class of a script until the inputs are exhausted (or t_end).
+# inputs: list of (t, topic, msg), params: dict as from rosparam dump
+def replayNode(script, class_name, inputs, params, t_end=None, verbose=False):
+    bus = Bus()
+    shim = RospyShim(bus, inputs, params, t_end, verbose)
+
+    # swap rospy for the shim, also in modules already imported with rospy
+    modules_before = set(sys.modules.keys())
+    rospy_saved = sys.modules.get("rospy", None)
+    for mod in list(sys.modules.values()):
+        if (mod is not None and rospy_saved is not None and getattr(mod, "rospy", None) is rospy_saved):
+            mod.rospy = shim
+    sys.modules["rospy"] = shim
+    t_start = time.time()
+    try:
+        name = "replay_" + os.path.splitext(os.path.basename(script))[0]
+        module = loadSource(name, script)
+        try:
+            getattr(module, class_name)()
+        except ReplayFinished:
+            pass
+        for hook in shim.shutdown_hooks:
+            hook()
+    finally:
+        t_wall = time.time() - t_start
+        # restore: modules first imported during the replay are unloaded (with
+        # any state they created against the shim), modules from before get rospy back
+        for key in list(sys.modules.keys()):
+            if (key not in modules_before):
+                del sys.modules[key]
+        if (rospy_saved is not None):
+            sys.modules["rospy"] = rospy_saved
+        for key, mod in list(sys.modules.items()):
+            if (mod is not None and getattr(mod, "rospy", None) is shim):
+                if (rospy_saved is not None):
+                    mod.rospy = rospy_saved
+                else:
+                    del mod.rospy
+    return ReplayResult(bus.outputs, shim.comptime, t_wall)
+
+# inputs from a rosbag (all topics if topics is None)
+def loadBag(path, topics=None):
+    import rosbag
+    inputs = []
+    with rosbag.Bag(path) as bag:
+        for topic, msg, t in bag.read_messages(topics=topics):
+            inputs.append((t.to_sec(), topic, msg))
+    return inputs
+
+# max abs difference of numeric fields of two captures on a topic (same nr of msgs)
+def compareOutputs(res_a, res_b, topic, fields):
+    diff = {}
+    for name in fields:
+        t_a, a = res_a.field(topic, name)
+        t_b, b = res_b.field(topic, name)
+        if (a.shape != b.shape):
+            diff[name] = np.inf
+        else:
+            diff[name] = float(np.max(np.abs(a - b))) if a.size else 0.0
+    return diff
+
+if __name__ == '__main__':
+    if (len(sys.argv) < 5):
+        print("usage: replay.py <node script> <class name> <input bag> <params yaml>")
+        sys.exit(1)
+    script, class_name, bag, params_file = sys.argv[1:5]
+    with open(params_file) as f:
+        params = yaml.safe_load(f)
+    res = replayNode(script, class_name, loadBag(bag), params)
+    print(res.getReport())
+    for topic in sorted(set([tp for t, tp, m in res.outputs])):
+        print("%s: %i msgs" %(topic, len(res.topic(topic)[1])))
@@ -0,0 +1,156 @@
+import numpy as np
+from tire_model import corneringStiffness
+
+# Batched CPU version of the trajectory rollout of saarti (single_rollout in
+# cuda_wrapper.cu). All Nvx*Nd trajectories are integrated simultaneously as
+# arrays of shape (Nvx, Nd), with the same
+#   - reference grids: d_ref in linspace(dlb, dub, Nd) at the first path point,
+#     vx_ref in linspace(1, vxub, Nvx)
+#   - rollout controller: Fyf = 0.5 m vx^2 kappac cos(deltapsi) + 3000 derror - 500 deltapsi,
+#     Fx = 1000 vxerror (rear wheel drive, front axle brakes only), saturated at the friction circles
+#   - normal loads with longitudinal load transfer (traction_adaptive) or static,
+#     mu from the path at s or mu_nominal, rear cornering stiffness of the surface class
+#   - Euler integration with Ni substeps per dt, controls held over dt
+# Differences to the kernel: states are stored after all Ni substeps of an
+# interval (the kernel stores them after the first substep), and the rear
+# friction circle accounts for the current Fyr (the kernel reads a shadowed
+# variable that is always 0), as in RtisqpWrapper::computeTrajset.
+
+# arrays of a trajectory set, shape (Nvx*Nd, Nt+1), order as the kernel output (vx major)
+TRAJ_STATES = ["s", "d", "deltapsi", "psidot", "vx", "vy"]
+TRAJ_CTRLS = ["Fyf", "Fxf", "Fxr"] # Nt values
+TRAJ_MISC = ["Fyr", "Fzf", "Fzr", "kappac", "mu", "Cr"]
+
+class TrajSet:
+    def __init__(self, arrays, d_ref, vx_ref):
+        self.arrays = arrays # name: array (Ntraj, Nt+1) or (Ntraj, Nt) for ctrls
+        self.d_ref = d_ref   # (Ntraj,)
+        self.vx_ref = vx_ref # (Ntraj,)
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __len__(self):
+        return self.d_ref.size
+
+# field of a path msg (pathlocal) or dict
+def getField(path, name):
+    if (isinstance(path, dict)):
+        return np.asarray(path[name], dtype=float)
+    return np.asarray(getattr(path, name), dtype=float)
+
+# Rollout of a batch of trajectories of any shape. x_init: the 6 initial states,
+# each a scalar or an array of the batch shape, d_ref and vx_ref: arrays of the
+# batch shape. pathvars(s) returns kappac and mu (if traction_adaptive) at s.
+# Returns dict of arrays of shape batch + (Nt+1,) (ctrls: batch + (Nt,)).
+def rolloutBatch(x_init, d_ref, vx_ref, pathvars, vehicle, Nt=40, dt=0.1,
+                 traction_adaptive=1, mu_nominal=1.0, Ni=10, dtype=np.float64):
+    m, Iz, g = vehicle["m"], vehicle["Iz"], vehicle["g"]
+    lf, lr, h_cg = vehicle["lf"], vehicle["lr"], vehicle["h_cg"]
+    shape = np.shape(d_ref)
+
+    # init state
+    s, d, deltapsi, psidot, vx, vy = [np.zeros(shape, dtype=dtype) + x_init[i] for i in range(6)]
+    Fyf = np.zeros(shape, dtype=dtype)
+    Fxf = np.zeros(shape, dtype=dtype)
+    Fxr = np.zeros(shape, dtype=dtype)
+    Fyr = np.zeros(shape, dtype=dtype)
+
+    out = {}
+    for name in TRAJ_STATES + TRAJ_MISC:
+        out[name] = np.zeros(shape + (Nt+1,), dtype=dtype)
+    for name in TRAJ_CTRLS:
+        out[name] = np.zeros(shape + (Nt,), dtype=dtype)
+    for name, val in zip(TRAJ_STATES, [s, d, deltapsi, psidot, vx, vy]):
+        out[name][..., 0] = val
+
+    h = dt/Ni
+    for k in range(Nt):
+        kappac, mu_path = pathvars(s)
+
+        # normal forces from previous cmd, mu and rear cornering stiffness
+        if (traction_adaptive == 1):
+            ax = (Fxf + Fxr)/m
+            Fzf = (1.0/(lf+lr))*(m*ax*h_cg + m*g*lr)
+            Fzr = (1.0/(lf+lr))*(-m*ax*h_cg + m*g*lf)
+            mu = mu_path
+        else:
+            Fzf = np.full(shape, (1.0/(lf+lr))*(m*g*lr), dtype=dtype)
+            Fzr = np.full(shape, (1.0/(lf+lr))*(m*g*lf), dtype=dtype)
+            mu = np.full(shape, mu_nominal, dtype=dtype)
+        Cr = corneringStiffness(mu, Fzr)
+        Ffmax = mu*Fzf
+        Frmax = mu*Fzr
+
+        # rollout controller
+        vxerror = vx_ref - vx
+        derror = d_ref - d
+        Fyf = np.clip(0.5*m*vx*vx*kappac*np.cos(deltapsi) + 3000*derror - 500*deltapsi, -Ffmax, Ffmax)
+        Fxfmax = np.sqrt(np.maximum(Ffmax*Ffmax - Fyf*Fyf, 0.0))
+        Fxf = np.where(vxerror > 0, 0.0, np.maximum(1000*vxerror, -Fxfmax)) # rear wheel drive
+        Fxrmax = np.sqrt(np.maximum(Frmax*Frmax - Fyr*Fyr, 0.0))
+        Fxr = np.clip(1000*vxerror, -Fxrmax, Fxrmax)
+
+        # euler fwd, same update order as the kernel
+        for i in range(Ni):
+            Fyr = 2*Cr*np.arctan(lr*psidot - vy)/vx
+            s = s + h*((vx*np.cos(deltapsi) - vy*np.sin(deltapsi))/(1 - d*kappac))
+            d = d + h*(vx*np.sin(deltapsi) + vy*np.cos(deltapsi))
+            deltapsi = deltapsi + h*(psidot - kappac*(vx*np.cos(deltapsi) - vy*np.sin(deltapsi))/(1 - d*kappac))
+            psidot = psidot + h*((1/Iz)*(lf*Fyf - lr*Fyr))
+            vx = vx + h*((1/m)*(Fxf + Fxr))
+            vy = vy + h*((1/m)*(Fyf + Fyr) - vx*psidot)
+
+        # x at k+1, u and misc at k
+        for name, val in zip(TRAJ_STATES, [s, d, deltapsi, psidot, vx, vy]):
+            out[name][..., k+1] = val
+        for name, val in zip(TRAJ_CTRLS, [Fyf, Fxf, Fxr]):
+            out[name][..., k] = val
+        for name, val in zip(TRAJ_MISC, [Fyr, Fzf, Fzr, kappac, mu, Cr]):
+            out[name][..., k] = val
+
+    # last element of misc vars as at Nt-1
+    for name in TRAJ_MISC:
+        out[name][..., Nt] = out[name][..., Nt-1]
+    return out
+
+# pathvars of rolloutBatch for a path: kappac and mu at the next path point
+# ahead of s (as the kernel, no interpolation)
+def pathLookup(pathlocal):
+    s_path = getField(pathlocal, "s")
+    kappac_path = getField(pathlocal, "kappa_c")
+    mu_path = getField(pathlocal, "mu")
+    def pathvars(s):
+        path_idx = np.minimum(np.searchsorted(s_path, s, side="left"), s_path.size - 1)
+        return kappac_path[path_idx], mu_path[path_idx]
+    return pathvars
+
+# rollout of the sampling step of saarti from x_init (s, d, deltapsi, psidot, vx, vy)
+def rollout(x_init, pathlocal, vehicle, Nt=40, Nd=10, Nvx=15, vxub=20.0, dt=0.1,
+            traction_adaptive=1, mu_nominal=1.0, Ni=10, dtype=np.float64):
+    dub = getField(pathlocal, "dub")[0]
+    dlb = getField(pathlocal, "dlb")[0]
+
+    # reference grids
+    d_ref = np.linspace(dlb, dub, Nd).astype(dtype)
+    vx_ref = np.linspace(1.0, vxub, Nvx).astype(dtype) # vxlb = 1, avoids singularity at vx = 0
+    d_ref_g, vx_ref_g = np.meshgrid(d_ref, vx_ref) # (Nvx, Nd)
+
+    out = rolloutBatch(x_init, d_ref_g, vx_ref_g, pathLookup(pathlocal), vehicle, Nt, dt, traction_adaptive, mu_nominal, Ni, dtype)
+    arrays = dict((name, val.reshape((Nvx*Nd,) + val.shape[2:])) for name, val in out.items())
+    return TrajSet(arrays, d_ref_g.ravel(), vx_ref_g.ravel())
+
+# trajectory set as common/TrajectorySet msg
+def trajsetToMsg(trajset, dt=0.1):
+    from common.msg import Trajectory
+    from common.msg import TrajectorySet
+    msg = TrajectorySet()
+    Nt = trajset["s"].shape[1] - 1
+    t = np.arange(Nt+1)*dt
+    for j in range(len(trajset)):
+        traj = Trajectory()
+        traj.t = t.tolist()
+        for name in TRAJ_STATES + TRAJ_CTRLS + TRAJ_MISC:
+            setattr(traj, name, trajset[name][j].tolist())
+        msg.trajectories.append(traj)
+    return msg
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+# check of the rollout port against
+#   - a scalar transcription of the kernel single_rollout (cuda_wrapper.cu),
+#     one trajectory at a time, with the two documented differences of the
+#     port (states stored after all Ni substeps, Fyr in the rear friction circle)
+#   - values derived by hand on a straight at constant mu: no lateral motion,
+#     vx approaches vx_ref geometrically, s sums the substeps
+#   - itself in another batch shape and order (no coupling between trajectories)
+
+import sys
+import math
+import numpy as np
+
+from rollout import rollout
+from rollout import rolloutBatch
+from rollout import pathLookup
+from rollout import TRAJ_STATES, TRAJ_CTRLS, TRAJ_MISC
+
+vehicle = {"m": 1500.0, "Iz": 2250.0, "g": 9.81, "lf": 1.3, "lr": 1.4, "h_cg": 0.5}
+
+# kernel single_rollout for one (d_ref, vx_ref), line by line. port=False: as
+# the kernel, port=True: with the differences of the port
+def singleRollout(x_init, d_ref, vx_ref, path, vehicle, Nt, dt, traction_adaptive, mu_nominal, Ni, port):
+    m, Iz, g = vehicle["m"], vehicle["Iz"], vehicle["g"]
+    lf, lr, h_cg = vehicle["lf"], vehicle["lr"], vehicle["h_cg"]
+    s_path, kappac_path, mu_path = list(path["s"]), list(path["kappa_c"]), list(path["mu"])
+    s, d, deltapsi, psidot, vx, vy = [float(x) for x in x_init]
+    out = dict((name, [0.0]*(Nt if name in TRAJ_CTRLS else Nt+1)) for name in TRAJ_STATES + TRAJ_CTRLS + TRAJ_MISC)
+    for name, val in zip(TRAJ_STATES, [s, d, deltapsi, psidot, vx, vy]):
+        out[name][0] = val
+    Fyf = Fxf = Fxr = Fyr = 0.0
+    for ki in range(Nt*Ni):
+        if (ki % Ni == 0):
+            path_idx = 0
+            while (path_idx < len(s_path) - 1 and s - s_path[path_idx] > 0):
+                path_idx += 1
+            kappac = kappac_path[path_idx]
+            ax = (Fxf + Fxr)/m
+            if (traction_adaptive == 1):
+                Fzf = (1.0/(lf+lr))*(m*ax*h_cg + m*g*lr)
+                Fzr = (1.0/(lf+lr))*(-m*ax*h_cg + m*g*lf)
+                mu = mu_path[path_idx]
+            else:
+                Fzf = (1.0/(lf+lr))*(m*g*lr)
+                Fzr = (1.0/(lf+lr))*(m*g*lf)
+                mu = mu_nominal
+            if (0.0 <= mu < 0.3):
+                B, C = 4.0, 2.0
+            elif (0.3 <= mu < 0.5):
+                B, C = 5.0, 2.0
+            elif (0.5 <= mu < 0.9):
+                B, C = 12.0, 2.3
+            elif (0.9 <= mu < 1.5):
+                B, C = 10.0, 1.9
+            else:
+                B, C = 12.56, 1.38
+            Cr = B*C*mu*Fzr
+            Ffmax = mu*Fzf
+            Frmax = mu*Fzr
+            vxerror = vx_ref - vx
+            derror = d_ref - d
+            Fyf = min(max(0.5*m*vx*vx*kappac*math.cos(deltapsi) + 3000*derror - 500*deltapsi, -Ffmax), Ffmax)
+            Fxfmax = math.sqrt(max(Ffmax*Ffmax - Fyf*Fyf, 0.0))
+            Fxf = 0.0 if vxerror > 0 else max(1000*vxerror, -Fxfmax)
+            Fyr_circle = Fyr if port else 0.0 # the kernel reads the outer Fyr, never set
+            Fxrmax = math.sqrt(max(Frmax*Frmax - Fyr_circle*Fyr_circle, 0.0))
+            Fxr = min(max(1000*vxerror, -Fxrmax), Fxrmax)
+        Fyr = 2*Cr*math.atan(lr*psidot - vy)/vx
+        s = s + (dt/Ni)*((vx*math.cos(deltapsi) - vy*math.sin(deltapsi))/(1 - d*kappac))
+        d = d + (dt/Ni)*(vx*math.sin(deltapsi) + vy*math.cos(deltapsi))
+        deltapsi = deltapsi + (dt/Ni)*(psidot - kappac*(vx*math.cos(deltapsi) - vy*math.sin(deltapsi))/(1 - d*kappac))
+        psidot = psidot + (dt/Ni)*((1/Iz)*(lf*Fyf - lr*Fyr))
+        vx = vx + (dt/Ni)*((1/m)*(Fxf + Fxr))
+        vy = vy + (dt/Ni)*((1/m)*(Fyf + Fyr) - vx*psidot)
+        if ((ki % Ni == Ni - 1) if port else (ki % Ni == 0)):
+            k = ki//Ni
+            for name, val in zip(TRAJ_STATES, [s, d, deltapsi, psidot, vx, vy]):
+                out[name][k+1] = val
+            for name, val in zip(TRAJ_CTRLS + TRAJ_MISC, [Fyf, Fxf, Fxr, Fyr, Fzf, Fzr, kappac, mu, Cr]):
+                out[name][k] = val
+    for name in TRAJ_MISC:
+        out[name][Nt] = out[name][Nt-1]
+    return dict((name, np.array(val)) for name, val in out.items())
+
+# largest error relative to the magnitude of each array (forces ~1e3, states ~1)
+def maxRelError(a, b, names):
+    err = 0.0
+    for name in names:
+        err = max(err, np.max(np.abs(a[name] - b[name]))/max(1.0, np.max(np.abs(b[name]))))
+    return err
+
+n_fail = 0
+def check(label, err, tol):
+    global n_fail
+    ok = err <= tol # also fails on nan
+    n_fail += not ok
+    print("%-44s max error %.3g  %s" %(label, err, "ok" if ok else "MISMATCH"))
+
+# path with a left and a right turn and a low friction patch
+s_path = np.arange(0.0, 200.0, 1.0)
+pathlocal = {"s": s_path,
+             "kappa_c": 0.02*np.sin(2*np.pi*s_path/120.0),
+             "mu": np.where((s_path > 60) & (s_path < 90), 0.5, 1.0),
+             "dub": np.full(s_path.size, 3.0),
+             "dlb": np.full(s_path.size, -3.0)}
+x_init = [2.0, 0.5, 0.05, 0.0, 8.0, 0.0]
+Nt, Nd, Nvx, Ni, dt = 30, 6, 5, 10, 0.1
+
+for traction_adaptive in [1, 0]:
+    trajset = rollout(x_init, pathlocal, vehicle, Nt=Nt, Nd=Nd, Nvx=Nvx, vxub=15.0, dt=dt,
+                      traction_adaptive=traction_adaptive, mu_nominal=0.8, Ni=Ni)
+
+    # scalar transcription of the kernel
+    err = 0.0
+    for j in range(len(trajset)):
+        ref = singleRollout(x_init, trajset.d_ref[j], trajset.vx_ref[j], pathlocal, vehicle, Nt, dt,
+                            traction_adaptive, 0.8, Ni, port=True)
+        row = dict((name, trajset[name][j]) for name in ref)
+        err = max(err, maxRelError(row, ref, TRAJ_STATES + TRAJ_CTRLS + TRAJ_MISC))
+    check("traction_adaptive %i  vs kernel transcription" %traction_adaptive, err, 1e-9)
+
+    # batch shape and order
+    perm = np.random.RandomState(0).permutation(len(trajset))
+    out = rolloutBatch(x_init, trajset.d_ref[perm], trajset.vx_ref[perm], pathLookup(pathlocal), vehicle,
+                       Nt=Nt, dt=dt, traction_adaptive=traction_adaptive, mu_nominal=0.8, Ni=Ni)
+    check("traction_adaptive %i  shuffled flat batch" %traction_adaptive,
+          maxRelError(out, dict((name, trajset[name][perm]) for name in out), out.keys()), 0.0)
+
+# the port differs from the kernel only by the documented differences: with
+# states stored the same way, the kernel transcription gives the same states
+# where the rear tire carries no lateral force
+straight = dict(pathlocal, kappa_c=np.zeros(s_path.size), mu=np.ones(s_path.size))
+x_straight = [0.0, 0.0, 0.0, 0.0, 5.0, 0.0]
+kernel = singleRollout(x_straight, 0.0, 9.0, straight, vehicle, Nt, dt, 1, 1.0, 1, port=False)
+port = singleRollout(x_straight, 0.0, 9.0, straight, vehicle, Nt, dt, 1, 1.0, 1, port=True)
+check("straight, Ni 1  kernel vs port transcription", maxRelError(kernel, port, TRAJ_STATES + TRAJ_CTRLS), 0.0)
+
+# by hand on the straight: Fyf = Fyr = 0, vx error e decays by r = 1 - c dt/m per
+# step (c = 1000 accelerating, rear only, 2000 braking, both axles, unsaturated),
+# controls held over the Ni substeps: s += dt vx_k + (dt/Ni)^2 Ni (Ni-1)/2 a_k
+straight_flat = dict(straight, dub=np.zeros(s_path.size), dlb=np.zeros(s_path.size)) # d_ref = 0
+trajset = rollout(x_straight, straight_flat, vehicle, Nt=Nt, Nd=2, Nvx=Nvx, vxub=9.0, dt=dt, Ni=Ni)
+m, g, lf, lr, h_cg = vehicle["m"], vehicle["g"], vehicle["lf"], vehicle["lr"], vehicle["h_cg"]
+k = np.arange(Nt+1)
+err = 0.0
+for j in range(len(trajset)):
+    e0 = trajset.vx_ref[j] - x_straight[4]
+    c = 1000.0 if e0 > 0 else 2000.0
+    e = e0*(1.0 - c*dt/m)**k
+    a = c*e/m
+    vx = trajset.vx_ref[j] - e
+    s = np.concatenate([[0.0], np.cumsum(dt*vx[:-1] + (dt/Ni)**2*0.5*Ni*(Ni-1)*a[:-1])])
+    ax_prev = np.concatenate([[0.0], a[:-2], [a[-3]]]) # ax of the previous cmd, last misc repeated
+    Fzr = (-m*ax_prev*h_cg + m*g*lf)/(lf + lr)
+    hand = {"s": s, "vx": vx, "d": 0*k, "deltapsi": 0*k, "psidot": 0*k, "vy": 0*k, "Fyf": 0*k[:-1],
+            "Fxr": 1000.0*e[:-1], "Fxf": (0.0 if e0 > 0 else 1000.0)*e[:-1], "Fzr": Fzr}
+    err = max(err, maxRelError(dict((name, trajset[name][j]) for name in hand), hand, hand.keys()))
+check("straight, constant mu  vs hand derived", err, 1e-9)
+
+if (n_fail > 0):
+    print("FAILED")
+    sys.exit(1)
+print("OK")
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+
+'''
+Description: Index of experiment runs (sqlite)
+    - every run writes to its own run dir, the catalog records per run:
+      scenario, config, config hash, git revision, status and summary metrics
+    - metrics are stored one row per (run, name), so any set of metrics can be added
+    - queries filter on run fields and metric values without opening the logs
+Usage:
+    cat = RunCatalog("logs/catalog.db")
+    runs = cat.query(scenario="popup_wet", traction_adaptive=1)
+    runs = cat.query(scenario="popup_wet", metrics={"d_margin_min": (">", 0.0)})
+    python run_catalog.py <catalog.db> scenario=popup_wet traction_adaptive=1
+    python run_catalog.py <catalog.db> --index <log root>   (adds existing logs)
+'''
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import subprocess
+
+RUN_FIELDS = ["run_id", "run_dir", "t_created", "scenario", "scenario_id", "track_name", "robot_name",
+              "traction_adaptive", "config_hash", "git_rev", "status"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    run_dir TEXT,
+    t_created REAL,
+    scenario TEXT,
+    scenario_id INTEGER,
+    track_name TEXT,
+    robot_name TEXT,
+    traction_adaptive INTEGER,
+    config_hash TEXT,
+    git_rev TEXT,
+    status TEXT,
+    config TEXT
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id TEXT,
+    name TEXT,
+    value REAL,
+    PRIMARY KEY (run_id, name)
+);
+CREATE INDEX IF NOT EXISTS runs_scenario ON runs (scenario, traction_adaptive);
+CREATE INDEX IF NOT EXISTS metrics_name ON metrics (name, value);
+"""
+
+METRIC_OPS = ["<", "<=", ">", ">=", "=", "!="]
+
+# scenario name from the experiment config, e.g. popup_wet
+def scenarioName(scenario_id, mu_segment_values):
+    if (scenario_id == 1):
+        if (min(mu_segment_values) > 0.8):
+            return "popup_dry"
+        return "popup_wet"
+    elif (scenario_id == 2):
+        return "reducedmuturn"
+    elif (scenario_id == 3):
+        return "racing"
+    return "scenario%i" %scenario_id
+
+# stable hash of a config dict (key order independent)
+def configHash(config):
+    s = json.dumps(config, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()[0:12]
+
+# git revision of the repo containing path ("" if unknown), "+" appended if dirty
+def gitRevision(path):
+    try:
+        with open(os.devnull, "w") as devnull:
+            rev = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=path, stderr=devnull)
+            dirty = subprocess.call(["git", "diff", "--quiet", "HEAD"], cwd=path, stdout=devnull, stderr=devnull)
+        rev = rev.decode("utf-8").strip()
+        return rev + "+" if dirty else rev
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+# default log root: logs dir of the common package (from rospkg, else next to this module)
+def defaultLogDir():
+    try:
+        import rospkg
+        return os.path.join(rospkg.RosPack().get_path("common"), "logs")
+    except Exception: # no rospkg or common not on ROS_PACKAGE_PATH
+        return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "logs"))
+
+# creates and returns a new run dir <root>/<YYYYmmdd_HHMMSS>_<name>, never an existing one
+def newRunDir(root, name):
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    base = os.path.join(root, stamp + "_" + name)
+    run_dir = base
+    k = 1
+    while (True):
+        try:
+            os.makedirs(run_dir)
+            return run_dir
+        except OSError:
+            if (not os.path.isdir(run_dir)):
+                raise
+            run_dir = "%s_%i" %(base, k)
+            k += 1
+
+class RunCatalog:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        if (not os.path.isdir(db_dir)):
+            os.makedirs(db_dir)
+        # parallel runs (experiment_sweep.py) share one catalog, wait for locks
+        self.conn = sqlite3.connect(db_path, timeout=60.0)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    # adds (or replaces) a run, info: dict with keys of RUN_FIELDS, config: dict
+    def register(self, run_id, run_dir, info, config=None, status="running"):
+        config = config if config is not None else {}
+        row = dict((k, info.get(k, None)) for k in RUN_FIELDS)
+        row.update({"run_id": run_id, "run_dir": os.path.abspath(run_dir), "status": status})
+        if (row["t_created"] is None):
+            row["t_created"] = time.time()
+        if (row["config_hash"] is None):
+            row["config_hash"] = configHash(config)
+        row["config"] = json.dumps(config, sort_keys=True)
+        keys = RUN_FIELDS + ["config"]
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO runs (%s) VALUES (%s)" %(",".join(keys), ",".join(["?"]*len(keys))),
+                              [row[k] for k in keys])
+
+    def setStatus(self, run_id, status):
+        with self.conn:
+            self.conn.execute("UPDATE runs SET status=? WHERE run_id=?", (status, run_id))
+
+    # adds/overwrites metrics of a run, non numeric values are skipped
+    def setMetrics(self, run_id, metrics):
+        rows = []
+        for name, value in metrics.items():
+            try:
+                rows.append((run_id, name, float(value)))
+            except (TypeError, ValueError):
+                pass
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO metrics (run_id, name, value) VALUES (?,?,?)", rows)
+
+    def hasRun(self, run_id):
+        return self.conn.execute("SELECT 1 FROM runs WHERE run_id=?", (run_id,)).fetchone() is not None
+
+    def getMetrics(self, run_id):
+        cur = self.conn.execute("SELECT name, value FROM metrics WHERE run_id=?", (run_id,))
+        return dict((r["name"], r["value"]) for r in cur)
+
+    # runs matching all filters, as dicts with the run fields, the config and the metrics.
+    # fields: equality on run fields (lists match any of the values)
+    # metrics: {name: (op, value)}, op in METRIC_OPS
+    def query(self, metrics=None, order_by="t_created", **fields):
+        where = []
+        args = []
+        for key, val in fields.items():
+            if (key not in RUN_FIELDS):
+                raise KeyError("run catalog: unknown field " + key)
+            if (isinstance(val, (list, tuple))):
+                where.append("runs.%s IN (%s)" %(key, ",".join(["?"]*len(val))))
+                args.extend(val)
+            else:
+                where.append("runs.%s = ?" %key)
+                args.append(val)
+        for name, (op, val) in (metrics or {}).items():
+            if (op not in METRIC_OPS):
+                raise ValueError("run catalog: unknown operator " + op)
+            where.append("EXISTS (SELECT 1 FROM metrics m WHERE m.run_id = runs.run_id AND m.name = ? AND m.value %s ?)" %op)
+            args.extend([name, val])
+        if (order_by not in RUN_FIELDS):
+            raise KeyError("run catalog: unknown field " + order_by)
+        sql = "SELECT * FROM runs"
+        if (where):
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY " + order_by
+        runs = []
+        for r in self.conn.execute(sql, args).fetchall():
+            run = dict((k, r[k]) for k in RUN_FIELDS)
+            run["config"] = json.loads(r["config"]) if r["config"] else {}
+            run["metrics"] = self.getMetrics(run["run_id"])
+            runs.append(run)
+        return runs
+
+    # newest run matching the filters (see query), None if there is none
+    def latest(self, metrics=None, **fields):
+        runs = self.query(metrics=metrics, order_by="t_created", **fields)
+        return runs[-1] if runs else None
+
+# adds the logs below root that are not in the catalog yet (e.g. logs from before the catalog)
+def indexLogs(catalog, root):
+    from explog import isExplog
+    from explog import loadExplog
+    from sweep import summarizeExplog
+    n_added = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        candidates = [os.path.join(dirpath, d) for d in dirnames] + [os.path.join(dirpath, f) for f in filenames if f.endswith(".npy")]
+        for path in candidates:
+            if (not os.path.basename(path).startswith("explog") or not isExplog(path)):
+                continue
+            run_dir = os.path.dirname(path)
+            run_id = os.path.relpath(path, root)
+            if (catalog.hasRun(run_id)):
+                continue
+            attrs = loadExplog(path).attrs
+            info = {
+              "t_created": os.path.getmtime(path),
+              "scenario_id": attrs.get("scenario_id", None),
+              "track_name": attrs.get("track_name", None),
+              "robot_name": attrs.get("robot_name", None),
+              "traction_adaptive": attrs.get("traction_adaptive", None),
+              "git_rev": attrs.get("git_rev", ""),
+            }
+            if (info["scenario_id"] is not None):
+                info["scenario"] = scenarioName(info["scenario_id"], attrs.get("mu_segment_values", [1.0]))
+            catalog.register(run_id, run_dir, info, attrs.get("config", {}), status="indexed")
+            try:
+                catalog.setMetrics(run_id, summarizeExplog(path))
+            except Exception as e:
+                print("run catalog: no metrics for %s (%s)" %(path, str(e)))
+            n_added += 1
+    return n_added
+
+def parseValue(s):
+    try:
+        return json.loads(s)
+    except ValueError:
+        return s
+
+if __name__ == '__main__':
+    if (len(sys.argv) < 2):
+        print("usage: run_catalog.py <catalog.db> [field=value ...] | --index <log root>")
+        sys.exit(1)
+    catalog = RunCatalog(sys.argv[1])
+    if (len(sys.argv) == 4 and sys.argv[2] == "--index"):
+        print("indexed %i logs" %indexLogs(catalog, sys.argv[3]))
+        sys.exit(0)
+    fields = dict((a.split("=", 1)[0], parseValue(a.split("=", 1)[1])) for a in sys.argv[2:])
+    for run in catalog.query(**fields):
+        metrics = ", ".join(["%s=%.3g" %(k, v) for k, v in sorted(run["metrics"].items())])
+        print("%s  %-14s adaptive=%s  %s  %s  %s" %(run["run_id"], run["scenario"], run["traction_adaptive"],
+                                                   run["git_rev"], run["status"], metrics))
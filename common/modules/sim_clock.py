@@ -0,0 +1,59 @@
+import time
+import threading
+import rospy
+from std_msgs.msg import Header
+
+# Lockstep barrier for sim time stepping. Each node of the pipeline runs a
+# fixed rate loop and acks the sim time at which each iteration started.
+# A node that last acked t_ack is next due at t_ack + period, so the clock may
+# advance past t once t_ack + period > t holds for every registered node.
+# Nodes register with their first ack, such that nodes that are still waiting
+# for inputs (or not launched) do not block the clock.
+class StepBarrier:
+    def __init__(self, periods, eps=1e-6):
+        self.periods = dict(periods) # {node_name: loop period (s)}
+        self.t_ack = {}
+        self.eps = eps
+        self.cond = threading.Condition()
+
+    def ack(self, name, t):
+        if (name not in self.periods):
+            return
+        with self.cond:
+            if (name not in self.t_ack or t > self.t_ack[name]):
+                self.t_ack[name] = t
+            self.cond.notify_all()
+
+    # names of registered nodes that have not yet completed their step at t
+    def pending(self, t):
+        return [name for name, t_ack in self.t_ack.items() if t_ack + self.periods[name] <= t + self.eps]
+
+    # blocks until all registered nodes completed their step at t or timeout (wall clock)
+    # returns names of the nodes that timed out
+    def wait(self, t, timeout):
+        t_end = time.time() + timeout
+        with self.cond:
+            pending = self.pending(t)
+            while (pending):
+                t_remaining = t_end - time.time()
+                if (t_remaining <= 0.0):
+                    break
+                self.cond.wait(t_remaining)
+                pending = self.pending(t)
+        return pending
+
+# Publishes step acks of a node (std_msgs/Header, frame_id = node name),
+# no-op unless param /sim_time_stepping is set
+class StepAcker:
+    def __init__(self, node_name):
+        self.enabled = rospy.get_param('/sim_time_stepping', False)
+        self.msg = Header()
+        self.msg.frame_id = node_name
+        if (self.enabled):
+            self.pub = rospy.Publisher('/step_ack', Header, queue_size=10)
+
+    # t: sim time at start of the completed iteration
+    def ack(self, t):
+        if (self.enabled):
+            self.msg.stamp = rospy.Time.from_sec(t)
+            self.pub.publish(self.msg)
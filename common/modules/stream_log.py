@@ -0,0 +1,145 @@
+import os
+import glob
+import json
+import threading
+import numpy as np
+from explog import META_FILENAME
+from explog import toJson
+
+# Streaming writer of the columnar log format of explog.py, for logging whole
+# runs at full rate with bounded memory.
+# Each group has preallocated ring buffers (one per channel) that the caller
+# appends rows to. A background thread moves completed chunks of rows from the
+# rings to chunk files, close merges the chunks of every channel into a single
+# <group>.<channel>.npy and writes meta.json, such that the result is read with
+# loadExplog like any other log.
+# Appending never blocks: one producer per group writes the row and then
+# publishes it by advancing the write count, the flush thread only reads rows
+# below that count. If the flush thread falls a whole ring behind, new rows
+# are dropped (and counted) instead of waiting.
+class RingGroup:
+    def __init__(self, channels, capacity, dtype):
+        self.capacity = capacity
+        self.data = {}
+        for ch, n in channels:
+            shape = (capacity,) if n is None else (capacity, n)
+            self.data[ch] = np.zeros(shape, dtype=dtype)
+        self.n_written = 0 # rows appended (monotonic)
+        self.n_flushed = 0 # rows moved to chunk files (monotonic)
+        self.n_dropped = 0
+        self.n_chunks = 0
+
+class StreamLogWriter:
+    def __init__(self, log_dir, chunk_size=1000, n_chunks_ring=4, flush_period=0.5, attrs=None):
+        self.log_dir = log_dir
+        self.chunk_size = chunk_size
+        self.capacity = n_chunks_ring*chunk_size
+        self.flush_period = flush_period
+        self.attrs = dict(attrs) if attrs else {}
+        self.groups = {}
+        self.groups_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.close_lock = threading.Lock() # close is called from the main loop and the shutdown hook
+        self.closed = False
+        if (not os.path.isdir(log_dir)):
+            os.makedirs(log_dir)
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    # channels: list of names (scalar channels) or (name, length) for fixed
+    # length vector channels, e.g. planned trajectories
+    def addGroup(self, group, channels, dtype=np.float64):
+        channels = [(ch, None) if isinstance(ch, str) else (ch[0], ch[1]) for ch in channels]
+        with self.groups_lock:
+            self.groups[group] = RingGroup(channels, self.capacity, dtype)
+
+    def hasGroup(self, group):
+        return group in self.groups
+
+    # append one row, vector values are truncated/zero padded to the channel length
+    def append(self, group, **values):
+        g = self.groups[group]
+        if (g.n_written - g.n_flushed >= g.capacity):
+            g.n_dropped += 1
+            return False
+        i = g.n_written % g.capacity
+        for ch, val in values.items():
+            buf = g.data[ch]
+            if (buf.ndim == 1):
+                buf[i] = val
+            else:
+                val = np.asarray(val)
+                n = min(val.size, buf.shape[1])
+                buf[i, 0:n] = val[0:n]
+                buf[i, n:] = 0.0
+        g.n_written += 1 # publish row to flush thread
+        return True
+
+    def setAttrs(self, **attrs):
+        self.attrs.update(attrs)
+
+    def chunkPath(self, group, ch, k):
+        return os.path.join(self.log_dir, "%s.%s.%06i.chunk.npy" %(group, ch, k))
+
+    # write rows [n_flushed, n_flushed + n) of a group as one chunk
+    def writeChunk(self, name, g, n):
+        i0 = g.n_flushed % g.capacity
+        idx = (i0 + np.arange(n)) % g.capacity
+        for ch, buf in g.data.items():
+            np.save(self.chunkPath(name, ch, g.n_chunks), buf[idx])
+        g.n_chunks += 1
+        g.n_flushed += n
+
+    # move completed chunks (all pending rows if final) to disk
+    def flush(self, final=False):
+        with self.groups_lock:
+            groups = list(self.groups.items())
+        for name, g in groups:
+            while (g.n_written - g.n_flushed >= self.chunk_size):
+                self.writeChunk(name, g, self.chunk_size)
+            if (final and g.n_written > g.n_flushed):
+                self.writeChunk(name, g, g.n_written - g.n_flushed)
+
+    def run(self):
+        while (not self.stop_event.wait(self.flush_period)):
+            self.flush()
+
+    # stops the flush thread, merges chunks and writes meta.json (once, other
+    # callers wait until it is done)
+    def close(self):
+        with self.close_lock:
+            if (not self.closed):
+                self.merge()
+                self.closed = True
+        return self.log_dir
+
+    def merge(self):
+        self.stop_event.set()
+        self.thread.join()
+        self.flush(final=True)
+
+        meta = {"attrs": self.attrs, "groups": {}}
+        for name, g in self.groups.items():
+            meta_channels = {}
+            for ch, buf in g.data.items():
+                shape = (g.n_flushed,) + buf.shape[1:]
+                out = np.lib.format.open_memmap(os.path.join(self.log_dir, "%s.%s.npy" %(name, ch)),
+                                                mode="w+", dtype=buf.dtype, shape=shape)
+                i = 0
+                for k in range(g.n_chunks):
+                    path = self.chunkPath(name, ch, k)
+                    chunk = np.load(path)
+                    out[i:i + chunk.shape[0]] = chunk
+                    i += chunk.shape[0]
+                    os.remove(path)
+                out.flush()
+                del out
+                meta_channels[ch] = {"dtype": str(buf.dtype), "shape": list(shape)}
+            meta["groups"][name] = {"channels": meta_channels, "attrs": {"n_dropped": g.n_dropped}}
+        with open(os.path.join(self.log_dir, META_FILENAME), "w") as f:
+            json.dump(meta, f, indent=2, sort_keys=True, default=toJson)
+
+        # remove leftovers of an earlier run in the same dir
+        for path in glob.glob(os.path.join(self.log_dir, "*.chunk.npy")):
+            os.remove(path)
@@ -0,0 +1,62 @@
+import os
+import copy
+import itertools
+from explog import isExplog
+from explog import loadExplog
+from log_metrics import explogMetrics
+
+# Utilities for parameter sweeps over experiment configs.
+# A grid maps config keys to lists of values. Several keys separated by
+# commas are varied together, e.g.
+#   grid = {"traction_adaptive": [0, 1],
+#           "Nd_rollout,Nvx_rollout": [[6, 10], [10, 15]]}
+# expands to 4 runs.
+
+# list of override dicts, one per grid point
+def expandGrid(grid):
+    keys = sorted(grid.keys())
+    overrides = []
+    for values in itertools.product(*[grid[k] for k in keys]):
+        ov = {}
+        for key, value in zip(keys, values):
+            subkeys = [k.strip() for k in key.split(",")]
+            if (len(subkeys) == 1):
+                ov[subkeys[0]] = value
+            else:
+                if (len(value) != len(subkeys)):
+                    raise ValueError("sweep key %s expects %i values, got %s" %(key, len(subkeys), str(value)))
+                for k, v in zip(subkeys, value):
+                    ov[k] = v
+        overrides.append(ov)
+    return overrides
+
+# copy of config with overrides applied, unknown keys are added
+def applyOverrides(config, overrides):
+    config = copy.deepcopy(config)
+    config.update(copy.deepcopy(overrides))
+    return config
+
+# short string id of override values, used for run dir names
+def overridesToName(overrides):
+    parts = []
+    for k in sorted(overrides.keys()):
+        v = overrides[k]
+        if (isinstance(v, (list, tuple))):
+            v = "-".join([str(vi) for vi in v])
+        parts.append("%s=%s" %(k, v))
+    return "_".join(parts).replace(" ", "")
+
+# path of the explog in log_dir or its run dirs, None if no log was saved
+def findExplog(log_dir):
+    if (not os.path.isdir(log_dir)):
+        return None
+    for dirpath, dirnames, filenames in sorted(os.walk(log_dir)):
+        for fname in sorted(dirnames + filenames):
+            path = os.path.join(dirpath, fname)
+            if (fname.startswith("explog") and isExplog(path)):
+                return path
+    return None
+
+# summary metrics of an explog (see log_metrics.py)
+def summarizeExplog(filepath):
+    return explogMetrics(loadExplog(filepath))
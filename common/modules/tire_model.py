@@ -0,0 +1,56 @@
+import os
+import numpy as np
+import yaml
+
+# Piecewise linear table of magic formula coefficients B, C, E over mu (D = mu).
+# Lookups are clamped to the range of the table and work on scalars and arrays.
+class TireTable:
+    def __init__(self, mu, B, C, E):
+        self.mu = np.array(mu, dtype=float)
+        self.B = np.array(B, dtype=float)
+        self.C = np.array(C, dtype=float)
+        self.E = np.array(E, dtype=float)
+        if (np.any(np.diff(self.mu) < 0)):
+            raise ValueError("tire table: mu breakpoints must be increasing")
+
+    # from a dict with keys mu, B, C, E (e.g. rosparam /tire_table)
+    @classmethod
+    def fromDict(cls, d):
+        return cls(d["mu"], d["B"], d["C"], d["E"])
+
+    def inRange(self, mu):
+        return self.mu[0] <= mu <= self.mu[-1]
+
+    # returns B, C, D, E at mu
+    def lookup(self, mu):
+        B = np.interp(mu, self.mu, self.B)
+        C = np.interp(mu, self.mu, self.C)
+        E = np.interp(mu, self.mu, self.E)
+        return B, C, mu, E
+
+# default table file: config/tire_table.yaml of the common package (from rospkg, else next to this module)
+def defaultTireTablePath():
+    try:
+        import rospkg
+        return os.path.join(rospkg.RosPack().get_path("common"), "config", "tire_table.yaml")
+    except Exception: # no rospkg or common not on ROS_PACKAGE_PATH
+        return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "config", "tire_table.yaml"))
+
+# TireTable of the tire_table entry of a yaml file (default: defaultTireTablePath)
+def loadTireTable(path=None):
+    with open(path or defaultTireTablePath()) as f:
+        return TireTable.fromDict(yaml.safe_load(f)["tire_table"])
+
+# Surface classes of the planner (planning_util::get_cornering_stiffness and the
+# cuda rollout), class i covers [MU_CLASSES[i], MU_CLASSES[i+1])
+MU_CLASSES = [0.0, 0.3, 0.5, 0.9, 1.5, 2.5]
+B_CLASSES = [4.0, 5.0, 12.0, 10.0, 12.56]
+C_CLASSES = [2.0, 2.0, 2.3, 1.9, 1.38]
+
+# linearized magic formula, cornering stiffness B*C*D*Fz (Rajamani), scalars or arrays
+def corneringStiffness(mu, Fz):
+    mu = np.asarray(mu, dtype=float)
+    i = np.searchsorted(MU_CLASSES, mu, side="right") - 1
+    if (np.any(i < 0) or np.any(i >= len(B_CLASSES))):
+        raise ValueError("faulty mu value in corneringStiffness")
+    return np.take(B_CLASSES, i)*np.take(C_CLASSES, i)*mu*Fz
@@ -0,0 +1,81 @@
+import numpy as np
+from util import angleToContinous
+from lookahead import getArcLength
+
+# Time indexed interpolant of the trajstar channels used by the ctrl interface.
+# The table is precomputed once per received trajectory (10 Hz), sampling at
+# the current time since the trajectory was published is then O(1) and writes
+# into a preallocated output array (100 Hz).
+class TrajInterpolant:
+    # channel indices in sampled output
+    FYF = 0
+    FX = 1      # Fxf + Fxr
+    CF = 2
+    VX = 3
+    X = 4
+    Y = 5
+    PSI = 6     # continous
+    KAPPAC = 7
+    ARCLEN = 8  # arc length along X, Y
+    NCH = 9
+
+    def __init__(self, dt):
+        self.dt = dt # timestep of trajectory
+        self.data = None # (t0, base, slope), swapped as one to be thread safe
+
+    # precompute interpolation table from a common/Trajectory msg
+    def update(self, traj, t0):
+        Nx = len(traj.s) # N+1 states, N ctrls
+        base = np.zeros((Nx, self.NCH))
+        base[:, self.FYF] = self.padCtrl(traj.Fyf, Nx)
+        base[:, self.FX] = self.padCtrl(np.array(traj.Fxf) + np.array(traj.Fxr), Nx)
+        base[:, self.CF] = self.padCtrl(traj.Cf, Nx)
+        base[:, self.VX] = traj.vx
+        base[:, self.X] = traj.X
+        base[:, self.Y] = traj.Y
+        base[:, self.PSI] = angleToContinous(np.array(traj.psi))
+        base[:, self.KAPPAC] = self.padCtrl(traj.kappac, Nx)
+        base[:, self.ARCLEN] = getArcLength(base[:, self.X], base[:, self.Y])
+        slope = np.zeros((Nx, self.NCH))
+        slope[0:-1] = np.diff(base, axis=0)
+        self.data = (t0, base, slope)
+
+    # pads sequences of lenght N to N+1 by holding the final value
+    def padCtrl(self, u, Nx):
+        u = np.array(u)
+        if (u.size == 0):
+            return np.zeros(Nx)
+        if (u.size < Nx):
+            u = np.append(u, u[-1]*np.ones(Nx - u.size))
+        return u[0:Nx]
+
+    def ready(self):
+        return self.data is not None
+
+    # get table idx and fraction at time t (clamped to the horizon)
+    def locate(self, t, t0, Nx):
+        tau = (t - t0)/self.dt
+        if (tau <= 0.0):
+            return 0, 0.0
+        k = int(tau)
+        if (k >= Nx - 1):
+            return Nx - 1, 0.0
+        return k, tau - k
+
+    # sample all channels at time t, result is written to out (size NCH)
+    def sample(self, t, out):
+        t0, base, slope = self.data
+        k, frac = self.locate(t, t0, base.shape[0])
+        np.multiply(slope[k], frac, out=out)
+        out += base[k]
+        return out
+
+    # sample a single channel at time t
+    def sampleChannel(self, ch, t):
+        t0, base, slope = self.data
+        k, frac = self.locate(t, t0, base.shape[0])
+        return base[k, ch] + frac*slope[k, ch]
+
+    # time elapsed since trajectory was published
+    def age(self, t):
+        return t - self.data[0]
@@ -0,0 +1,50 @@
+import numpy as np
+from rollout import getField
+from obstacle_index import ObstacleIndex
+
+# Vectorized cost evaluation and collision checking of a trajectory set, same
+# as SAARTI::trajset_eval_cost:
+#   cost = sum_k Wx[0]*(sref_k - s_k)^2
+#        + Wslack if any point is within Rmgn of an obstacle (frenet distance)
+#        + Wslack if any point is outside [dlb, dub] at its s
+#          (or outside the drivable area of a DrivableSdf, if given)
+# The whole set is broadcast against the road bounds. Obstacles are checked
+# through an ObstacleIndex, only against the obstacles within Rmgn in s of each
+# point, at most max_elements (point, obstacle) pairs at a time.
+
+# cost, colliding and exitroad of every trajectory, s and d of shape (Ntraj, Nk)
+# obs: Obstacles msg, dict with s, d, Rmgn or ObstacleIndex (reused over calls)
+def evalTrajset(s, d, pathlocal, obs, sref, Wx0, Wslack, max_elements=1 << 22, sdf=None):
+    s = np.atleast_2d(np.asarray(s, dtype=float))
+    d = np.atleast_2d(np.asarray(d, dtype=float))
+    Ntraj, Nk = s.shape
+    sref = np.asarray(sref, dtype=float)[0:Nk]
+
+    # road bounds at the s of each point (clamped at the ends of the path)
+    if (sdf is not None):
+        exitroad = np.any(sdf.query(s, d) < 0.0, axis=1)
+    else:
+        s_path = getField(pathlocal, "s")
+        dub = np.interp(s, s_path, getField(pathlocal, "dub"))
+        dlb = np.interp(s, s_path, getField(pathlocal, "dlb"))
+        exitroad = np.any((d > dub) | (d < dlb), axis=1)
+
+    # obstacles, squared distances against squared margins
+    index = obs if isinstance(obs, ObstacleIndex) else ObstacleIndex(obs)
+    colliding = np.any(index.colliding(s, d, max_elements), axis=1)
+
+    cost = Wx0*np.sum((sref - s)**2, axis=1)
+    cost += Wslack*colliding + Wslack*exitroad
+    return cost, colliding, exitroad
+
+# index of the min cost trajectory, -1 if none is below 10*Wslack (as saarti)
+def selectTraj(cost, Wslack):
+    i = int(np.argmin(cost))
+    if (cost[i] < 10*Wslack):
+        return i
+    return -1
+
+# evaluation of a rollout.TrajSet, returns (trajhat_idx, cost, colliding, exitroad)
+def evalRollout(trajset, pathlocal, obs, sref, Wx0, Wslack, max_elements=1 << 22, sdf=None):
+    cost, colliding, exitroad = evalTrajset(trajset["s"], trajset["d"], pathlocal, obs, sref, Wx0, Wslack, max_elements, sdf)
+    return selectTraj(cost, Wslack), cost, colliding, exitroad
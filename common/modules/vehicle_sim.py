@@ -0,0 +1,132 @@
+import numpy as np
+
+# magic formula, same form as in magigformula_test.py (normalized by Fz)
+def pacejka(alpha, B, C, D, E):
+    return D*np.sin(C*np.arctan(B*alpha - E*(B*alpha - np.arctan(B*alpha))))
+
+# drivetrain map from cmd dc to total longitudinal force
+# gotthard: Fx = Cm1*dc - Cr0 (inverse of the map in ctrl_interface)
+# rhino:    Fx = dc           (Cm1 = 1, Cr0 = 0)
+def dcToFx(dc, vx, Cm1, Cr0):
+    return Cm1*dc - Cr0*(vx > 0.0)
+
+# Dynamic single track model with magic formula lateral tire forces that
+# integrates Nv independent vehicles at once. All states, inputs and tire
+# params are arrays of length Nv, each vehicle can be on its own surface.
+# Longitudinal force acts on the rear axle, front and rear forces are
+# limited to the friction circle. Below vx_kin the lateral states are
+# blended with a kinematic model to avoid the singularity at standstill.
+class BatchVehicleSim:
+    def __init__(self, Nv, m, Iz, lf, lr, g=9.81, Ni=10, vx_kin=(1.0, 3.0)):
+        self.Nv = Nv
+        self.m = m
+        self.Iz = Iz
+        self.lf = lf
+        self.lr = lr
+        self.g = g
+        self.Ni = Ni           # euler steps per call to step
+        self.vx_kin = vx_kin   # (kinematic below, dynamic above)
+
+        # static normal loads
+        self.Fzf = m*g*lr/(lf + lr)
+        self.Fzr = m*g*lf/(lf + lr)
+
+        # states
+        self.X = np.zeros(Nv)
+        self.Y = np.zeros(Nv)
+        self.psi = np.zeros(Nv)
+        self.vx = np.zeros(Nv)
+        self.vy = np.zeros(Nv)
+        self.r = np.zeros(Nv)
+
+        # tire params (default dry)
+        self.B = 10.0*np.ones(Nv)
+        self.C = 1.9*np.ones(Nv)
+        self.D = 1.0*np.ones(Nv)
+        self.E = 0.97*np.ones(Nv)
+
+        # latest tire forces (for car_info)
+        self.Fyf = np.zeros(Nv)
+        self.Fyr = np.zeros(Nv)
+        self.Fx = np.zeros(Nv)
+
+    def setPose(self, X, Y, psi, vx=0.0, idx=slice(None)):
+        self.X[idx] = X
+        self.Y[idx] = Y
+        self.psi[idx] = psi
+        self.vx[idx] = vx
+        self.vy[idx] = 0.0
+        self.r[idx] = 0.0
+
+    # D is peak friction coefficient mu, the sign convention of fssim (D < 0) is accepted
+    def setTireParams(self, B, C, D, E, idx=slice(None)):
+        self.B[idx] = B
+        self.C[idx] = C
+        self.D[idx] = np.abs(D)
+        self.E[idx] = E
+
+    # advance all vehicles by dt with steering angle delta and longitudinal force Fx (arrays or scalars)
+    def step(self, delta, Fx, dt):
+        delta = np.broadcast_to(delta, (self.Nv,))
+        Fx = np.broadcast_to(Fx, (self.Nv,))
+        h = dt/self.Ni
+        L = self.lf + self.lr
+        vx_lo, vx_hi = self.vx_kin
+        Fyf_max = self.D*self.Fzf
+        Fxr_max = self.D*self.Fzr
+
+        X = self.X
+        Y = self.Y
+        psi = self.psi
+        vx = self.vx
+        vy = self.vy
+        r = self.r
+        cdelta = np.cos(delta)
+        sdelta = np.sin(delta)
+        tdelta = np.tan(delta)
+        for k in range(self.Ni):
+            # tire forces (faded out towards the kinematic regime)
+            lam = np.clip((vx - vx_lo)/(vx_hi - vx_lo), 0.0, 1.0)
+            vx_a = np.maximum(vx, vx_lo)
+            alpha_f = delta - np.arctan((vy + self.lf*r)/vx_a)
+            alpha_r = -np.arctan((vy - self.lr*r)/vx_a)
+            Fxr = np.clip(Fx, -Fxr_max, Fxr_max)
+            Fyf = self.Fzf*pacejka(alpha_f, self.B, self.C, self.D, self.E)
+            Fyr_max = np.sqrt(np.maximum(Fxr_max**2 - Fxr**2, 0.0))
+            Fyr = np.clip(self.Fzr*pacejka(alpha_r, self.B, self.C, self.D, self.E), -Fyr_max, Fyr_max)
+            Fyf = lam*np.clip(Fyf, -Fyf_max, Fyf_max)
+            Fyr = lam*Fyr
+
+            # derivatives
+            cpsi = np.cos(psi)
+            spsi = np.sin(psi)
+            Xdot = vx*cpsi - vy*spsi
+            Ydot = vx*spsi + vy*cpsi
+            vxdot = (Fxr - Fyf*sdelta)/self.m + vy*r
+            vydot = (Fyf*cdelta + Fyr)/self.m - vx*r
+            rdot = (self.lf*Fyf*cdelta - self.lr*Fyr)/self.Iz
+
+            # euler step (no reversing)
+            X = X + h*Xdot
+            Y = Y + h*Ydot
+            psi = psi + h*r
+            vx = np.maximum(vx + h*vxdot, 0.0)
+            vy = vy + h*vydot
+            r = r + h*rdot
+
+            # blend lateral states with kinematic model at low speed
+            lam = np.clip((vx - vx_lo)/(vx_hi - vx_lo), 0.0, 1.0)
+            r_kin = vx*tdelta/L
+            vy_kin = self.lr*r_kin
+            r = lam*r + (1.0 - lam)*r_kin
+            vy = lam*vy + (1.0 - lam)*vy_kin
+
+        self.X = X
+        self.Y = Y
+        self.psi = psi
+        self.vx = vx
+        self.vy = vy
+        self.r = r
+        self.Fyf = Fyf
+        self.Fyr = Fyr
+        self.Fx = Fxr
@@ -0,0 +1,137 @@
+import numpy as np
+
+# Velocity profile of a path, same limits as SAARTI::setRefs (ref_mode 2), but
+# computed once over the whole lap instead of the local path every cycle:
+#   - kinematic limit from curvature and friction: vx <= sqrt(g mu/|kappa|), vx <= vxmax
+#   - forward pass (acceleration): vx[i+1] <= vx[i] + g mu[i] ds/vx[i]
+#   - backward pass (braking):     vx[i-1] <= vx[i] + g mu[i] ds/vx[i]
+# On closed tracks the passes start at the slowest point of the kinematic
+# limit and run one lap around, so braking and acceleration carry over the
+# start/finish line. When mu changes on a part of the path, only the range
+# the change propagates to is recomputed: the passes restart next to the
+# change and stop where the result equals the stored one.
+
+VXMAX = 30.0 # as setRefs
+KAPPA_MIN = 0.0001
+
+class VelocityProfile:
+    # s, kappa, mu of the path (pathglobal), s_lap: length of a lap for closed tracks
+    def __init__(self, s, kappa, mu, g=9.81, vxmax=VXMAX, s_lap=None):
+        self.s = np.asarray(s, dtype=float)
+        self.kappa = np.asarray(kappa, dtype=float)
+        self.mu = np.array(mu, dtype=float)
+        self.g = g
+        self.vxmax = vxmax
+        self.closed = bool(s_lap)
+        self.ds = np.diff(self.s) # step from i to i+1
+        if (self.closed):
+            self.ds = np.append(self.ds, s_lap - self.s[-1] + self.s[0])
+        self.compute()
+
+    # whole profile
+    def compute(self):
+        self.vx_lim = self.kinematicLimit(self.kappa, self.mu)
+        self.vx_fwd = self.vx_lim.copy()
+        self.vx = self.vx_lim.copy()
+        n = self.s.size
+        i_start = int(np.argmin(self.vx_lim)) if self.closed else 0 # no pass can lower the slowest point
+        i_end = i_start if self.closed else n - 1
+        self.forward(i_start, n, False)
+        self.vx[:] = self.vx_fwd
+        self.backward(i_end, n, False)
+
+    def kinematicLimit(self, kappa, mu):
+        return np.minimum(np.sqrt(self.g*mu/np.maximum(np.abs(kappa), KAPPA_MIN)), self.vxmax)
+
+    # index after/before i, None at the ends of an open path
+    def next(self, i):
+        if (i + 1 < self.s.size):
+            return i + 1
+        return 0 if self.closed else None
+
+    def prev(self, i):
+        if (i > 0):
+            return i - 1
+        return self.s.size - 1 if self.closed else None
+
+    # acceleration limit from i onwards for at least n_min steps, then until
+    # vx_fwd no longer changes. Returns the last index that was updated, None
+    # if it did not converge within a lap.
+    def forward(self, i, n_min, converge=True):
+        last = i
+        for step in range(self.s.size):
+            j = self.next(i)
+            if (j is None):
+                return last
+            v = min(self.vx_lim[j], self.vx_fwd[i] + self.g*self.mu[i]*self.ds[i]/self.vx_fwd[i])
+            if (converge and step >= n_min and v == self.vx_fwd[j]):
+                return last
+            self.vx_fwd[j] = v
+            last = j
+            i = j
+        return None if converge else last
+
+    # braking limit from i backwards (on top of vx_fwd, vx[i] is kept), same
+    # stopping rule. Returns the first index that was updated.
+    def backward(self, i, n_min, converge=True):
+        first = i
+        for step in range(self.s.size):
+            j = self.prev(i)
+            if (j is None):
+                return first
+            v = min(self.vx_fwd[j], self.vx[i] + self.g*self.mu[i]*self.ds[j]/self.vx[i])
+            if (converge and step >= n_min and v == self.vx[j]):
+                return first
+            self.vx[j] = v
+            first = j
+            i = j
+        return None if converge else first
+
+    # new friction profile, recomputes the affected range. Returns the changed
+    # index range (i0, i1) of vx (i0 > i1 if it wraps around), None if mu is unchanged.
+    def update(self, mu):
+        mu = np.asarray(mu, dtype=float)
+        changed = np.nonzero(mu != self.mu)[0]
+        if (changed.size == 0):
+            return None
+        n = self.s.size
+        i0, i1 = int(changed[0]), int(changed[-1])
+        if (self.closed and changed.size > 1):
+            # shortest arc around the lap that covers the change
+            gaps = np.diff(changed)
+            k = int(np.argmax(gaps))
+            if (gaps[k] > changed[0] + n - changed[-1]):
+                i0, i1 = int(changed[k+1]), int(changed[k])
+        idx = (i0 + np.arange((i1 - i0) % n + 1)) % n
+        self.mu[idx] = mu[idx]
+        self.vx_lim[idx] = self.kinematicLimit(self.kappa[idx], self.mu[idx])
+        if (idx.size == n):
+            self.compute()
+            return 0, n - 1
+
+        # forward pass from the point before the change, the entries up to i1 always update
+        start = self.prev(i0)
+        if (start is None):
+            self.vx_fwd[0] = self.vx_lim[0]
+            start = 0
+        n_changed = (i1 - start) % n
+        self.vx_fwd[idx] = self.vx_lim[idx]
+        j_fwd = self.forward(start, n_changed)
+
+        # backward pass from the end of the changed forward range
+        end = self.next(j_fwd) if j_fwd is not None else None
+        if (j_fwd is not None and end is None):
+            end = self.s.size - 1
+            self.vx[end] = self.vx_fwd[end]
+        j_bwd = self.backward(end, (end - i0) % n) if end is not None else None
+        if (j_fwd is None or j_bwd is None): # change propagates around the whole lap
+            self.compute()
+            return 0, n - 1
+        return j_bwd, j_fwd
+
+    # profile at s (wraps around on closed tracks)
+    def at(self, s):
+        if (self.closed):
+            s_lap = self.s[-1] + self.ds[-1] - self.s[0]
+            return np.interp(s, self.s, self.vx, period=s_lap)
+        return np.interp(s, self.s, self.vx)
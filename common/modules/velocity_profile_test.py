@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+
+# check of VelocityProfile.update against the profile computed from scratch
+# with the new friction, on an open path and a closed track, for changes in
+# the middle, at the ends and across the start/finish line
+
+import sys
+import numpy as np
+
+from velocity_profile import VelocityProfile
+
+N = 400
+s = np.arange(N)*1.0
+kappa = 0.03*np.sin(2*np.pi*s/150.0)**3
+mu0 = np.ones(N)
+
+# index ranges of mu changes, (i0, i1) with i0 > i1 across the start/finish line
+changes = [(150, 170), (0, 30), (380, 399), (390, 15), (200, 200), (0, 399)]
+
+n_fail = 0
+for s_lap in [None, N*1.0]:
+    profile = VelocityProfile(s, kappa, mu0, s_lap=s_lap)
+    rs = np.random.RandomState(0)
+    for i0, i1 in changes:
+        mu = profile.mu.copy()
+        idx = (i0 + np.arange((i1 - i0) % N + 1)) % N
+        mu[idx] = rs.uniform(0.3, 1.2)
+        vx_old = profile.vx.copy()
+        rng = profile.update(mu)
+        vx_ref = VelocityProfile(s, kappa, mu, s_lap=s_lap).vx
+        err = np.max(np.abs(profile.vx - vx_ref))
+
+        # all changes of vx within the returned range
+        outside = np.ones(N, dtype=bool)
+        if (rng is not None):
+            j0, j1 = rng
+            outside[(j0 + np.arange((j1 - j0) % N + 1)) % N] = False
+        ok = err == 0.0 and np.array_equal(profile.vx[outside], vx_old[outside])
+        n_fail += not ok
+        print("%-6s change %3i-%3i  range %-12s max error %g  %s" %("closed" if s_lap else "open", i0, i1, rng, err, "ok" if ok else "MISMATCH"))
+
+if (n_fail > 0):
+    print("FAILED")
+    sys.exit(1)
+print("OK")
@@ -20,6 +20,12 @@ from fssim_common.msg import Cmd
 from visualization_msgs.msg import Marker
 from std_msgs.msg import Float32
 from coordinate_transforms import ptsFrenetToCartesian
+from lookahead import getLookaheadDistance
+from lookahead import LookaheadPath
+from actuator_delay import CmdRingBuffer
+from traj_interp import TrajInterpolant
+from loop_monitor import LoopMonitor
+from sim_clock import StepAcker
 from std_msgs.msg import Int16
 
 class CtrlInterface:
@@ -28,6 +34,10 @@ class CtrlInterface:
         # params
         self.robot_name = rospy.get_param('/robot_name')
         
+        # get cc setpoint (cc_dref is used in pathlocal_callback)
+        self.cc_vxref = rospy.get_param('/cc_vxref')
+        self.cc_dref = rospy.get_param('/cc_dref')
+        
         # init node subs pubs
         rospy.init_node('ctrl_interface', anonymous=True)
         self.trajstarsub = rospy.Subscriber("trajstar", Trajectory, self.trajstar_callback)
@@ -37,16 +47,25 @@ class CtrlInterface:
         self.vehicleinpub = rospy.Publisher('/fssim/cmd', Cmd, queue_size=10)
         self.lhptpub = rospy.Publisher('/lhpt_vis', Marker, queue_size=1)
         self.vx_errorpub = rospy.Publisher('/vx_error_vis', Float32, queue_size=1)
-        self.rate = rospy.Rate(100)
+        self.dt = 0.01
+        self.rate = rospy.Rate(1/self.dt) # 100hz
 
         # set static vehicle params
         self.setStaticParams()
+        self.setLoopMonitorParams()
+        self.setLookaheadParams()
 
         # init msgs
         self.state = State()
         self.vehicle_in = Cmd()
         self.trajstar = Trajectory()
+        self.dt_algo = 0.1 # timestep of trajstar (from acado)
+        self.trajstar_interp = TrajInterpolant(self.dt_algo)
+        self.trajstar_now = np.zeros(TrajInterpolant.NCH) # trajstar sampled at ctrl time
+        self.trajstar_lhpath = LookaheadPath() # trajstar parametrized by arc length
         self.pathlocal = Path()
+        self.pathlocal_lhpath = LookaheadPath() # pathlocal at cc_dref parametrized by s
+        self.pathlocal_kappac = (np.zeros(0), np.zeros(0)) # s, kappa_c of pathlocal as arrays (one tuple, swapped at once)
         self.ctrl_mode = 0 # 0: stop, 1: cruise_ctrl, 2: tamp 
         self.trajstar_received = False
         self.pathlocal_received = False
@@ -55,12 +74,11 @@ class CtrlInterface:
         # ctrl errors
         self.vx_error = Float32()
         
-        # get cc setpoint
-        self.cc_vxref = rospy.get_param('/cc_vxref')
-        self.cc_dref = rospy.get_param('/cc_dref')
-        
-        # delay sim variable
-        self.delta_out_FIFO = []
+        # actuator delay (simulation and compensation)
+        self.setDelayParams()
+        self.cmd_buffer = CmdRingBuffer(max(self.t_delay,self.dt),self.dt)
+        self.state_pred = State()
+        self.state_ctrl = self.state # state used for ctrl (predicted if compensating)
 
         # misc vars
         self.delta_out_last = 0
@@ -77,12 +95,40 @@ class CtrlInterface:
 
         while(self.ctrl_mode == 0):
             rospy.loginfo_throttle(1, "waiting for activation from exp manager")
-            self.rate.sleep
+            self.rate.sleep()
             
         # main loop
+        self.loop = LoopMonitor(self.dt,
+                                self.rate.sleep,
+                                now_fcn=rospy.get_time,
+                                overrun_window=self.overrun_window,
+                                overrun_limit=self.overrun_limit)
+        rospy.on_shutdown(self.report_timing)
+        self.stepacker = StepAcker("ctrl_interface")
+        t_report = rospy.get_time()
         while not rospy.is_shutdown(): 
             
-            if(self.ctrl_mode == 0):     # STOP (set by exp manager if outside of track)
+            # compensate actuator delay by predicting state at cmd effective time
+            t_now = rospy.get_time()
+            if(self.compensate_delay):
+                s_path, kappac_path = self.pathlocal_kappac
+                kappac = np.interp(self.state.s,s_path,kappac_path)
+                self.state_ctrl = self.cmd_buffer.predictState(self.state,t_now,self.t_delay,self.lf,self.lr,self.state_pred,kappac)
+                self.t_ctrl = t_now + self.t_delay
+            else:
+                self.state_ctrl = self.state
+                self.t_ctrl = t_now
+            
+            # degraded behavior if the loop persistently overruns
+            ctrl_mode = self.ctrl_mode
+            if(self.loop.degraded and ctrl_mode != 0):
+                rospy.logwarn_throttle(1, "ctrl_interface: persistent overruns, degraded mode %i"%self.degraded_mode)
+                if(self.degraded_mode == 1):
+                    ctrl_mode = 1
+                elif(self.degraded_mode == 2):
+                    ctrl_mode = 0
+            
+            if(ctrl_mode == 0):     # STOP (set by exp manager if outside of track)
                 if (self.state.vx > 0.1):
                     rospy.loginfo_throttle(1,"in stop mode")
                     delta_out = self.delta_out_last
@@ -90,28 +136,37 @@ class CtrlInterface:
                 else:
                     delta_out = 0
                     dc_out = 0
-            elif(self.ctrl_mode == 1):   # CRUISE CTRL             
+            elif(ctrl_mode == 1):   # CRUISE CTRL             
                 delta_out, dc_out, Xlh,Ylh = self.cc_ctrl()           
                            
-            elif(self.ctrl_mode == 2):   # TAMP   
+            elif(ctrl_mode == 2):   # TAMP   
                 while(not self.trajstar_received):
                     print("waiting for trajstar, stopping")
                     delta_out = 0
                     dc_out = 0
+                    self.stepacker.ack(rospy.get_time())
                     self.rate.sleep()         
                 delta_out, dc_out, Xlh, Ylh = self.tamp_ctrl()
             else:
                 print "invalid ctrl_mode! ctrl_mode = ", self.ctrl_mode
     
+            # store cmd, hold back by t_delay if simulating actuator delay
+            self.cmd_buffer.push(t_now,delta_out,dc_out)
+            if(self.simulate_delay):
+                delta_pub, dc_pub = self.cmd_buffer.getDelayed(t_now,self.t_delay)
+            else:
+                delta_pub = delta_out
+                dc_pub = dc_out
+    
             # publish ctrl cmd            
-            self.vehicle_in.delta = delta_out
+            self.vehicle_in.delta = delta_pub
             #print "dc_out published = ", dc_out
-            self.vehicle_in.dc = dc_out
+            self.vehicle_in.dc = dc_pub
             self.vehicleinpub.publish(self.vehicle_in)
 
             # publish tuning info
             self.vx_errorpub.publish(self.vx_error)
-            if (self.ctrl_mode in [1,2]):
+            if (ctrl_mode in [1,2]):
                 m = self.getlhptmarker(Xlh,Ylh)
                 self.lhptpub.publish(m)
 
@@ -119,32 +174,33 @@ class CtrlInterface:
             self.delta_out_last = delta_out
             self.dc_out_last = dc_out
 
-            self.rate.sleep()
+            # report loop timing
+            if(t_now - t_report >= self.stats_period):
+                self.report_timing()
+                t_report = t_now
+
+            # signal completed step (sim time stepping)
+            self.stepacker.ack(t_now)
+
+            self.loop.sleep()
     
     def cc_ctrl(self):
         rospy.loginfo_throttle(1, "Running CC control")
         
-        if(self.state.vx > 0.0):
+        if(self.state_ctrl.vx > 0.0):
             # get lhpt
-            lhdist = 7 # todo determine from velocity
-            s_lh = self.state.s + lhdist
-            d_lh = self.cc_dref
-            
-            Xlh, Ylh = ptsFrenetToCartesian(np.array([s_lh]), \
-                                            np.array([d_lh]), \
-                                            np.array(self.pathlocal.X), \
-                                            np.array(self.pathlocal.Y), \
-                                            np.array(self.pathlocal.psi_c), \
-                                            np.array(self.pathlocal.s))
+            lhdist = getLookaheadDistance(self.state_ctrl.vx,self.t_lh,self.lhdist_min,self.lhdist_max)
+            s_lh = self.state_ctrl.s + lhdist
+            Xlh, Ylh = self.pathlocal_lhpath.getPoint(s_lh)
             
-            rho_pp = self.pp_curvature(self.state.X,self.state.Y,self.state.psi,Xlh[0],Ylh[0])
+            rho_pp = self.pp_curvature(self.state_ctrl.X,self.state_ctrl.Y,self.state_ctrl.psi,Xlh,Ylh)
             delta_out = rho_pp*(self.lf + self.lr) # kinematic feed fwd
         else:
             Xlh = 0.0
             Ylh = 0.0
             delta_out = 0.0
         
-        self.vx_error = self.cc_vxref - self.state.vx
+        self.vx_error = self.cc_vxref - self.state_ctrl.vx
         if(self.robot_name == "gotthard"):
             k = 500
         elif(self.robot_name == "rhino"):
@@ -158,21 +214,23 @@ class CtrlInterface:
         
     def tamp_ctrl(self):
         rospy.loginfo_throttle(1, "Running TAMP control")
+        # sample trajstar at current time (interpolated between planning steps)
+        ts = self.trajstar_interp.sample(self.t_ctrl,self.trajstar_now)
+        
         # LATERAL CTRL
         # feedfwd        
         # compute local curvature of trajhat (rho)
-        lhpt_idx = 7;
-        Xlh = self.trajstar.X[lhpt_idx]
-        Ylh = self.trajstar.Y[lhpt_idx]
-        rho_pp = self.pp_curvature(self.trajstar.X[0],
-                                   self.trajstar.Y[0],
-                                   self.trajstar.psi[0],
+        lhdist = getLookaheadDistance(ts[TrajInterpolant.VX],self.t_lh,self.lhdist_min,self.lhdist_max)
+        Xlh, Ylh = self.trajstar_lhpath.getPoint(ts[TrajInterpolant.ARCLEN] + lhdist)
+        rho_pp = self.pp_curvature(ts[TrajInterpolant.X],
+                                   ts[TrajInterpolant.Y],
+                                   ts[TrajInterpolant.PSI],
                                    Xlh,
                                    Ylh)
 
         # kin + dyn feedforward        
         kin_ff_term = rho_pp*(self.lf + self.lr)         
-        dyn_ff_term = 0.9*self.trajstar.Fyf[0]/self.trajstar.Cf[0] # 0.5
+        dyn_ff_term = 0.9*ts[TrajInterpolant.FYF]/ts[TrajInterpolant.CF] # 0.5
         if(self.robot_name == "gotthard"): 
             dyn_ff_term = 0.1*dyn_ff_term
         delta_out = kin_ff_term + dyn_ff_term
@@ -180,13 +238,14 @@ class CtrlInterface:
 
         # LONGITUDINAL CTRL
         # feedfwd
-        Fx_request = self.trajstar.Fxf[0] + self.trajstar.Fxr[0]
+        Fx_request = ts[TrajInterpolant.FX]
+        vxref = self.trajstar_interp.sampleChannel(TrajInterpolant.VX,self.t_ctrl + self.dt_algo)
         
         if(self.robot_name == "gotthard"):
             # feedfwd 
           
             feedfwd = 1.1*Fx_request 
-            self.vx_error = self.trajstar.vx[1]-self.state.vx
+            self.vx_error = vxref-self.state_ctrl.vx
             feedback = 0.0*self.vx_error
             
             Cr0 = 180
@@ -195,7 +254,7 @@ class CtrlInterface:
             
         elif(self.robot_name == "rhino"):
             feedfwd = Fx_request
-            self.vx_error = self.trajstar.vx[1]-self.state.vx
+            self.vx_error = vxref-self.state_ctrl.vx
             feedback = 50000*self.vx_error
             #print("feedback: ", feedback)
             dc_out = feedfwd + feedback
@@ -250,10 +309,26 @@ class CtrlInterface:
 
     def trajstar_callback(self, msg):
         self.trajstar = msg
+        # precompute interpolant, t0 is time of the first point (start of the saarti iteration)
+        t0 = msg.header.stamp.to_sec()
+        if(t0 == 0.0):
+            t0 = rospy.get_time()
+        self.trajstar_interp.update(msg,t0)
+        self.trajstar_lhpath.update(msg.X,msg.Y)
         self.trajstar_received = True
   
     def pathlocal_callback(self, msg):
         self.pathlocal = msg
+        # precompute lookahead path at cc_dref (once per pathlocal instead of every tick)
+        s = np.array(msg.s)
+        Xd, Yd = ptsFrenetToCartesian(s, \
+                                      self.cc_dref*np.ones(s.size), \
+                                      np.array(msg.X), \
+                                      np.array(msg.Y), \
+                                      np.array(msg.psi_c), \
+                                      s)
+        self.pathlocal_lhpath.update(Xd,Yd,s)
+        self.pathlocal_kappac = (s, np.array(msg.kappa_c))
         self.pathlocal_received = True
 
     def state_callback(self, msg):
@@ -269,6 +344,29 @@ class CtrlInterface:
         self.lf = rospy.get_param('/car/kinematics/b_F')
         self.lr = rospy.get_param('/car/kinematics/b_R')
 
+    def setLoopMonitorParams(self):
+        self.overrun_window = rospy.get_param('/overrun_window', 100)
+        self.overrun_limit = rospy.get_param('/overrun_limit', 20)
+        self.degraded_mode = rospy.get_param('/degraded_mode', 0)
+        self.stats_period = rospy.get_param('/stats_period', 10.0)
+
+    def setLookaheadParams(self):
+        self.t_lh = rospy.get_param('/t_lh', 0.5)
+        self.lhdist_min = rospy.get_param('/lhdist_min', 5.0)
+        self.lhdist_max = rospy.get_param('/lhdist_max', 25.0)
+
+    def report_timing(self):
+        rospy.loginfo("ctrl_interface timing: " + self.loop.getReport())
+
+    def setDelayParams(self):
+        # actuator delay params are set per robot_name
+        delay_params = rospy.get_param('/actuator_delay/' + self.robot_name, {})
+        self.t_delay = delay_params.get('t_delay', 0.0)
+        self.compensate_delay = bool(delay_params.get('compensate', 0))
+        self.simulate_delay = bool(delay_params.get('simulate', 0))
+        if(self.compensate_delay or self.simulate_delay):
+            rospy.loginfo("ctrl_interface: actuator delay %.3f s, compensate: %i, simulate: %i"%(self.t_delay,self.compensate_delay,self.simulate_delay))
+
 if __name__ == '__main__':
     ci = CtrlInterface()
     try:
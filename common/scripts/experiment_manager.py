@@ -2,15 +2,17 @@
 
 '''
 Description: This node
-    - Publishes clock, controlling simulation time
+    - Publishes clock, controlling simulation time (if sim_time_stepping)
     - controls pop-up obstacles
     - controls friction conditions
     - save or plot run data 
     - all other nodes shut down when this shuts down
 '''
 
+import os
 import time
 import copy 
+import yaml
 import numpy as np
 import rospy
 from rosgraph_msgs.msg import Clock
@@ -20,10 +22,27 @@ from common.msg import State
 from common.msg import Trajectory
 from fssim_common.msg import TireParams
 from fssim_common.msg import CarInfo
+from fssim_common.msg import Cmd
 from std_msgs.msg import Int16
+from std_msgs.msg import Header
 from visualization_msgs.msg import Marker
 from coordinate_transforms import ptsFrenetToCartesian
 from std_srvs.srv import Empty
+from sim_clock import StepBarrier
+from explog import ExpLogWriter
+from stream_log import StreamLogWriter
+from tire_model import TireTable
+from tire_model import loadTireTable
+from run_catalog import RunCatalog
+from run_catalog import scenarioName
+from run_catalog import configHash
+from run_catalog import gitRevision
+from run_catalog import newRunDir
+from run_catalog import defaultLogDir
+from sweep import summarizeExplog
+from log_metrics import runMetrics
+from drivable_sdf import DrivableSdf
+from drivable_sdf import pathKey
 
 class ExperimentManager:
     # constructor
@@ -34,6 +53,13 @@ class ExperimentManager:
         self.t_activate = rospy.get_param('/t_activate')
         self.t_final = rospy.get_param('/t_final')             
         
+        # sim time stepping: /clock is owned by this node and advanced as soon
+        # as all nodes in step_ack_nodes have completed the current step.
+        # Otherwise the experiment is paced against the wall clock. 
+        self.sim_time_stepping = rospy.get_param('/sim_time_stepping', False)
+        self.step_ack_nodes = rospy.get_param('/step_ack_nodes', {}) # {node name: loop period}
+        self.step_timeout = rospy.get_param('/step_timeout', 1.0) # max wall time to wait for acks
+        
         # pop-up scenario params
         self.s_ego_at_popup = rospy.get_param('/s_ego_at_popup')
         self.s_obs_at_popup = rospy.get_param('/s_obs_at_popup')
@@ -46,9 +72,26 @@ class ExperimentManager:
         self.N_mu_segments = len(self.s_begin_mu_segments)
         self.mu_segment_idx = 0
         
+        # tire params (mu -> magic formula coefficients)
+        if (rospy.has_param('/tire_table')):
+            self.tire_table = TireTable.fromDict(rospy.get_param('/tire_table'))
+        else: # launched without the config, same table from the file
+            self.tire_table = loadTireTable()
+        self.tireparams_keepalive = rospy.get_param('/tireparams_keepalive', 1.0) # republish period (s)
+        self.mu_published = None
+        self.t_tireparams_published = -float('inf')
+        
         # vehicle params
         self.robot_name = rospy.get_param('/robot_name') 
         self.vehicle_width = rospy.get_param('/car/kinematics/l_width')
+        self.vehicle = { # stored with the logs, for the metrics (log_metrics.py)
+          "m": rospy.get_param('/car/inertia/m'),
+          "g": rospy.get_param('/car/inertia/g', 9.81),
+          "lf": rospy.get_param('/car/kinematics/b_F'),
+          "lr": rospy.get_param('/car/kinematics/b_R'),
+          "h_cg": rospy.get_param('/car/kinematics/h_cg', 0.5),
+          "width": self.vehicle_width,
+        }
         
         
         
@@ -57,21 +100,28 @@ class ExperimentManager:
         dt_algo = 0.1
         
         # set up pausing of gazebo
-        rospy.wait_for_service('gazebo/pause_physics')
-        pause_gazebo = rospy.ServiceProxy('gazebo/pause_physics', Empty)
-        rospy.wait_for_service('gazebo/unpause_physics')
-        unpause_gazebo = rospy.ServiceProxy('gazebo/unpause_physics', Empty)
-        self.s_pause_gazebo = rospy.get_param('/s_pause_gazebo')
+        self.s_pause_gazebo = rospy.get_param('/s_pause_gazebo', [])
         n_pauses = len(self.s_pause_gazebo) 
         i_pauses = 0
+        if (n_pauses > 0):
+            rospy.wait_for_service('gazebo/pause_physics')
+            pause_gazebo = rospy.ServiceProxy('gazebo/pause_physics', Empty)
+            rospy.wait_for_service('gazebo/unpause_physics')
+            unpause_gazebo = rospy.ServiceProxy('gazebo/unpause_physics', Empty)
+        
+        self.runlog = None # full run log, opened once the scenario is known
         
         # init node subs pubs
         rospy.init_node('experiment_manager', anonymous=True)
-        #self.clockpub = rospy.Publisher('/clock', Clock, queue_size=10)   
+        if (self.sim_time_stepping):
+            self.clockpub = rospy.Publisher('/clock', Clock, queue_size=10)
+            self.step_barrier = StepBarrier(self.step_ack_nodes)
+            self.stepacksub = rospy.Subscriber("/step_ack", Header, self.stepack_callback, queue_size=100)
         self.pathglobalsub = rospy.Subscriber("pathglobal", Path, self.pathglobal_callback)
         self.statesub = rospy.Subscriber("state", State, self.state_callback)
         self.carinfosub = rospy.Subscriber("/fssim/car_info", CarInfo, self.fssim_carinfo_callback)
         self.trajstarsub = rospy.Subscriber("trajstar", Trajectory, self.trajstar_callback)
+        self.cmdsub = rospy.Subscriber("/fssim/cmd", Cmd, self.cmd_callback)
         self.obspub = rospy.Publisher('/obs', Obstacles, queue_size=1)
         self.obsvispub = rospy.Publisher('/obs_vis', Marker, queue_size=1)
         self.tireparampub = rospy.Publisher('/tire_params', TireParams, queue_size=1)
@@ -80,6 +130,15 @@ class ExperimentManager:
 
         # init logging vars
         self.s_begin_log = rospy.get_param('/s_begin_log')
+        # every run gets a new dir below log_dir, runs are indexed in the catalog
+        self.log_dir = rospy.get_param('/log_dir', "")
+        if (not self.log_dir):
+            self.log_dir = defaultLogDir()
+        self.catalog_path = rospy.get_param('/catalog_path', "")
+        if (not self.catalog_path):
+            self.catalog_path = os.path.join(self.log_dir, "catalog.db")
+        self.run_name = rospy.get_param('/run_name', "")
+        self.exp_config_path = rospy.get_param('/exp_config_path', "")
         self.N_iters_to_save = 60
         self.explog_iterationcounter = 0
         self.explog_activated = False
@@ -87,23 +146,54 @@ class ExperimentManager:
         self.stored_trajstar = False
         self.stored_trajcl = False
         self.explog_saved = False
+        self.trajcl_channels = ["X","Y","psi","s","d","deltapsi","psidot","vx","vy","ax","ay","t","Fyf","Fyr","Fx"]
         
         # init misc internal variables
         self.pathglobal = Path()
         self.received_pathglobal = False
+        self.sdf = None # drivable area of pathglobal
+        self.sdf_key = None
         self.state = State()
         self.received_state = False
         self.trajstar = Trajectory()
         self.received_trajstar = False
         self.fssim_carinfo = CarInfo()
         
+        # init clock (simtime is monotonic, exptime starts at 0 in main loop)
+        self.clock = Clock()
+        self.k_step = 0
+        self.simtime = 0.0
+        self.t_wall_start = time.time()
+        
+        # the clock keeps running while waiting, other nodes are driven by it
         while(not self.received_pathglobal):
-            print("waiting for pathglobal")
-            time.sleep(self.dt_sim*100)
+            rospy.loginfo_throttle(1, "waiting for pathglobal")
+            self.stepClock()
 
         # init experiment variables
         self.scenario_id = rospy.get_param('/scenario_id')
         self.traction_adaptive  = rospy.get_param('/traction_adaptive')
+        self.initRun()
+        
+        # full run log (all topics of interest at full rate, flushed in the background)
+        if (rospy.get_param('/runlog', True)):
+            self.runlog = StreamLogWriter(self.getExplogPath("runlog"), attrs={
+              "robot_name": self.robot_name,
+              "track_name": self.track_name,
+              "scenario_id": self.scenario_id,
+              "traction_adaptive": self.traction_adaptive,
+              "s_begin_mu_segments": self.s_begin_mu_segments,
+              "mu_segment_values": self.mu_segment_values,
+              "vehicle": self.vehicle,
+              "s_lap": self.s_lap,
+            })
+            # all groups stamped with rospy time (the step counter of stepClock is logged as exp/simtime)
+            self.runlog.addGroup("state", ["t","X","Y","psi","s","d","deltapsi","psidot","vx","vy","ax","ay"])
+            self.runlog.addGroup("car_info", ["t","Fyf","Fyr","Fx"])
+            self.runlog.addGroup("cmd", ["t","delta","dc"])
+            self.runlog.addGroup("tire_params", ["t","mu","B","C","D","E"])
+            self.runlog.addGroup("exp", ["t","simtime","exptime","ctrl_mode","mu_segment_idx"])
+            rospy.on_shutdown(self.closeRunlog)
         
         self.tireparams = TireParams()
         self.obs = Obstacles()
@@ -121,6 +211,7 @@ class ExperimentManager:
         self.ctrl_mode = 0 # # 0: stop, 1: cruise_ctrl, 2: tamp 
         
         # Main loop
+        t_exp_start = self.simtime
         self.exptime = 0 
         while (not rospy.is_shutdown()) and self.exptime<self.t_final :
             if (self.exptime >= self.t_activate):        
@@ -142,44 +233,22 @@ class ExperimentManager:
                 #print "mu_segment_idx =     ", self.mu_segment_idx
                 #print "mu in this section = ", self.mu_segment_values[self.mu_segment_idx] 
                 
-                # set tire params of sim vehicle
-                
-                
-                if (0.0 <= mu <0.3): # ice
-                    B = 4.0
-                    C = 2.0
-                    D = mu
-                    E = 1.0
-                elif (0.3 <= mu < 0.5): # snow
-                    B = 5.0
-                    C = 2.0
-                    D = mu
-                    E = 1.0
-                elif (0.5 <= mu < 0.9): # wet
-                    B = 12.0
-                    C = 2.3
-                    D = mu
-                    E = 1.0
-                elif (0.9 <= mu < 1.5): # dry
-                    B = 10.0
-                    C = 1.9
-                    D = mu
-                    E = 0.97
-                elif (1.5 <= mu < 2.5): # dry + racing tires (gotthard default)
-                    B = 12.56;
-                    C = 1.38; 
-                    D = mu;
-                    E = 1.0               
-                else: 
-                    rospy.loginfo_throttle(1, "Faulty mu value in exp manager")
-                                
-                self.tireparams.tire_coefficient = 1.0        
-                self.tireparams.B = B
-                self.tireparams.C = C
-                self.tireparams.D = -D
-                self.tireparams.E = E    
-                self.tireparams.header.stamp = rospy.Time.now()
-                self.tireparampub.publish(self.tireparams)
+                # set tire params of sim vehicle (on change of mu and as keepalive)
+                if (mu != self.mu_published or self.simtime - self.t_tireparams_published >= self.tireparams_keepalive):
+                    if (not self.tire_table.inRange(mu)):
+                        rospy.loginfo_throttle(1, "Faulty mu value in exp manager")
+                    B, C, D, E = self.tire_table.lookup(mu)
+                    self.tireparams.tire_coefficient = 1.0        
+                    self.tireparams.B = float(B)
+                    self.tireparams.C = float(C)
+                    self.tireparams.D = -float(D)
+                    self.tireparams.E = float(E)    
+                    self.tireparams.header.stamp = rospy.Time.now()
+                    self.tireparampub.publish(self.tireparams)
+                    self.mu_published = mu
+                    self.t_tireparams_published = self.simtime
+                    if (self.runlog is not None):
+                        self.runlog.append("tire_params", t=rospy.get_time(), mu=mu, B=B, C=C, D=D, E=E)
                 
                 # POPUP SCENARIO
                 if (self.scenario_id == 1):
@@ -205,11 +274,11 @@ class ExperimentManager:
                     self.ctrl_mode = 2 # tamp
                 
                 # SEND STOP IF EXIT TRACK
-                dlb = np.interp(self.state.s,self.pathglobal.s,self.pathglobal.dlb)
-                dub = np.interp(self.state.s,self.pathglobal.s,self.pathglobal.dub)
-                if (self.state.d < dlb-1.0 or self.state.d > dub+1.0): # todo get from param
+                if (self.sdf.query(self.state.s, self.state.d) < -1.0): # todo get from param
                     self.ctrl_mode = 0 # stop
                 self.ctrl_mode_pub.publish(self.ctrl_mode)
+                if (self.runlog is not None):
+                    self.runlog.append("exp", t=rospy.get_time(), simtime=self.simtime, exptime=self.exptime, ctrl_mode=self.ctrl_mode, mu_segment_idx=self.mu_segment_idx)
                 
                 # publish text marker (state info)
                 if(self.traction_adaptive):
@@ -235,138 +304,161 @@ class ExperimentManager:
                     print "STARTED EXPLOG"
                     t_start_explog = copy.deepcopy(self.exptime) 
                     self.explog_activated = True
+                    self.explog = ExpLogWriter(self.getExplogPath(), attrs={
+                      "run_id": self.run_id,
+                      "config_hash": self.config_hash,
+                      "git_rev": self.git_rev,
+                      "robot_name": self.robot_name,
+                      "track_name": self.track_name,
+                      "scenario_id": self.scenario_id,
+                      "traction_adaptive": self.traction_adaptive,
+                      "s_begin_mu_segments": self.s_begin_mu_segments,
+                      "mu_segment_values": self.mu_segment_values,
+                      "vehicle": self.vehicle,
+                      "t_start_explog": t_start_explog,
+                    })
+                    self.explog.setArrays("pathglobal", self.pathglobal_dict)
+                    self.explog.setArrays("drivable_sdf", self.sdf.toDict())
+                    
                     # store planned traj
-                    self.trajstar_dict = {
-                      "X": np.array(self.trajstar.X),
-                      "Y": np.array(self.trajstar.Y),
-                      "psi": np.array(self.trajstar.psi),
-                      "s": np.array(self.trajstar.s),
-                      "d": np.array(self.trajstar.d),
-                      "deltapsi": np.array(self.trajstar.deltapsi),
-                      "psidot": np.array(self.trajstar.psidot),
-                      "vx": np.array(self.trajstar.vx),
-                      "vy": np.array(self.trajstar.vy),
-                      "ax": np.array(self.trajstar.ax),
-                      "ay": np.array(self.trajstar.ay),
-                      "Fyf": np.array(self.trajstar.Fyf),
-                      "Fxf": np.array(self.trajstar.Fxf),
-                      "Fyr": np.array(self.trajstar.Fyr),
-                      "Fxr": np.array(self.trajstar.Fxr),
-                      "Fzf": np.array(self.trajstar.Fzf),
-                      "Fzr": np.array(self.trajstar.Fzr),
-                      "kappac": np.array(self.trajstar.kappac),
-                      "Cr": np.array(self.trajstar.Cr),
+                    self.explog.setArrays("trajstar", {
+                      "X": self.trajstar.X,
+                      "Y": self.trajstar.Y,
+                      "psi": self.trajstar.psi,
+                      "s": self.trajstar.s,
+                      "d": self.trajstar.d,
+                      "deltapsi": self.trajstar.deltapsi,
+                      "psidot": self.trajstar.psidot,
+                      "vx": self.trajstar.vx,
+                      "vy": self.trajstar.vy,
+                      "ax": self.trajstar.ax,
+                      "ay": self.trajstar.ay,
+                      "Fyf": self.trajstar.Fyf,
+                      "Fxf": self.trajstar.Fxf,
+                      "Fyr": self.trajstar.Fyr,
+                      "Fxr": self.trajstar.Fxr,
+                      "Fzf": self.trajstar.Fzf,
+                      "Fzr": self.trajstar.Fzr,
+                      "kappac": self.trajstar.kappac,
+                      "Cr": self.trajstar.Cr,
                       "t": np.arange(0,(N+1)*dt_algo,dt_algo),
-                    }
+                    })
                     self.stored_trajstar = True
                     
-                    # initialize vars for storing CL traj
-                    self.X_cl = []
-                    self.Y_cl = []
-                    self.psi_cl = []
-                    self.s_cl = []
-                    self.d_cl = []
-                    self.deltapsi_cl = []
-                    self.psidot_cl = []
-                    self.vx_cl = []
-                    self.vy_cl = []
-                    self.ax_cl = []
-                    self.ay_cl = []
-                    self.t_cl = []
-                    self.Fyf_cl = []
-                    self.Fyr_cl = []
-                    self.Fx_cl = []
+                    # preallocate CL traj, N+1 values, same as trajstar
+                    self.explog.addTable("trajcl", self.trajcl_channels, N+1)
                     
-                if (self.state.s >= self.s_begin_log and self.explog_activated and self.exptime >= t_start_explog + self.explog_iterationcounter*dt_algo):
+                if (self.state.s >= self.s_begin_log and self.explog_activated and not self.stored_trajcl and self.exptime >= t_start_explog + self.explog_iterationcounter*dt_algo):
                     # build CL traj       
-                    self.X_cl.append(self.state.X)
-                    self.Y_cl.append(self.state.Y)
-                    self.psi_cl.append(self.state.psi)
-                    self.s_cl.append(self.state.s)
-                    self.d_cl.append(self.state.d)
-                    self.deltapsi_cl.append(self.state.deltapsi)
-                    self.psidot_cl.append(self.state.psidot)
-                    self.vx_cl.append(self.state.vx)
-                    self.vy_cl.append(self.state.vy)
-                    self.ax_cl.append(self.state.ax)
-                    self.ay_cl.append(self.state.ay)
-                    self.t_cl.append(self.exptime)
-                    self.Fyf_cl.append(self.fssim_carinfo.Fy_f_l+self.fssim_carinfo.Fy_f_r)
-                    self.Fyr_cl.append(self.fssim_carinfo.Fy_r)
-                    self.Fx_cl.append(self.fssim_carinfo.Fx)
-                    
-                    # store CL traj as dict
-                    if (self.explog_iterationcounter == N): # store N+1 values, same as trajstar
-                        self.trajcl_dict = {
-                          "X": np.array(self.X_cl),
-                          "Y": np.array(self.Y_cl),
-                          "psi": np.array(self.psi_cl),
-                          "s": np.array(self.s_cl),
-                          "d": np.array(self.d_cl),
-                          "deltapsi": np.array(self.deltapsi_cl),
-                          "psidot": np.array(self.psidot_cl),
-                          "vx": np.array(self.vx_cl),
-                          "vy": np.array(self.vy_cl),
-                          "ax": np.array(self.ax_cl),
-                          "ay": np.array(self.ay_cl),
-                          "t": np.array(self.t_cl),
-                          "Fyf": np.array(self.Fyf_cl),
-                          "Fyr": np.array(self.Fyr_cl),
-                          "Fx": np.array(self.Fx_cl),
-                        }
+                    self.explog.append("trajcl",
+                                       X=self.state.X,
+                                       Y=self.state.Y,
+                                       psi=self.state.psi,
+                                       s=self.state.s,
+                                       d=self.state.d,
+                                       deltapsi=self.state.deltapsi,
+                                       psidot=self.state.psidot,
+                                       vx=self.state.vx,
+                                       vy=self.state.vy,
+                                       ax=self.state.ax,
+                                       ay=self.state.ay,
+                                       t=self.exptime,
+                                       Fyf=self.fssim_carinfo.Fy_f_l+self.fssim_carinfo.Fy_f_r,
+                                       Fyr=self.fssim_carinfo.Fy_r,
+                                       Fx=self.fssim_carinfo.Fx)
+                    if (self.explog.full("trajcl")):
                         self.stored_trajcl = True
                     
                     self.explog_iterationcounter +=1
                 
                 # save explog               
                 if (self.stored_pathglobal and self.stored_trajstar and self.stored_trajcl and not self.explog_saved):  
-                    explog = {
-                      "pathglobal": self.pathglobal_dict,
-                      "trajstar": self.trajstar_dict,
-                      "trajcl": self.trajcl_dict,
-                    }
-                    filepath = "/home/larsvens/ros/tamp__ws/src/saarti/common/logs/"
-                    filename = "explog"
-                    if(self.scenario_id == 1):
-                        filename = filename + "_popup"
-                        if(np.min(self.mu_segment_values)>0.8):
-                            filename = filename + "_dry"
-                        else:
-                            filename = filename + "_wet"
-                    elif(self.scenario_id == 2):
-                        filename = filename + "_reducedmuturn"
-                    elif(self.scenario_id == 3):
-                        filename = filename + "_racing"
-                    if(self.traction_adaptive):
-                        filename = filename + "_adaptive"
-                    else:
-                        filename = filename + "_nonadaptive"
-                    filename = filename + ".npy"
-                    
-                    np.save(filepath+filename,explog)
+                    self.explog.save()
                     self.explog_saved = True
-                    print("SAVED EXPLOG to " + filepath + filename)
+                    print("SAVED EXPLOG to " + self.explog.log_dir)
+                    try:
+                        self.catalog.setMetrics(self.run_id, summarizeExplog(self.explog.log_dir))
+                    except Exception as e:
+                        rospy.logwarn("run catalog: no metrics for %s (%s)" %(self.run_id, str(e)))
             
             else: # not reached activation time
                 rospy.loginfo_throttle(1, "Experiment starting in %i seconds"%(self.t_activate-self.exptime))
             
             # handle exptime
-            self.exptime += self.dt_sim
-            msg = Clock()
-            t_rostime = rospy.Time(self.exptime)
-            msg.clock = t_rostime
-            #self.clockpub.publish(msg)
-                                     
-            
-            time.sleep(self.dt_sim)
+            self.stepClock()
+            self.exptime = self.simtime - t_exp_start
 
         print 'simulation finished'
+        self.closeRunlog()
+        try:
+            self.catalog.setMetrics(self.run_id, runMetrics(self.run_dir))
+        except Exception as e:
+            rospy.logwarn("run catalog: no metrics for %s (%s)" %(self.run_id, str(e)))
+        self.catalog.setStatus(self.run_id, "finished" if self.explog_saved else "finished_nolog")
+        self.catalog.close()
     
         # send shutdown signal
         message = 'run finished, shutting down'
         print message
         rospy.signal_shutdown(message)
 
+    def closeRunlog(self):
+        if (self.runlog is not None):
+            self.runlog.close() # no-op if already closed
+            print("SAVED RUNLOG to " + self.runlog.log_dir)
+
+    # creates the run dir, stores the experiment config in it and registers the run
+    def initRun(self):
+        self.scenario = scenarioName(self.scenario_id, self.mu_segment_values)
+        if(not self.run_name):
+            self.run_name = self.scenario + ("_adaptive" if self.traction_adaptive else "_nonadaptive")
+        self.run_dir = newRunDir(self.log_dir, self.run_name)
+        self.run_id = os.path.basename(self.run_dir)
+        
+        config = {}
+        if(self.exp_config_path and os.path.isfile(self.exp_config_path)):
+            with open(self.exp_config_path) as f:
+                config = yaml.safe_load(f)
+            with open(os.path.join(self.run_dir, "config.yaml"), "w") as f:
+                yaml.safe_dump(config, f, default_flow_style=None)
+        self.config_hash = configHash(config)
+        self.git_rev = gitRevision(os.path.dirname(os.path.abspath(__file__)))
+        
+        self.catalog = RunCatalog(self.catalog_path)
+        self.catalog.register(self.run_id, self.run_dir, {
+          "scenario": self.scenario,
+          "scenario_id": self.scenario_id,
+          "track_name": self.track_name,
+          "robot_name": self.robot_name,
+          "traction_adaptive": self.traction_adaptive,
+          "config_hash": self.config_hash,
+          "git_rev": self.git_rev,
+        }, config)
+        print("RUN " + self.run_id + " in " + self.run_dir)
+
+    # log path in the run dir
+    def getExplogPath(self, prefix="explog"):
+        return os.path.join(self.run_dir, prefix)
+
+    # advances simtime by dt_sim
+    def stepClock(self):
+        if (self.sim_time_stepping):
+            # wait for all nodes to complete the current step, then advance /clock 
+            pending = self.step_barrier.wait(self.simtime, self.step_timeout)
+            if (pending):
+                rospy.logwarn_throttle(1, "step ack timeout, advancing clock without: " + ", ".join(pending))
+            self.k_step += 1
+            self.simtime = self.k_step*self.dt_sim
+            self.clock.clock = rospy.Time.from_sec(self.simtime)
+            self.clockpub.publish(self.clock)
+        else:
+            # sleep until absolute deadline, so that overruns do not accumulate as drift
+            self.k_step += 1
+            self.simtime = self.k_step*self.dt_sim
+            t_sleep = self.t_wall_start + self.simtime - time.time()
+            if (t_sleep > 0.0):
+                time.sleep(t_sleep)
+
     def getobstaclemarker(self,X,Y,R):
         m = Marker()
         height =1.75
@@ -425,19 +517,46 @@ class ExperimentManager:
           "dlb": self.pathglobal.dlb,
           "s_lap": self.s_lap,
         }
+
+        # signed distance field of the drivable area, rebuilt only when the road bounds change
+        key = pathKey(self.pathglobal)
+        if (key != self.sdf_key):
+            self.sdf = DrivableSdf.fromPath(self.pathglobal, s_lap=self.s_lap)
+            self.sdf_key = key
         self.stored_pathglobal = True
         self.received_pathglobal = True
         
     def state_callback(self, msg):
         self.state = msg
         self.received_state = True
+        if (self.runlog is not None):
+            self.runlog.append("state", t=rospy.get_time(), X=msg.X, Y=msg.Y, psi=msg.psi, s=msg.s, d=msg.d,
+                               deltapsi=msg.deltapsi, psidot=msg.psidot, vx=msg.vx, vy=msg.vy, ax=msg.ax, ay=msg.ay)
 
     def fssim_carinfo_callback(self,msg):
         self.fssim_carinfo = msg
+        if (self.runlog is not None):
+            self.runlog.append("car_info", t=rospy.get_time(), Fyf=msg.Fy_f_l+msg.Fy_f_r, Fyr=msg.Fy_r, Fx=msg.Fx)
 
     def trajstar_callback(self, msg):
         self.trajstar = msg
         self.received_trajstar = True
+        if (self.runlog is not None):
+            # vector channels sized by the first trajectory received
+            if (not self.runlog.hasGroup("trajstar")):
+                Nx = len(msg.s)
+                Nu = len(msg.Fyf)
+                self.runlog.addGroup("trajstar", ["t",("s",Nx),("d",Nx),("X",Nx),("Y",Nx),("psi",Nx),("vx",Nx),
+                                                  ("Fyf",Nu),("Fxf",Nu),("Fxr",Nu)])
+            self.runlog.append("trajstar", t=rospy.get_time(), s=msg.s, d=msg.d, X=msg.X, Y=msg.Y, psi=msg.psi, vx=msg.vx,
+                               Fyf=msg.Fyf, Fxf=msg.Fxf, Fxr=msg.Fxr)
+
+    def cmd_callback(self, msg):
+        if (self.runlog is not None):
+            self.runlog.append("cmd", t=rospy.get_time(), delta=msg.delta, dc=msg.dc)
+
+    def stepack_callback(self, msg):
+        self.step_barrier.ack(msg.frame_id, msg.stamp.to_sec())
     
     
 if __name__ == '__main__':
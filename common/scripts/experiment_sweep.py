@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+'''
+Description: Runs a sweep of experiments in parallel
+    - expands a grid over experiment config keys for each base config
+      (see config/sweep_traction_adaptive.yaml)
+    - each run gets its own dir with config, stdout, ros logs and explog
+    - all runs are indexed in <output dir>/catalog.db (see run_catalog.py)
+    - runs are isolated by starting each launch on its own ros master port
+    - default launch of a run: experiment_run.launch (vehicle_sim, perception, saarti_node
+      and ctrl_interface with sim time stepping), a run ends when the experiment manager exits
+    - results of all runs are aggregated into <output dir>/results.csv
+Usage:
+    rosrun common experiment_sweep.py <sweep spec> -o <output dir> -j <parallel runs>
+    additional launch args are passed after --, e.g. -- car:=gotthard
+'''
+
+import os
+import sys
+import csv
+import time
+import signal
+import argparse
+import subprocess
+import multiprocessing
+import yaml
+import rospkg
+from sweep import expandGrid
+from sweep import applyOverrides
+from sweep import overridesToName
+from sweep import findExplog
+from sweep import summarizeExplog
+
+def runExperiment(run):
+    run_dir = run["dir"]
+    log_dir = os.path.join(run_dir, "logs")
+    if (not os.path.isdir(log_dir)):
+        os.makedirs(log_dir)
+
+    # isolated ros master per run
+    env = os.environ.copy()
+    env["ROS_MASTER_URI"] = "http://localhost:%i" %run["port"]
+    env["ROS_LOG_DIR"] = os.path.join(run_dir, "ros_log")
+    cmd = ["roslaunch", "-p", str(run["port"]), run["pkg"], run["launchfile"],
+           "exp_config_path:=" + run["config_path"],
+           "log_dir:=" + log_dir,
+           "run_name:=" + run["name"],
+           "catalog_path:=" + run["catalog_path"]] + run["launch_args"]
+
+    t_start = time.time()
+    timed_out = False
+    with open(os.path.join(run_dir, "stdout.txt"), "w") as f:
+        proc = subprocess.Popen(cmd, env=env, stdout=f, stderr=subprocess.STDOUT)
+        while (proc.poll() is None):
+            if (not timed_out and time.time() - t_start > run["timeout"]):
+                timed_out = True
+                proc.send_signal(signal.SIGINT) # lets roslaunch shut down its nodes
+                t_kill = time.time() + 15.0
+            if (timed_out and time.time() > t_kill):
+                proc.kill()
+            time.sleep(0.5)
+
+    result = {
+      "run": run["name"],
+      "base_config": run["base_config"],
+      "returncode": proc.returncode,
+      "timed_out": timed_out,
+      "t_wall": time.time() - t_start,
+    }
+    result.update(run["overrides"])
+    explog = findExplog(log_dir)
+    if (explog is not None):
+        result["explog"] = explog
+        try:
+            result.update(summarizeExplog(explog))
+        except Exception as e:
+            result["error"] = str(e)
+    else:
+        result["explog"] = ""
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs a parallel sweep of experiments")
+    parser.add_argument("spec", help="sweep spec yaml (path or filename in common/config)")
+    parser.add_argument("-o", "--output", default="sweep_out", help="output dir")
+    parser.add_argument("-j", "--jobs", type=int, default=multiprocessing.cpu_count(), help="number of parallel runs")
+    parser.add_argument("--launch", nargs=2, default=["common", "experiment_run.launch"], metavar=("PKG", "FILE"), help="launch file of a single run")
+    parser.add_argument("--port", type=int, default=11400, help="ros master port of first run")
+    parser.add_argument("--timeout", type=float, default=1200.0, help="max wall time per run (s)")
+    parser.add_argument("launch_args", nargs="*", help="additional launch args (after --)")
+    args = parser.parse_args()
+
+    config_dir = os.path.join(rospkg.RosPack().get_path("common"), "config")
+    spec_path = args.spec
+    if (not os.path.isfile(spec_path)):
+        spec_path = os.path.join(config_dir, args.spec)
+    with open(spec_path) as f:
+        spec = yaml.safe_load(f)
+    output_dir = os.path.abspath(args.output)
+
+    # build runs
+    runs = []
+    for base_config in spec["configs"]:
+        with open(os.path.join(config_dir, base_config)) as f:
+            config = yaml.safe_load(f)
+        for overrides in expandGrid(spec.get("grid", {})):
+            i = len(runs)
+            name = "%03i_%s" %(i, base_config.replace("_config.yaml", "").replace(".yaml", ""))
+            ovname = overridesToName(overrides)
+            if (ovname):
+                name = name + "_" + ovname
+            run_dir = os.path.join(output_dir, name)
+            if (not os.path.isdir(run_dir)):
+                os.makedirs(run_dir)
+
+            # runs are unattended, never pause the sim
+            run_config = applyOverrides(config, overrides)
+            run_config["s_pause_gazebo"] = []
+            config_path = os.path.join(run_dir, "config.yaml")
+            with open(config_path, "w") as f:
+                yaml.safe_dump(run_config, f, default_flow_style=None)
+
+            runs.append({
+              "name": name,
+              "dir": run_dir,
+              "base_config": base_config,
+              "overrides": overrides,
+              "config_path": config_path,
+              "catalog_path": os.path.join(output_dir, "catalog.db"),
+              "port": args.port + i,
+              "pkg": args.launch[0],
+              "launchfile": args.launch[1],
+              "launch_args": args.launch_args,
+              "timeout": args.timeout,
+            })
+    print("sweep: %i runs, %i in parallel, output in %s" %(len(runs), args.jobs, output_dir))
+
+    # run
+    t_start = time.time()
+    results = []
+    pool = multiprocessing.Pool(args.jobs)
+    for result in pool.imap_unordered(runExperiment, runs):
+        results.append(result)
+        print("sweep: finished %i/%i (%s, %.1f s)" %(len(results), len(runs), result["run"], result["t_wall"]))
+    pool.close()
+    pool.join()
+
+    # aggregate
+    results.sort(key=lambda r: r["run"])
+    fields = []
+    for r in results:
+        for k in r.keys():
+            if (k not in fields):
+                fields.append(k)
+    results_path = os.path.join(output_dir, "results.csv")
+    with open(results_path, "w") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for r in results:
+            writer.writerow(r)
+    print("sweep: done in %.1f s, results in %s" %(time.time() - t_start, results_path))
+
+if __name__ == '__main__':
+    sys.exit(main())
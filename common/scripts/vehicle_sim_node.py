@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+'''
+Description: Headless vehicle simulator, local stand-in for fssim/gazebo
+    - simulates the vehicle with a dynamic single track model (vehicle_sim.py)
+    - subscribes /fssim/cmd and /tire_params (from experiment manager), changes in 
+      tire params are blended over /tireparams_blend seconds
+    - publishes /fssim/base_pose_ground_truth, /fssim/car_info and /fssim/track
+    - vehicle params from /car/... (fssim car.yaml), drivetrain map from /vehicle_sim/<robot_name>
+    - acks steps, so it can be driven by the sim time stepping clock of the experiment manager
+'''
+
+import numpy as np
+import rospy
+import yaml
+from geometry_msgs.msg import Point
+from fssim_common.msg import Cmd
+from fssim_common.msg import State
+from fssim_common.msg import CarInfo
+from fssim_common.msg import TireParams
+from fssim_common.msg import Track
+from sim_clock import StepAcker
+from vehicle_sim import BatchVehicleSim
+from vehicle_sim import dcToFx
+
+class VehicleSimNode:
+    def __init__(self):
+        rospy.init_node('vehicle_sim', anonymous=True)
+        self.cmdsub = rospy.Subscriber("/fssim/cmd", Cmd, self.cmd_callback)
+        self.tireparamsub = rospy.Subscriber("/tire_params", TireParams, self.tireparams_callback)
+        self.statepub = rospy.Publisher('/fssim/base_pose_ground_truth', State, queue_size=1)
+        self.carinfopub = rospy.Publisher('/fssim/car_info', CarInfo, queue_size=1)
+        self.trackpub = rospy.Publisher('/fssim/track', Track, queue_size=1, latch=True)
+        self.dt = 0.01
+        self.rate = rospy.Rate(1/self.dt) # 100hz
+        self.stepacker = StepAcker("vehicle_sim")
+
+        # params
+        self.robot_name = rospy.get_param('/robot_name')
+        m = rospy.get_param('/car/inertia/m')
+        Iz = rospy.get_param('/car/inertia/I_z')
+        g = rospy.get_param('/car/inertia/g', 9.81)
+        lf = rospy.get_param('/car/kinematics/b_F')
+        lr = rospy.get_param('/car/kinematics/b_R')
+        drivetrain = rospy.get_param('/vehicle_sim/' + self.robot_name, {})
+        self.Cm1 = drivetrain.get("Cm1", 1.0)
+        self.Cr0 = drivetrain.get("Cr0", 0.0)
+        self.sim = BatchVehicleSim(1, m, Iz, lf, lr, g=g)
+
+        # tire params are blended linearly over t_blend when they change
+        self.t_blend = rospy.get_param('/tireparams_blend', 0.0)
+        tire = np.array([self.sim.B[0], self.sim.C[0], self.sim.D[0], self.sim.E[0]])
+        self.tire_blend = (tire, tire, 0.0) # (from, to, t_start), swapped as one
+
+        # track
+        track_file = rospy.get_param('/vehicle_sim/track_file')
+        with open(track_file) as f:
+            track = yaml.safe_load(f)
+        self.track = Track()
+        self.track.cones_left = [Point(x=c[0], y=c[1], z=0.0) for c in track["cones_left"]]
+        self.track.cones_right = [Point(x=c[0], y=c[1], z=0.0) for c in track["cones_right"]]
+        self.trackpub.publish(self.track)
+        X0, Y0, psi0 = track.get("starting_pose_front_wing", [0.0, 0.0, 0.0])
+        self.sim.setPose(X0, Y0, psi0)
+
+        # init msgs
+        self.cmd = Cmd()
+        self.state = State()
+        self.carinfo = CarInfo()
+
+        # Main loop
+        while not rospy.is_shutdown():
+            t_iter = rospy.get_time()
+            self.updateTireParams(t_iter)
+            Fx = dcToFx(self.cmd.dc, self.sim.vx[0], self.Cm1, self.Cr0)
+            self.sim.step(self.cmd.delta, Fx, self.dt)
+            self.publishState()
+            self.stepacker.ack(t_iter) # signal completed step (sim time stepping)
+            self.rate.sleep()
+
+    def publishState(self):
+        sim = self.sim
+        self.state.x = sim.X[0]
+        self.state.y = sim.Y[0]
+        self.state.yaw = np.arctan2(np.sin(sim.psi[0]), np.cos(sim.psi[0]))
+        self.state.vx = sim.vx[0]
+        self.state.vy = sim.vy[0]
+        self.state.r = sim.r[0]
+        self.statepub.publish(self.state)
+
+        self.carinfo.Fy_f_l = 0.5*sim.Fyf[0]
+        self.carinfo.Fy_f_r = 0.5*sim.Fyf[0]
+        self.carinfo.Fy_r = sim.Fyr[0]
+        self.carinfo.Fx = sim.Fx[0]
+        self.carinfopub.publish(self.carinfo)
+
+    def getTireParams(self, t):
+        tire_from, tire_to, t_start = self.tire_blend
+        if (self.t_blend <= 0.0):
+            return tire_to
+        w = np.clip((t - t_start)/self.t_blend, 0.0, 1.0)
+        return tire_from + w*(tire_to - tire_from)
+
+    def updateTireParams(self, t):
+        B, C, D, E = self.getTireParams(t)
+        self.sim.setTireParams(B, C, D, E)
+
+    def cmd_callback(self, msg):
+        self.cmd = msg
+
+    def tireparams_callback(self, msg):
+        tire = np.array([msg.B, msg.C, abs(msg.D), msg.E])
+        if (np.array_equal(tire, self.tire_blend[1])): # keepalive
+            return
+        t = rospy.get_time()
+        self.tire_blend = (self.getTireParams(t), tire, t)
+
+if __name__ == '__main__':
+    vs = VehicleSimNode()
+    try:
+        rospy.spin()
+    except KeyboardInterrupt:
+        print("Shutting down")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+# Descrition: Tracks detected objects and publishes them as frenet obstacles
+
+# subscribes:
+# cartesian detections from the perception stack (topic /detections)
+# global path from track interface (topic /pathglobal)
+
+# publishes: 
+# confirmed tracks with frenet velocities at the rate of the detections (topic /obs)
+
+import numpy as np
+import rospy
+from common.msg import Detections
+from common.msg import Obstacles
+from common.msg import Path
+from object_tracking import PathProjector
+from object_tracking import MultiObjectTracker
+import time
+
+class ObjectTracker:
+    # constructor
+    def __init__(self):
+        # init node subs pubs
+        rospy.init_node('object_tracker', anonymous=True)
+        self.vehicle_width = rospy.get_param('/car/kinematics/l_width')
+        self.wiggleroom = rospy.get_param('/obs_wiggleroom', 1.0) # as experiment_manager
+        self.gate = rospy.get_param('/tracking_gate', 2.0)
+        self.n_confirm = rospy.get_param('/tracking_n_confirm', 3)
+        self.max_missed = rospy.get_param('/tracking_max_missed', 5)
+        self.projector = None
+        self.tracker = None
+        self.t_last = None
+        self.pathglobalsub = rospy.Subscriber("pathglobal", Path, self.pathglobal_callback)
+        self.detections_sub = rospy.Subscriber("detections", Detections, self.detections_callback)
+        self.obstaclespub = rospy.Publisher('obs', Obstacles, queue_size=1)
+
+    def pathglobal_callback(self, msg):
+        if (self.projector is not None and np.array_equal(msg.s, self.projector.s)):
+            return # same track
+
+        # get s of one lap
+        stot_global = msg.s[-1]
+        dist_sf = np.sqrt( (msg.X[0]-msg.X[-1])**2 + (msg.Y[0]-msg.Y[-1])**2)
+        s_lap = stot_global + dist_sf
+        self.projector = PathProjector(msg, s_lap)
+        self.tracker = MultiObjectTracker(self.gate, n_confirm=self.n_confirm, max_missed=self.max_missed, s_lap=s_lap)
+
+    def detections_callback(self, msg):
+        if (self.projector is None):
+            rospy.logwarn_throttle(1, "object_tracker: waiting for pathglobal")
+            return
+        start = time.time()
+        t = msg.header.stamp.to_sec()
+        dt = t - self.t_last if self.t_last is not None else 0.0
+        self.t_last = t
+
+        # project all detections at once and step the tracker
+        s, d = self.projector.project(np.array(msg.X), np.array(msg.Y))
+        self.tracker.step(s, d, np.array(msg.R), dt)
+        trk = self.tracker.obstacles()
+
+        obs = Obstacles()
+        obs.header.stamp = msg.header.stamp
+        obs.header.frame_id = "map"
+        obs.s = trk["s"].tolist()
+        obs.d = trk["d"].tolist()
+        obs.R = trk["R"].tolist()
+        obs.Rmgn = (0.5*trk["R"] + 0.5*self.vehicle_width + self.wiggleroom).tolist()
+        obs.vs = trk["vs"].tolist()
+        obs.vd = trk["vd"].tolist()
+        self.obstaclespub.publish(obs)
+
+        comptime = time.time()-start
+        if (comptime > 0.05):
+            rospy.logwarn("object_tracker: compute time exceeding 50 ms!")
+
+if __name__ == '__main__':
+    ot = ObjectTracker()
+    try:
+        rospy.spin()
+    except KeyboardInterrupt:
+        print("Shutting down")
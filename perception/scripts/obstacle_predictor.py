@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+# Descrition: Predicts obstacles over the planning horizon
+
+# subscribes:
+# obstacles with frenet velocities (topic /obs)
+# local path (topic /pathlocal)
+
+# publishes: 
+# time-indexed obstacles (topic /obs_prediction)
+
+import rospy
+from common.msg import Obstacles
+from common.msg import Path
+from common.msg import ObstaclePrediction
+from sim_clock import StepAcker
+from obstacle_prediction import ObstaclePredictor
+from obstacle_prediction import predictionToMsg
+import time
+
+class ObstaclePredictorNode:
+    # constructor
+    def __init__(self):
+        # init node subs pubs
+        rospy.init_node('obstacle_predictor', anonymous=True)
+        self.obs_sub = rospy.Subscriber("/obs", Obstacles, self.obs_callback)
+        self.pathlocal_sub = rospy.Subscriber("pathlocal", Path, self.pathlocal_callback)
+        self.predictionpub = rospy.Publisher('/obs_prediction', ObstaclePrediction, queue_size=1)
+
+        # node params
+        self.dt = 0.1
+        self.rate = rospy.Rate(1/self.dt) # 10hz
+        self.stepacker = StepAcker("obstacle_predictor")
+
+        # prediction params, horizon as the planner (N steps of dt)
+        model = rospy.get_param('/obs_prediction_model', "path") # cv: constant velocity, path: path following
+        Nt = rospy.get_param('/N_prediction', 40)
+        dt = rospy.get_param('/dt_prediction', 0.1)
+        self.predictor = ObstaclePredictor(model, Nt, dt)
+
+        # msg receive checks
+        self.obs = None
+        self.pathlocal = None
+
+        # wait for messages before entering main loop
+        while(not rospy.is_shutdown() and (self.obs is None or (model == "path" and self.pathlocal is None))):
+            print "obstacle_predictor: waiting for obs and pathlocal"
+            self.rate.sleep()
+
+        # Main loop
+        while not rospy.is_shutdown():
+            t_iter = rospy.get_time()
+            start = time.time()
+
+            pred = self.predictor.predict(self.obs, self.pathlocal)
+            msg = predictionToMsg(pred, ObstaclePrediction())
+            msg.header.stamp = rospy.Time.now()
+            msg.header.frame_id = "map"
+            self.predictionpub.publish(msg)
+
+            comptime = time.time()-start
+            if (comptime > self.dt):
+                rospy.logwarn("obstacle_predictor: compute time exceeding dt!")
+
+            self.stepacker.ack(t_iter) # signal completed step (sim time stepping)
+            self.rate.sleep()
+
+    def obs_callback(self, msg):
+        self.obs = msg
+
+    def pathlocal_callback(self, msg):
+        self.pathlocal = msg
+
+if __name__ == '__main__':
+    op = ObstaclePredictorNode()
+    try:
+        rospy.spin()
+    except KeyboardInterrupt:
+        print("Shutting down")
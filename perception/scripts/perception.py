@@ -17,7 +17,9 @@ from common.msg import Path
 
 from util import angleToInterval
 from util import angleToContinous
+from sim_clock import StepAcker
 from coordinate_transforms import ptsFrenetToCartesian
+from velocity_profile import VelocityProfile
 from geometry_msgs.msg import PoseStamped
 from nav_msgs.msg import Path as navPath
 from geometry_msgs.msg import Point32
@@ -30,6 +32,11 @@ class Perception:
     def __init__(self):
         # init node subs pubs
         rospy.init_node('perception', anonymous=True)
+
+        # set static vehicle params (used in pathglobal_callback)
+        self.setRosParams()
+        self.velprof = None # velocity profile of pathglobal
+
         self.pathglobalsub = rospy.Subscriber("pathglobal", Path, self.pathglobal_callback)
         self.state_sub = rospy.Subscriber("state", State, self.state_callback)
         self.pathlocalpub = rospy.Publisher('pathlocal', Path, queue_size=10)
@@ -39,14 +46,12 @@ class Perception:
         # node params
         self.dt = 0.1
         self.rate = rospy.Rate(1/self.dt) # 10hz
+        self.stepacker = StepAcker("perception")
         
         # params of local path
         self.N = 100
         self.ds = 1.0 #0.5
 
-        # set static vehicle params
-        self.setRosParams()
-
         # init local vars
         self.pathglobal = Path()
         self.pathrolling = Path() # used to run several laps
@@ -74,6 +79,7 @@ class Perception:
         
         # Main loop
         while not rospy.is_shutdown():
+            t_iter = rospy.get_time()
             
             # check timing wrt dt
             start = time.time()
@@ -110,6 +116,7 @@ class Perception:
             if (comptime > self.dt):
                 rospy.logwarn("perception: compute time exceeding dt!")
 
+            self.stepacker.ack(t_iter) # signal completed step (sim time stepping)
             self.rate.sleep()   
             
 
@@ -144,6 +151,7 @@ class Perception:
         self.pathlocal.mu =             np.interp(s,self.pathrolling.s,self.pathrolling.mu)
         self.pathlocal.dub =            np.interp(s,self.pathrolling.s,self.pathrolling.dub)
         self.pathlocal.dlb =            np.interp(s,self.pathrolling.s,self.pathrolling.dlb)
+        self.pathlocal.vxref =          np.interp(s,self.pathrolling.s,self.pathrolling.vxref)
         
     def pathLocalToPolArr(self):
         pa = PolygonArray()
@@ -183,6 +191,8 @@ class Perception:
         self.g = rospy.get_param('/car/inertia/g')
         self.lf = rospy.get_param('/car/kinematics/b_F')
         self.lr = rospy.get_param('/car/kinematics/b_R')
+        self.traction_adaptive = rospy.get_param('/traction_adaptive', 1) # not set by demo.launch
+        self.mu_nominal = rospy.get_param('/mu_nominal', 1.0)
               
     def pathglobal_callback(self, msg):
         self.pathglobal = msg
@@ -191,6 +201,16 @@ class Perception:
         stot_global = self.pathglobal.s[-1]
         dist_sf = np.sqrt( (self.pathglobal.X[0]-self.pathglobal.X[-1])**2 + (self.pathglobal.Y[0]-self.pathglobal.Y[-1])**2)
         self.s_lap = stot_global + dist_sf  
+
+        # velocity profile, computed once per track, on a new mu only the affected part is updated
+        if (self.traction_adaptive):
+            mu = np.array(self.pathglobal.mu)
+        else:
+            mu = np.full(len(self.pathglobal.s), self.mu_nominal)
+        if (self.velprof is None or not np.array_equal(self.velprof.s, self.pathglobal.s) or not np.array_equal(self.velprof.kappa, self.pathglobal.kappa_c)):
+            self.velprof = VelocityProfile(self.pathglobal.s, self.pathglobal.kappa_c, mu, g=self.g, s_lap=self.s_lap)
+        else:
+            self.velprof.update(mu)
         
         # start pathrolling as two first laps
         self.pathrolling.X = np.concatenate((np.array(self.pathglobal.X),np.array(self.pathglobal.X)),axis=0)
@@ -203,6 +223,7 @@ class Perception:
         self.pathrolling.mu = np.concatenate((np.array(self.pathglobal.mu),np.array(self.pathglobal.mu)),axis=0)
         self.pathrolling.dub = np.concatenate((np.array(self.pathglobal.dub),np.array(self.pathglobal.dub)),axis=0)
         self.pathrolling.dlb = np.concatenate((np.array(self.pathglobal.dlb),np.array(self.pathglobal.dlb)),axis=0)
+        self.pathrolling.vxref = np.concatenate((self.velprof.vx,self.velprof.vx),axis=0)
         
         self.received_pathglobal = True
     
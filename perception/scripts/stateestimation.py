@@ -14,6 +14,7 @@ import rospy
 from common.msg import Path
 from fssim_common.msg import State as fssimState
 from common.msg import State as saartiState
+from sim_clock import StepAcker
 from coordinate_transforms import ptsCartesianToFrenet
 from util import angleToInterval
 from util import angleToContinous
@@ -42,6 +43,7 @@ class StateEst:
         # node params
         self.dt = 0.01
         self.rate = rospy.Rate(1/self.dt) # 100hz
+        self.stepacker = StepAcker("stateestimation")
         self.received_vehicle_out = False
         self.received_pathglobal = False
     
@@ -64,6 +66,7 @@ class StateEst:
 
         # Main loop
         while not rospy.is_shutdown():
+            t_iter = rospy.get_time()
             self.updateState()
             self.statepub.publish(self.state_out)
             
@@ -71,6 +74,7 @@ class StateEst:
             self.debug_val = self.state_out.deltapsi
             self.debugpub.publish(self.debug_val)
             
+            self.stepacker.ack(t_iter) # signal completed step (sim time stepping)
             self.rate.sleep()   
             
     def updateState(self):
@@ -72,6 +72,7 @@ struct pathstruct{
     std::vector<float> dub;
     std::vector<float> dlb;
     std::vector<float> mu;
+    std::vector<float> vxref; // velocity profile, empty if not provided
 };
 
 // obstacle 
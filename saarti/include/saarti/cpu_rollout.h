@@ -0,0 +1,84 @@
+#ifndef CPU_ROLLOUT_H
+#define CPU_ROLLOUT_H
+
+#include <vector>
+#include <thread>
+#include <mutex>
+#include <condition_variable>
+#include <atomic>
+#include <exception>
+#include "containers.h"
+#include "planning_util.h"
+
+using std::vector;
+
+// Multi-threaded cpu version of cuda_rollout (cuda_wrapper.cu). A pool of
+// persistent worker threads is created once, each rollout call distributes
+// the Nd*Nvx trajectories over the workers. Each worker has its own workspace,
+// the acado integrator is not used since it operates on the global
+// acadoWorkspace. Same rollout controller, normal load model and euler
+// integration (Ni substeps) as the kernel, except that states are stored
+// after all substeps of an interval and the rear friction circle uses the
+// current Fyr (as computeTrajset).
+class CpuRolloutPool
+{
+public:
+
+    // constructors
+    CpuRolloutPool(uint Nthreads); // 0: one thread per core
+    ~CpuRolloutPool();
+
+    // functions
+    void rollout(vector<containers::trajstruct> &trajset,
+                 containers::statestruct initstate,
+                 containers::pathstruct &pathlocal,
+                 containers::staticparamstruct &sp,
+                 int traction_adaptive,
+                 float mu_nominal,
+                 uint Nt,
+                 uint Nd,
+                 uint Nvx,
+                 float vxub,
+                 float dt);
+    uint size();
+
+private:
+    // per thread workspace
+    struct workspace{
+        uint path_idx; // search start in pathlocal, s is increasing along a rollout
+        uint Nrollouts; // rollouts done by the thread in the last call
+    };
+
+    // current rollout call, set by rollout() while the workers are idle
+    struct job{
+        containers::trajstruct *trajs;
+        containers::statestruct initstate;
+        containers::pathstruct *pathlocal;
+        containers::staticparamstruct sp;
+        int traction_adaptive;
+        float mu_nominal;
+        uint Nt;
+        uint Ni;
+        float dt;
+        vector<float> d_ref;
+        vector<float> vx_ref;
+    };
+
+    void worker(uint id);
+    void rolloutSingle(workspace &ws, uint j);
+
+    vector<std::thread> threads_;
+    vector<workspace> workspaces_;
+    std::mutex mtx_;
+    std::condition_variable cv_job_;
+    std::condition_variable cv_done_;
+    uint generation_;
+    uint Ndone_;
+    bool stop_;
+    std::atomic<uint> next_;
+    uint Ntrajs_;
+    job job_;
+    std::exception_ptr error_;
+};
+
+#endif // CPU_ROLLOUT_H
@@ -3,6 +3,7 @@
 
 #include <cstdlib>
 #include <vector>
+#include <algorithm>
 #include <iostream>
 #include "containers.h"
 //#include <eigen3/Eigen/Dense>
@@ -25,6 +26,9 @@ void trajset2cart(vector<containers::trajstruct> &trajset, containers::pathstruc
 void get_additional_traj_variables(containers::trajstruct &traj, containers::pathstruct &pathlocal, containers::staticparamstruct sp, uint N);
 Eigen::MatrixXf get_vehicle_corners(float X, float Y, float psi, float lf, float lr, float w);
 float get_cornering_stiffness(float mu, float Fz);
+void sort_obstacles(containers::obstastruct &obs);
+void obstacle_window(const containers::obstastruct &obs, float slo, float shi, uint &i0, uint &i1);
+float max_obstacle_margin(const containers::obstastruct &obs);
 
 }; // END NAMESPACE
 
@@ -7,6 +7,7 @@
 #include <tf2/LinearMath/Quaternion.h>
 #include "std_msgs/String.h"
 #include "std_msgs/Int16.h"
+#include "std_msgs/Header.h"
 
 // visualization
 #include "visualization_msgs/MarkerArray.h"
@@ -18,6 +19,7 @@
 // wrapper libs
 #include "containers.h"
 #include "saarti/rtisqp_wrapper.h"
+#include "saarti/cpu_rollout.h"
 
 // messages
 #include <common/Path.h>
@@ -29,6 +31,7 @@
 #include <chrono>
 #include <thread>
 #include <future>
+#include <memory>
 
 // misc
 #include <sstream>
@@ -56,14 +59,17 @@ private:
     int ref_mode_;
     int sampling_augmentation_;
     int traction_adaptive_;
+    int rollout_mode_; // 0: gpu, 1: cpu thread pool
 
     // params
     float mu_nominal_; // only used for nonadaptive case
     float vxref_cc_; // only used for velocity keeping (refmode 1)
     float dref_cc_; // only used for velocity keeping (refmode 1)
+    bool sim_time_stepping_; // ack completed iterations on /step_ack
     int Nd_rollout_;
     int Nvx_rollout_;
     float vxub_rollout_;
+    int Nthreads_rollout_; // 0: one per core
     vector<float> Wx_;
     vector<float> WNx_;
     vector<float> Wu_;
@@ -83,6 +89,7 @@ private:
     ros::Publisher trajstar_polarr_vis_pub_;
     ros::Publisher posconstr_vis_pub_;
     ros::Publisher vectordebug_pub_;
+    ros::Publisher stepack_pub_;
     containers::statestruct state_;
     int ctrlmode_;
     containers::pathstruct pathlocal_;
@@ -91,6 +98,7 @@ private:
     containers::refstruct refs_;
     containers::staticparamstruct sp_;
     RtisqpWrapper rtisqp_wrapper_;
+    std::unique_ptr<CpuRolloutPool> cpu_rollout_pool_;
 
     // functions
 
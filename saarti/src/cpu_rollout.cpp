@@ -0,0 +1,246 @@
+#include "saarti/cpu_rollout.h"
+#include <algorithm>
+#include <cmath>
+
+// constructor, starts the workers
+CpuRolloutPool::CpuRolloutPool(uint Nthreads)
+{
+    if(Nthreads == 0){
+        Nthreads = std::max(std::thread::hardware_concurrency(), 1u);
+    }
+    generation_ = 0;
+    Ndone_ = 0;
+    stop_ = false;
+    next_ = 0;
+    Ntrajs_ = 0;
+    workspaces_.resize(Nthreads);
+    for (uint id=0;id<Nthreads;id++) {
+        threads_.push_back(std::thread(&CpuRolloutPool::worker, this, id));
+    }
+}
+
+// destructor, stops and joins the workers
+CpuRolloutPool::~CpuRolloutPool()
+{
+    {
+        std::lock_guard<std::mutex> lock(mtx_);
+        stop_ = true;
+    }
+    cv_job_.notify_all();
+    for (uint id=0;id<threads_.size();id++) {
+        threads_.at(id).join();
+    }
+}
+
+uint CpuRolloutPool::size(){
+    return uint(threads_.size());
+}
+
+// rollout of Nd*Nvx trajs, appended to trajset in the same order as cuda_rollout (vx major)
+void CpuRolloutPool::rollout(vector<containers::trajstruct> &trajset,
+                             containers::statestruct initstate,
+                             containers::pathstruct &pathlocal,
+                             containers::staticparamstruct &sp,
+                             int traction_adaptive,
+                             float mu_nominal,
+                             uint Nt,
+                             uint Nd,
+                             uint Nvx,
+                             float vxub,
+                             float dt){
+
+    // set d_ref and vx_ref (as cuda_rollout)
+    float dub = pathlocal.dub.at(0);
+    float dlb = pathlocal.dlb.at(0);
+    float vxlb = 1.0f; // avoid singulatity at vx = 0
+    job_.d_ref.assign(Nd, dlb);
+    job_.vx_ref.assign(Nvx, vxlb);
+    for(uint id=1; id<Nd; ++id) {
+        job_.d_ref.at(id) = dlb+float(id)*(dub-dlb)/(float(Nd)-1);
+    }
+    for(uint id=1; id<Nvx; ++id) {
+        job_.vx_ref.at(id) = vxlb+float(id)*(vxub-vxlb)/(float(Nvx)-1);
+    }
+
+    // set job
+    size_t offset = trajset.size();
+    trajset.resize(offset + Nd*Nvx);
+    job_.trajs = trajset.data() + offset;
+    job_.initstate = initstate;
+    job_.pathlocal = &pathlocal;
+    job_.sp = sp;
+    job_.traction_adaptive = traction_adaptive;
+    job_.mu_nominal = mu_nominal;
+    job_.Nt = Nt;
+    job_.Ni = 10; // scaling factor in integration
+    job_.dt = dt;
+
+    // start workers and wait until all trajs are done
+    {
+        std::lock_guard<std::mutex> lock(mtx_);
+        Ntrajs_ = Nd*Nvx;
+        next_ = 0;
+        Ndone_ = 0;
+        error_ = nullptr;
+        generation_++;
+    }
+    cv_job_.notify_all();
+    std::unique_lock<std::mutex> lock(mtx_);
+    cv_done_.wait(lock, [this]{return Ndone_ == threads_.size();});
+    if(error_){
+        std::rethrow_exception(error_);
+    }
+}
+
+// worker loop, takes trajs from the current job until none are left
+void CpuRolloutPool::worker(uint id){
+    uint generation = 0;
+    while(true){
+        {
+            std::unique_lock<std::mutex> lock(mtx_);
+            cv_job_.wait(lock, [this, generation]{return stop_ || generation_ != generation;});
+            if(stop_){
+                return;
+            }
+            generation = generation_;
+        }
+        workspace &ws = workspaces_.at(id);
+        ws.Nrollouts = 0;
+        try {
+            for (uint j = next_.fetch_add(1); j < Ntrajs_; j = next_.fetch_add(1)) {
+                rolloutSingle(ws, j);
+                ws.Nrollouts++;
+            }
+        } catch (...) {
+            std::lock_guard<std::mutex> lock(mtx_);
+            error_ = std::current_exception();
+            next_ = Ntrajs_; // stop the other workers
+        }
+        {
+            std::lock_guard<std::mutex> lock(mtx_);
+            Ndone_++;
+            if(Ndone_ == threads_.size()){
+                cv_done_.notify_one();
+            }
+        }
+    }
+}
+
+// rollout of traj j of the current job
+void CpuRolloutPool::rolloutSingle(workspace &ws, uint j){
+    const job &jb = job_;
+    const containers::staticparamstruct &sp = jb.sp;
+    const containers::pathstruct &pathlocal = *jb.pathlocal;
+    containers::trajstruct &traj = jb.trajs[j];
+    uint Nd = uint(jb.d_ref.size());
+    float dref = jb.d_ref.at(j % Nd);
+    float vxref = jb.vx_ref.at(j / Nd);
+    uint Npath = uint(pathlocal.s.size());
+    float h = jb.dt/jb.Ni;
+
+    // init state
+    float s        = jb.initstate.s;
+    float d        = jb.initstate.d;
+    float deltapsi = jb.initstate.deltapsi;
+    float psidot   = jb.initstate.psidot;
+    float vx       = jb.initstate.vx;
+    float vy       = jb.initstate.vy;
+    float Fyf = 0.0f;
+    float Fxf = 0.0f;
+    float Fxr = 0.0f;
+    float Fyr = 0.0f;
+    ws.path_idx = 0;
+
+    // fresh traj
+    traj = containers::trajstruct();
+    traj.s.reserve(jb.Nt+1);
+    traj.d.reserve(jb.Nt+1);
+    traj.deltapsi.reserve(jb.Nt+1);
+    traj.psidot.reserve(jb.Nt+1);
+    traj.vx.reserve(jb.Nt+1);
+    traj.vy.reserve(jb.Nt+1);
+    traj.s.push_back(s);
+    traj.d.push_back(d);
+    traj.deltapsi.push_back(deltapsi);
+    traj.psidot.push_back(psidot);
+    traj.vx.push_back(vx);
+    traj.vy.push_back(vy);
+
+    for (uint k=0;k<jb.Nt;k++) {
+
+        // path index: first path point ahead of s (clamped at the end of the path)
+        if(ws.path_idx > 0 && s <= pathlocal.s.at(ws.path_idx-1)){
+            ws.path_idx = 0;
+        }
+        while(ws.path_idx < Npath-1 && s-pathlocal.s.at(ws.path_idx) > 0){
+            ws.path_idx++;
+        }
+        float kappac = pathlocal.kappa_c.at(ws.path_idx);
+
+        // normal forces from previous cmd and mu
+        float ax = (Fxf+Fxr)/sp.m;
+        float Fzf;
+        float Fzr;
+        float mu;
+        if(jb.traction_adaptive == 1){
+            Fzf = (1.0f/(sp.lf+sp.lr))*( sp.m*ax*sp.h_cg + sp.m*sp.g*sp.lr);
+            Fzr = (1.0f/(sp.lf+sp.lr))*(-sp.m*ax*sp.h_cg + sp.m*sp.g*sp.lf);
+            mu = pathlocal.mu.at(ws.path_idx);
+        } else { // (traction_adaptive == 0)
+            Fzf = (1.0f/(sp.lf+sp.lr))*(sp.m*sp.g*sp.lr);
+            Fzr = (1.0f/(sp.lf+sp.lr))*(sp.m*sp.g*sp.lf);
+            mu = jb.mu_nominal;
+        }
+        float Cr = planning_util::get_cornering_stiffness(mu,Fzr);
+        float Ffmax = mu*Fzf;
+        float Frmax = mu*Fzr;
+
+        // rollout controller
+        float vxerror = vxref - vx;
+        float derror = dref - d;
+        Fyf = 0.5f*sp.m*vx*vx*kappac*std::cos(deltapsi) + 3000*derror - 500*deltapsi;
+        Fyf = std::min(std::max(Fyf, -Ffmax), Ffmax);
+        float Fxfmax = std::sqrt(std::max(Ffmax*Ffmax-Fyf*Fyf, 0.0f));
+        if(vxerror > 0){ // accelerating
+            Fxf = 0; // rear wheel drive - no drive on front wheel
+        } else { // braking
+            Fxf = std::max(1000*vxerror, -Fxfmax);
+        }
+        float Fxrmax = std::sqrt(std::max(Frmax*Frmax-Fyr*Fyr, 0.0f));
+        Fxr = std::min(std::max(1000*vxerror, -Fxrmax), Fxrmax);
+
+        // euler fwd, same update order as the kernel
+        for (uint i=0;i<jb.Ni;i++) {
+            Fyr = 2*Cr*std::atan(sp.lr*psidot-vy)/vx;
+            s        = s + h*((vx*std::cos(deltapsi)-vy*std::sin(deltapsi))/(1-d*kappac));
+            d        = d + h*(vx*std::sin(deltapsi)+vy*std::cos(deltapsi));
+            deltapsi = deltapsi + h*(psidot-kappac*(vx*std::cos(deltapsi)-vy*std::sin(deltapsi))/(1-d*kappac));
+            psidot   = psidot + h*((1/sp.Iz)*(sp.lf*Fyf - sp.lr*Fyr));
+            vx       = vx + h*((1/sp.m)*(Fxf+Fxr));
+            vy       = vy + h*((1/sp.m)*(Fyf+Fyr)-vx*psidot);
+        }
+
+        // x at k+1, u and misc at k
+        traj.s.push_back(s);
+        traj.d.push_back(d);
+        traj.deltapsi.push_back(deltapsi);
+        traj.psidot.push_back(psidot);
+        traj.vx.push_back(vx);
+        traj.vy.push_back(vy);
+        traj.Fyf.push_back(Fyf);
+        traj.Fxf.push_back(Fxf);
+        traj.Fxr.push_back(Fxr);
+        traj.Fzf.push_back(Fzf);
+        traj.Fzr.push_back(Fzr);
+        traj.kappac.push_back(kappac);
+        traj.mu.push_back(mu);
+        traj.Cr.push_back(Cr);
+    }
+
+    // add last element of misc vars
+    traj.Fzf.push_back(traj.Fzf.back());
+    traj.Fzr.push_back(traj.Fzr.back());
+    traj.kappac.push_back(traj.kappac.back());
+    traj.mu.push_back(traj.mu.back());
+    traj.Cr.push_back(traj.Cr.back());
+}
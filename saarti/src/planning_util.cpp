@@ -224,3 +224,42 @@ float planning_util::get_cornering_stiffness(float mu, float Fz){
     }
     return B*C*D*Fz; // Rajamani
 }
+
+// sorts the obstacles by s, for window queries with obstacle_window
+void planning_util::sort_obstacles(containers::obstastruct &obs){
+    uint Nobs = uint(obs.s.size());
+    vector<uint> order(Nobs);
+    for (uint i=0;i<Nobs;i++) {
+        order.at(i) = i;
+    }
+    std::stable_sort(order.begin(), order.end(), [&obs](uint a, uint b){return obs.s.at(a) < obs.s.at(b);});
+    vector<float>* fields[] = {&obs.s, &obs.d, &obs.R, &obs.Rmgn, &obs.X, &obs.Y};
+    for (vector<float>* field : fields) {
+        if(field->size() != Nobs){ // fields that are not set
+            continue;
+        }
+        vector<float> sorted(Nobs);
+        for (uint i=0;i<Nobs;i++) {
+            sorted.at(i) = field->at(order.at(i));
+        }
+        *field = sorted;
+    }
+}
+
+// index range [i0,i1) of the obstacles with slo <= s <= shi (obs sorted by s)
+void planning_util::obstacle_window(const containers::obstastruct &obs, float slo, float shi, uint &i0, uint &i1){
+    i0 = uint(std::lower_bound(obs.s.begin(), obs.s.end(), slo) - obs.s.begin());
+    i1 = uint(std::upper_bound(obs.s.begin(), obs.s.end(), shi) - obs.s.begin());
+    if(i1 < i0){
+        i1 = i0;
+    }
+}
+
+// largest Rmgn, half width of the obstacle windows
+float planning_util::max_obstacle_margin(const containers::obstastruct &obs){
+    float Rmgn_max = 0;
+    for (uint i=0;i<obs.Rmgn.size();i++) {
+        Rmgn_max = std::max(Rmgn_max, obs.Rmgn.at(i));
+    }
+    return Rmgn_max;
+}
@@ -182,6 +182,7 @@ containers::posconstrstruct RtisqpWrapper::setStateConstraints(containers::trajs
                                                                containers::staticparamstruct &sp){
 
     containers::posconstrstruct posconstr;
+    float Rmgn_max = planning_util::max_obstacle_margin(obs); // obs sorted by s
 
     for (uint k = 0; k < N + 1; ++k)
     {
@@ -195,9 +196,10 @@ containers::posconstrstruct RtisqpWrapper::setStateConstraints(containers::trajs
         float dlb = rld.at(k)+0.5f*sp.l_width;
         float dub = lld.at(k)-0.5f*sp.l_width;
 
-        // adjust lbs and ubs for obstacles
-        uint Nobs = uint(obs.s.size());
-        for (uint i = 0; i<Nobs; i++) {
+        // adjust lbs and ubs for obstacles (within the s window of any Rmgn)
+        uint i0, i1;
+        planning_util::obstacle_window(obs, slb - Rmgn_max - 8.0f, sub + Rmgn_max + 3.0f, i0, i1);
+        for (uint i = i0; i<i1; i++) {
             float sobs = obs.s.at(i);
             float dobs = obs.d.at(i);
             float Rmgn = obs.Rmgn.at(i);
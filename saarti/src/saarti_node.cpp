@@ -1,6 +1,7 @@
 #include "saarti/saarti_node.h"
 
 // global fcn for cuda
+#ifdef SAARTI_WITH_CUDA
 void cuda_rollout(std::vector<containers::trajstruct> &trajset_struct,
                   containers::statestruct initstate,
                   containers::pathstruct pathlocal,
@@ -12,6 +13,7 @@ void cuda_rollout(std::vector<containers::trajstruct> &trajset_struct,
                   uint Nvx,
                   float vxub,
                   float dt);
+#endif
 
 namespace saarti_node{
 
@@ -40,11 +42,28 @@ SAARTI::SAARTI(ros::NodeHandle nh){
     posconstr_vis_pub_ = nh.advertise<jsk_recognition_msgs::PolygonArray>("posconstr_vis",1);
     vectordebug_pub_ = nh.advertise<jsk_recognition_msgs::PlotData>("saarti_plot_debug",1);
 
+    // step acks (sim time stepping)
+    if(sim_time_stepping_){
+        stepack_pub_ = nh.advertise<std_msgs::Header>("/step_ack",10);
+    }
+
     // init wrapper for rtisqp solver
     rtisqp_wrapper_ = RtisqpWrapper();
     // set weights
     rtisqp_wrapper_.setWeights(Wx_,WNx_,Wu_,Wslack_);
 
+    // init cpu rollout pool
+#ifndef SAARTI_WITH_CUDA
+    if(rollout_mode_ == 0){
+        ROS_ERROR_STREAM("built without cuda, using cpu rollout");
+        rollout_mode_ = 1;
+    }
+#endif
+    if(sampling_augmentation_ == 1 && rollout_mode_ == 1){
+        cpu_rollout_pool_.reset(new CpuRolloutPool(uint(Nthreads_rollout_)));
+        ROS_INFO_STREAM("cpu rollout on " << cpu_rollout_pool_->size() << " threads");
+    }
+
     // wait until state and path_local is received
     while( (state_.s < 0) || pathlocal_.s.size() == 0){
         ROS_INFO_STREAM("waiting for state and/or path local");
@@ -70,6 +89,7 @@ SAARTI::SAARTI(ros::NodeHandle nh){
     {
         ROS_INFO_STREAM(" ");
         ROS_INFO_STREAM("main_ loop_");
+        ros::Time t_iter = ros::Time::now();
         auto t1_loop = std::chrono::high_resolution_clock::now();
 
         // check deactivate conditions
@@ -123,21 +143,38 @@ SAARTI::SAARTI(ros::NodeHandle nh){
             // SAARTI
             if(sampling_augmentation_ == 1){
                 ROS_INFO_STREAM("generating trajectory set");
-                // cpu rollout
+                // serial cpu rollout (acado integrator)
                 // rtisqp_wrapper_.computeTrajset(trajset_,state_,pathlocal_,sp_,traction_adaptive_,mu_nominal_,vxref_cc_,refs_,uint(Nd_rollout_));
 
-                // gpu rollout
-                cuda_rollout(trajset_,
-                             state_,
-                             pathlocal_,
-                             sp_,
-                             traction_adaptive_,
-                             mu_nominal_,
-                             N,
-                             uint(Nd_rollout_),
-                             uint(Nvx_rollout_),
-                             vxub_rollout_,
-                             dt_);
+                if(rollout_mode_ == 1){
+                    // cpu rollout (thread pool)
+                    cpu_rollout_pool_->rollout(trajset_,
+                                               state_,
+                                               pathlocal_,
+                                               sp_,
+                                               traction_adaptive_,
+                                               mu_nominal_,
+                                               N,
+                                               uint(Nd_rollout_),
+                                               uint(Nvx_rollout_),
+                                               vxub_rollout_,
+                                               dt_);
+                } else {
+#ifdef SAARTI_WITH_CUDA
+                    // gpu rollout
+                    cuda_rollout(trajset_,
+                                 state_,
+                                 pathlocal_,
+                                 sp_,
+                                 traction_adaptive_,
+                                 mu_nominal_,
+                                 N,
+                                 uint(Nd_rollout_),
+                                 uint(Nvx_rollout_),
+                                 vxub_rollout_,
+                                 dt_);
+#endif
+                }
 
                 // append trajprime
                 if (trajstar_last.s.size()!=0){
@@ -283,14 +320,14 @@ SAARTI::SAARTI(ros::NodeHandle nh){
             trajhat_msg.sub = posconstr.sub;
             trajhat_msg.dlb = posconstr.dlb;
             trajhat_msg.dub = posconstr.dub;
-            trajhat_msg.header.stamp = ros::Time::now();
+            trajhat_msg.header.stamp = t_iter; // time of the initial state, not of publish
             if(publish_trajs){
                 trajhat_pub_.publish(trajhat_msg);
             }
 
             // publish trajstar
             common::Trajectory trajstar_msg = traj2msg(trajstar);
-            trajstar_msg.header.stamp = ros::Time::now();
+            trajstar_msg.header.stamp = t_iter;
             if(publish_trajs){
                 trajstar_pub_.publish(trajstar_msg);
             }
@@ -336,6 +373,14 @@ SAARTI::SAARTI(ros::NodeHandle nh){
             ROS_INFO_STREAM("planner deactivated");
         }
 
+        // signal completed step (sim time stepping)
+        if(sim_time_stepping_){
+            std_msgs::Header stepack;
+            stepack.stamp = t_iter;
+            stepack.frame_id = "saarti_node";
+            stepack_pub_.publish(stepack);
+        }
+
         ros::spinOnce();
         loop_rate.sleep();
     }
@@ -375,36 +420,41 @@ containers::refstruct SAARTI::setRefs(int ref_mode,
     }
     case 2: // maximize s (racing)
     {
-        // set vxref
-        vector<float> vxref_path(pathlocal.s.size(), 30); // initialize to max speed
-        vector<float> mu;
-        if(traction_adaptive){
-            mu = pathlocal.mu;
-        } else {
-            mu.assign(pathlocal.s.size(),mu_nominal);
-        }
+        // set vxref, precomputed over the whole track by perception (velocity_profile.py)
+        vector<float> vxref_path;
+        if(!pathlocal.vxref.empty() && pathlocal.vxref.size() == pathlocal.s.size()){
+            vxref_path = pathlocal.vxref;
+        } else { // fallback: compute on pathlocal
+            vxref_path.assign(pathlocal.s.size(), 30); // initialize to max speed
+            vector<float> mu;
+            if(traction_adaptive){
+                mu = pathlocal.mu;
+            } else {
+                mu.assign(pathlocal.s.size(),mu_nominal);
+            }
 
-        for (uint i=0;i<vxref_path.size();i++){
-            // set max kinematic vx due to curvature and mu
-            if(vxref_path.at(i) > std::sqrt(sp.g*mu.at(i)/std::max(std::abs(pathlocal.kappa_c.at(i)),0.0001f)) ){
-                vxref_path.at(i) = std::sqrt(sp.g*mu.at(i)/std::abs(pathlocal.kappa_c.at(i)));
-                //cout << "bounding vxref due to curvature" << endl;
+            for (uint i=0;i<vxref_path.size();i++){
+                // set max kinematic vx due to curvature and mu
+                if(vxref_path.at(i) > std::sqrt(sp.g*mu.at(i)/std::max(std::abs(pathlocal.kappa_c.at(i)),0.0001f)) ){
+                    vxref_path.at(i) = std::sqrt(sp.g*mu.at(i)/std::abs(pathlocal.kappa_c.at(i)));
+                    //cout << "bounding vxref due to curvature" << endl;
+                }
             }
-        }
 
-        // limit acc fwd pass
-        for (uint i=0;i<vxref_path.size()-1;i++){
-            float vxstep = sp.g*mu.at(i)/vxref_path.at(i);
-            if(vxref_path.at(i+1) - vxref_path.at(i) > vxstep){
-                vxref_path.at(i+1) = vxref_path.at(i) + vxstep;
+            // limit acc fwd pass
+            for (uint i=0;i<vxref_path.size()-1;i++){
+                float vxstep = sp.g*mu.at(i)/vxref_path.at(i);
+                if(vxref_path.at(i+1) - vxref_path.at(i) > vxstep){
+                    vxref_path.at(i+1) = vxref_path.at(i) + vxstep;
+                }
             }
-        }
 
-        // limit acc bwd pass
-        for (size_t i = vxref_path.size()-1; i>0; i--) {
-            float vxstep = sp.g*mu.at(i)/vxref_path.at(i);
-            if(vxref_path.at(i-1) - vxref_path.at(i) > vxstep){
-                vxref_path.at(i-1) = vxref_path.at(i) + vxstep;
+            // limit acc bwd pass
+            for (size_t i = vxref_path.size()-1; i>0; i--) {
+                float vxstep = sp.g*mu.at(i)/vxref_path.at(i);
+                if(vxref_path.at(i-1) - vxref_path.at(i) > vxstep){
+                    vxref_path.at(i-1) = vxref_path.at(i) + vxstep;
+                }
             }
         }
         refs.vxref_path = vxref_path;
@@ -442,8 +492,14 @@ containers::refstruct SAARTI::setRefs(int ref_mode,
 int SAARTI::trajset_eval_cost(){
     float mincost = float(Wslack_)*10;
     int trajhat_idx = -1;
+    // squared margins, distances are compared squared (reference: common/modules/trajset_eval.py)
+    vector<float> Rmgn2(obst_.Rmgn.size());
+    for (uint k=0; k<obst_.Rmgn.size();k++){
+        Rmgn2.at(k) = obst_.Rmgn.at(k)*obst_.Rmgn.at(k);
+    }
+    float Rmgn_max = planning_util::max_obstacle_margin(obst_); // obst_ sorted by s
     for (uint i=0;i<trajset_.size();i++) {
-        containers::trajstruct traj = trajset_.at(i);
+        containers::trajstruct &traj = trajset_.at(i); // cost and flags are stored in trajset_
         bool colliding = false;
         bool exitroad = false;
         float cost = 0;
@@ -454,11 +510,12 @@ int SAARTI::trajset_eval_cost(){
             float d = traj.d.at(j);
             //float vx = traj.vx.at(j);
 
-            // check obstacle (in frenet)
-            float dist;
-            for (uint k=0; k<obst_.s.size();k++){
-                dist = std::sqrt( (s-obst_.s.at(k))*(s-obst_.s.at(k)) + (d-obst_.d.at(k))*(d-obst_.d.at(k)) );
-                if(dist < obst_.Rmgn.at(k)){
+            // check obstacle (in frenet), only obstacles within Rmgn_max in s
+            uint k0, k1;
+            planning_util::obstacle_window(obst_, s - Rmgn_max, s + Rmgn_max, k0, k1);
+            for (uint k=k0; k<k1 && !colliding;k++){
+                float dist2 = (s-obst_.s.at(k))*(s-obst_.s.at(k)) + (d-obst_.d.at(k))*(d-obst_.d.at(k));
+                if(dist2 < Rmgn2.at(k)){
                     colliding = true;
                 }
             }
@@ -673,6 +730,7 @@ void SAARTI::pathlocal_callback(const common::Path::ConstPtr& msg){
     pathlocal_.mu = msg->mu;
     pathlocal_.dub = msg->dub;
     pathlocal_.dlb = msg->dlb;
+    pathlocal_.vxref = msg->vxref;
 }
 
 // obstacles callback
@@ -681,6 +739,7 @@ void SAARTI::obstacles_callback(const common::Obstacles::ConstPtr& msg){
     obst_.d = msg->d;
     obst_.R = msg->R;
     obst_.Rmgn = msg->Rmgn;
+    planning_util::sort_obstacles(obst_);
  }
 
 // get static params from rosparam
@@ -713,10 +772,14 @@ void SAARTI::get_rosparams(){
     if(!nh_.getParam("/cc_dref", dref_cc_)){
         ROS_ERROR_STREAM("failed to load param /cc_dref");
     }
+    // sim time stepping (optional)
+    nh_.param<bool>("/sim_time_stepping", sim_time_stepping_, false);
     // rollout config
     nh_.getParam("/Nd_rollout", Nd_rollout_);
     nh_.getParam("/Nvx_rollout", Nvx_rollout_);
     nh_.getParam("/vxub_rollout", vxub_rollout_);
+    nh_.param<int>("/rollout_mode", rollout_mode_, 0);
+    nh_.param<int>("/Nthreads_rollout", Nthreads_rollout_, 0);
 
     // opt config
     if(!nh_.getParam("/Wx", Wx_)){